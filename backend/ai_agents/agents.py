@@ -3,12 +3,17 @@
 from typing import Dict, Any, Optional, List
 import os
 import logging
+import time
 from dataclasses import dataclass
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage, SystemMessage
 from langchain_mcp_adapters.client import MultiServerMCPClient
 from pydantic import BaseModel, Field
 
+from metrics import agent_call_duration_seconds
+from tracing import span
+from .callbacks import TracingCallbackHandler
+
 logger = logging.getLogger(__name__)
 
 
@@ -102,7 +107,20 @@ class BaseAgent:
             self.mcp_tools = []
     
     async def execute(self, prompt: str, use_tools: bool = True) -> AgentResponse:
+        # Traced as one span; LLM and tool calls are recorded beneath it
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            with span("agent.execute", "agent", **{"agent.name": type(self).__name__, "agent.use_tools": use_tools}):
+                response = await self._execute(prompt, use_tools)
+            outcome = "success" if response.success else "failure"
+            return response
+        finally:
+            agent_call_duration_seconds.observe(time.perf_counter() - started, type(self).__name__, outcome)
+
+    async def _execute(self, prompt: str, use_tools: bool) -> AgentResponse:
         # Execute agent with LangGraph
+        callbacks = {"callbacks": [TracingCallbackHandler()]}
         try:
             messages = [
                 SystemMessage(content=self.system_prompt),
@@ -128,7 +146,7 @@ class BaseAgent:
                         SystemMessage(content=self.system_prompt),
                         HumanMessage(content=prompt)
                     ]
-                })
+                }, config=callbacks)
                 
                 # Extract the final response
                 response_messages = result.get("messages", [])
@@ -171,7 +189,7 @@ class BaseAgent:
                     self.mcp_client is not None,
                     len(self.mcp_tools),
                 )
-                response = await self.llm.ainvoke(messages)
+                response = await self.llm.ainvoke(messages, config=callbacks)
                 return AgentResponse(
                     success=True,
                     content=response.content,
@@ -0,0 +1,62 @@
+"""LangChain callbacks that record LLM and tool calls as tracing spans."""
+
+from typing import Any, Dict, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from tracing import Span, Trace, current_trace, end_span, start_span
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    # Run in the caller's task so the request's trace context is visible
+    run_inline = True
+
+    def __init__(self):
+        self._spans: Dict[UUID, tuple[Optional[Trace], Span]] = {}
+
+    def _start(self, run_id: UUID, name: str, category: str, **attributes) -> None:
+        span = start_span(name, category, **attributes)
+        if span is not None:
+            self._spans[run_id] = (current_trace(), span)
+
+    def _end(self, run_id: UUID, error: Optional[BaseException] = None, **attributes) -> None:
+        entry = self._spans.pop(run_id, None)
+        if entry is None:
+            return
+        trace, span = entry
+        span.attributes.update({key: value for key, value in attributes.items() if value is not None})
+        end_span(span, trace, error)
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages, *, run_id: UUID, **kwargs) -> None:
+        params = kwargs.get("invocation_params") or {}
+        model = params.get("model_name") or params.get("model")
+        self._start(run_id, "llm.chat", "llm", **{"gen_ai.request.model": model})
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts, *, run_id: UUID, **kwargs) -> None:
+        params = kwargs.get("invocation_params") or {}
+        model = params.get("model_name") or params.get("model")
+        self._start(run_id, "llm.completion", "llm", **{"gen_ai.request.model": model})
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs) -> None:
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        self._end(
+            run_id,
+            **{
+                "gen_ai.usage.input_tokens": usage.get("prompt_tokens"),
+                "gen_ai.usage.output_tokens": usage.get("completion_tokens"),
+            },
+        )
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs) -> None:
+        self._end(run_id, error)
+
+    def on_tool_start(self, serialized: Dict[str, Any], input_str: str, *, run_id: UUID, **kwargs) -> None:
+        name = (serialized or {}).get("name") or "tool"
+        self._start(run_id, f"tool.{name}", "tool", **{"gen_ai.tool.name": name})
+
+    def on_tool_end(self, output, *, run_id: UUID, **kwargs) -> None:
+        self._end(run_id)
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs) -> None:
+        self._end(run_id, error)
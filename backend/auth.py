@@ -1,6 +1,7 @@
 """Authentication utilities for JWT and password hashing."""
 
 import os
+import uuid
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 
@@ -10,14 +11,20 @@ from fastapi import HTTPException, Request
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 
 from models import User, UserInDB, UserRole
+from token_cache import VerifiedTokenCache, token_digest
+from tracing import traced
 
 
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_HOURS = 24
+# Access tokens are short-lived; clients renew them with a refresh token
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "15"))
 
 security = HTTPBearer()
 
+# Verified payloads by token digest; AUTH_TOKEN_CACHE_SIZE=0 disables it
+token_cache = VerifiedTokenCache(int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "4096")))
+
 
 def hash_password(password: str) -> str:
     """Hash a password using bcrypt."""
@@ -29,22 +36,37 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return bcrypt.checkpw(plain_password.encode(), hashed_password.encode())
 
 
-def create_access_token(user: User) -> str:
-    """Create a JWT access token for a user."""
-    expire = datetime.now(timezone.utc) + timedelta(hours=ACCESS_TOKEN_EXPIRE_HOURS)
+def create_access_token(user: User, session_id: Optional[str] = None) -> str:
+    """Create a JWT access token for a user, tied to a refresh-token session if given."""
+    now = datetime.now(timezone.utc)
+    expire = now + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode = {
         "sub": user.id,
         "email": user.email,
         "role": user.role,
+        # Enough of the user to authorise without a lookup in stateless mode
+        "username": user.username,
+        "created_at": user.created_at.isoformat(),
+        "jti": uuid.uuid4().hex,
+        # Sub-second, so a revocation later in the same second still covers it
+        "iat": now.timestamp(),
         "exp": expire,
     }
+    if session_id is not None:
+        to_encode["sid"] = session_id
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 
 def decode_token(token: str) -> dict:
-    """Decode and verify a JWT token."""
+    """Decode and verify a JWT token, reusing the payload of recently verified tokens."""
+    digest = token_digest(token)
+    payload = token_cache.get(digest)
+    if payload is not None:
+        return payload
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        token_cache.put(digest, payload)
         return payload
     except jwt.ExpiredSignatureError:
         raise HTTPException(
@@ -60,6 +82,21 @@ def decode_token(token: str) -> dict:
         )
 
 
+def user_from_claims(payload: dict) -> Optional[User]:
+    """Build the user from signed token claims, or None if any are missing."""
+    try:
+        return User.model_construct(
+            id=payload["sub"],
+            username=payload["username"],
+            email=payload["email"],
+            role=payload["role"],
+            created_at=datetime.fromisoformat(payload["created_at"]),
+        )
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+@traced("auth.get_current_user", "auth")
 async def get_current_user(
     request: Request,
     credentials: HTTPAuthorizationCredentials = None,
@@ -74,6 +111,22 @@ async def get_current_user(
 
     token = credentials.credentials
     payload = decode_token(token)
+    # For handlers that need more of the token than the user, e.g. logout
+    request.state.token_claims = payload
+
+    revocations = getattr(request.app.state, "token_revocations", None)
+    if revocations is not None:
+        if revocations.is_revoked(payload):
+            raise HTTPException(
+                status_code=401,
+                detail="Token has been revoked",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        if revocations.settings.stateless:
+            user = user_from_claims(payload)
+            # Tokens issued before claims carried the full user fall through
+            if user is not None:
+                return user
 
     db = request.app.state.db
     user_data = await db.users.find_one({"_id": payload["sub"]})
@@ -81,6 +134,17 @@ async def get_current_user(
     if not user_data:
         raise HTTPException(status_code=401, detail="User not found")
 
+    valid_after = user_data.get("tokens_valid_after")
+    if valid_after is not None:
+        if valid_after.tzinfo is None:
+            valid_after = valid_after.replace(tzinfo=timezone.utc)
+        if payload.get("iat", 0) < valid_after.timestamp():
+            raise HTTPException(
+                status_code=401,
+                detail="Token has been revoked",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+
     return User(
         id=user_data["_id"],
         username=user_data["username"],
@@ -0,0 +1,70 @@
+"""Benchmark per-request auth overhead under require_role.
+
+Runs ``get_current_user`` followed by ``require_role("manager")`` for one
+repeated token, the way every report request authorises, with the verified
+token cache disabled and enabled. Stateless mode is used so the numbers
+measure token handling only, with no Mongo round trip.
+
+Usage:
+    cd backend && python benchmarks/bench_auth.py --requests 50000
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.security import HTTPAuthorizationCredentials
+
+import auth
+from models import User
+from token_revocation import AuthSettings, TokenRevocationList
+
+
+def make_request():
+    revocations = TokenRevocationList(db=None, settings=AuthSettings(stateless=True))
+    return SimpleNamespace(app=SimpleNamespace(state=SimpleNamespace(token_revocations=revocations)))
+
+
+async def authorise(request, credentials, count: int) -> float:
+    check = auth.require_role("manager")
+    started = time.perf_counter()
+    for _ in range(count):
+        check(await auth.get_current_user(request, credentials))
+    return (time.perf_counter() - started) / count * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=50000)
+    args = parser.parse_args()
+
+    user = User(
+        id="bench-manager",
+        username="manager",
+        email="manager@test.com",
+        role="manager",
+        created_at=datetime.now(timezone.utc),
+    )
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=auth.create_access_token(user, "bench"))
+    request = make_request()
+
+    results = {}
+    for label, size in (("no cache", 0), ("cached", 4096)):
+        auth.token_cache = auth.VerifiedTokenCache(size)
+        asyncio.run(authorise(request, credentials, 1000))
+        results[label] = asyncio.run(authorise(request, credentials, args.requests))
+
+    print(f"{'mode':>9} {'us/request':>11}")
+    for label, micros in results.items():
+        print(f"{label:>9} {micros:>11.2f}")
+    print(f"speedup: {results['no cache'] / results['cached']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
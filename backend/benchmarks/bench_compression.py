@@ -0,0 +1,58 @@
+"""Benchmark response compression: bytes saved and CPU cost per size.
+
+Builds inventory listing JSON bodies of increasing size and compresses them
+with every encoding ``CompressionMiddleware`` has available.
+
+Usage:
+    cd backend && python benchmarks/bench_compression.py
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_serialization import make_item_doc
+from compression import available_encodings
+from json_response import dumps
+from models import JewelleryItemsResponse
+from serializers import item_from_doc
+
+
+def listing_body(rows: int) -> bytes:
+    items = [item_from_doc(make_item_doc(n)) for n in range(rows)]
+    page = JewelleryItemsResponse.model_construct(items=items, page=1, total=rows, has_more=False)
+    return dumps(page.model_dump(mode="json"))
+
+
+def compress(factory, body: bytes) -> bytes:
+    compressor = factory()
+    return compressor.compress(body) + compressor.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1, 10, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    encodings = available_encodings()
+    print(f"{'rows':>6} {'raw bytes':>10} {'encoding':>8} {'bytes':>9} {'saved':>7} {'us/resp':>9}")
+    for rows in args.rows:
+        body = listing_body(rows)
+        number = max(1, 2000 // rows)
+        for name, factory in encodings.items():
+            compressed = compress(factory, body)
+            seconds = min(timeit.repeat(lambda: compress(factory, body), number=number, repeat=args.repeat))
+            saved = 1 - len(compressed) / len(body)
+            print(
+                f"{rows:>6} {len(body):>10} {name:>8} {len(compressed):>9} "
+                f"{saved:>6.1%} {seconds / number * 1e6:>9.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Benchmark JSON response rendering for the inventory listing.
+
+Renders a ``/inventory/items?limit=100`` page through Starlette's default
+``JSONResponse`` and through ``FastJSONResponse`` (orjson, plus the stdlib
+fallback) and reports pages per second. With ``--url`` it instead drives a
+running server and reports request throughput.
+
+Usage:
+    cd backend && python benchmarks/bench_json_response.py
+    cd backend && python benchmarks/bench_json_response.py \\
+        --url http://localhost:8001/api/inventory/items?limit=100 --requests 2000
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+import json_response
+from bench_serialization import make_item_doc
+from json_response import FastJSONResponse
+from models import JewelleryItemsResponse
+from serializers import item_from_doc
+
+
+def build_page(page_size: int) -> JewelleryItemsResponse:
+    docs = [make_item_doc(n) for n in range(page_size)]
+    return JewelleryItemsResponse.model_construct(
+        items=[item_from_doc(item) for item in docs], page=1, total=page_size, has_more=True
+    )
+
+
+def bench_render(page_size: int, repeat: int):
+    page = build_page(page_size)
+    encoded = jsonable_encoder(page)
+    trusted = page.model_dump(mode="json")
+
+    orjson_module = json_response.orjson
+    cases = [
+        ("JSONResponse", JSONResponse, encoded, orjson_module),
+        ("FastJSONResponse (orjson)", FastJSONResponse, encoded, orjson_module),
+        ("FastJSONResponse (stdlib)", FastJSONResponse, encoded, None),
+        ("trusted + orjson", FastJSONResponse, trusted, orjson_module),
+    ]
+
+    print(f"Render /inventory/items page ({page_size} rows)")
+    for label, response_class, content, backend in cases:
+        if "orjson" in label and backend is None:
+            print(f"  {label:<28} skipped (orjson not installed)")
+            continue
+        json_response.orjson = backend
+        per_page = min(timeit.repeat(lambda: response_class(content), number=50, repeat=repeat)) / 50
+        print(f"  {label:<28} {per_page * 1e6:9.1f} us/page  {1 / per_page:10.0f} pages/s")
+    json_response.orjson = orjson_module
+
+
+async def bench_url(url: str, total: int, concurrency: int):
+    import httpx
+
+    latencies = []
+    queue = asyncio.Queue()
+    for _ in range(total):
+        queue.put_nowait(None)
+
+    async with httpx.AsyncClient(timeout=30) as client:
+
+        async def worker():
+            while not queue.empty():
+                queue.get_nowait()
+                start = time.perf_counter()
+                response = await client.get(url)
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(f"{url}")
+    print(f"  {total / elapsed:.1f} req/s, p50 {latencies[len(latencies) // 2] * 1000:.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--url", help="benchmark a running server instead of rendering in-process")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    if args.url:
+        asyncio.run(bench_url(args.url, args.requests, args.concurrency))
+    else:
+        bench_render(args.page_size, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
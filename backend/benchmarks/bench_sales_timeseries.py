@@ -0,0 +1,126 @@
+"""Benchmark the sales time-series aggregation over synthetic orders.
+
+Seeds a scratch database with N orders spread over the last year, then for
+each interval compares the server-side ``$dateTrunc`` grouping used by
+``/reports/sales/timeseries`` with fetching the window's orders and bucketing
+them in Python. Needs MongoDB 5.0+ at MONGO_URL (``$dateTrunc``); the
+scratch database is dropped afterwards unless --keep is given.
+
+Usage:
+    cd backend && python benchmarks/bench_sales_timeseries.py --orders 100000 1000000
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from sales_timeseries import bucket_starts, resolve_timezone, timeseries_pipeline, truncate
+
+INSERT_BATCH_SIZE = 10000
+STATUSES = ["pending", "confirmed", "delivered", "delivered", "delivered", "cancelled"]
+
+
+def make_orders(count: int, now: datetime):
+    rng = random.Random(count)
+    for _ in range(count):
+        yield {
+            "_id": str(uuid.uuid4()),
+            "status": rng.choice(STATUSES),
+            "total_amount": rng.randrange(5000, 500000, 100),
+            "order_date": now - timedelta(seconds=rng.randrange(365 * 24 * 3600)),
+        }
+
+
+async def seed(collection, count: int, now: datetime) -> None:
+    await collection.drop()
+    batch = []
+    for order in make_orders(count, now):
+        batch.append(order)
+        if len(batch) == INSERT_BATCH_SIZE:
+            await collection.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        await collection.insert_many(batch, ordered=False)
+    await collection.create_index("order_date")
+
+
+async def server_side(collection, start, end, interval, tz_name) -> int:
+    pipeline = timeseries_pipeline(start, end, interval, tz_name, 400)
+    return len(await collection.aggregate(pipeline).to_list(length=None))
+
+
+async def client_side(collection, start, end, interval, tz) -> int:
+    buckets = {}
+    cursor = collection.find(
+        {"order_date": {"$gte": start, "$lte": end}},
+        {"order_date": 1, "status": 1, "total_amount": 1},
+    )
+    async for order in cursor:
+        key = truncate(order["order_date"].replace(tzinfo=timezone.utc), interval, tz)
+        bucket = buckets.setdefault(key, [0, 0, 0])
+        bucket[0] += 1
+        if order["status"] == "delivered":
+            bucket[1] += 1
+            bucket[2] += order["total_amount"]
+    return len(buckets)
+
+
+async def best_of(repeat: int, fn, *args) -> tuple:
+    timings = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = await fn(*args)
+        timings.append((time.perf_counter() - started) * 1000)
+    return min(timings), result
+
+
+async def run(args) -> None:
+    load_dotenv(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".env"))
+    client = AsyncIOMotorClient(os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    db = client[args.database]
+    tz = resolve_timezone(args.tz)
+    end = datetime.now(timezone.utc)
+    start = end - timedelta(days=365)
+
+    print(f"{'orders':>9} {'interval':>8} {'buckets':>7} {'$dateTrunc ms':>14} {'python ms':>10} {'speedup':>8}")
+    try:
+        for count in args.orders:
+            await seed(db.orders, count, end)
+            for interval in args.intervals:
+                server_ms, rows = await best_of(args.repeat, server_side, db.orders, start, end, interval, args.tz)
+                client_ms, _ = await best_of(args.repeat, client_side, db.orders, start, end, interval, tz)
+                assert rows <= len(bucket_starts(start, end, interval, tz, 400))
+                print(
+                    f"{count:>9} {interval:>8} {rows:>7} {server_ms:>14.1f} {client_ms:>10.1f} "
+                    f"{client_ms / server_ms:>7.1f}x"
+                )
+    finally:
+        if not args.keep:
+            await client.drop_database(args.database)
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--orders", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--intervals", nargs="+", choices=["day", "week", "month"], default=["day", "week", "month"])
+    parser.add_argument("--tz", default="Asia/Kolkata")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--database", default="bench_sales_timeseries")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch database")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
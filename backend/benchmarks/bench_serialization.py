@@ -0,0 +1,158 @@
+"""Benchmark validated vs trusted-read serialisation of listing pages.
+
+Compares the previous path (build models field by field, then let FastAPI
+validate and serialise the response_model) with the trusted-read path in
+``serializers.py`` for a page of stored documents.
+
+Usage:
+    cd backend && python benchmarks/bench_serialization.py --page-size 100
+"""
+
+import argparse
+import os
+import sys
+import timeit
+import uuid
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+
+from models import JewelleryItem, JewelleryItemsResponse, Order, OrderItem, OrdersResponse
+from serializers import item_from_doc, order_from_doc, trusted_response
+
+
+def make_item_doc(n: int) -> dict:
+    now = datetime.now(timezone.utc)
+    return {
+        "_id": str(uuid.uuid4()),
+        "item_code": f"ITEM-{n:06d}",
+        "name": f"Bench Ring {n}",
+        "description": "Hand-finished 22k gold ring with filigree detailing. " * 4,
+        "category": "ring",
+        "price": 50000 + n,
+        "weight": 4.5,
+        "material": "gold",
+        "images": [f"https://cdn.example.com/items/{n}/{i}.jpg" for i in range(4)],
+        "status": "available",
+        "version": 1,
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+def make_order_doc(n: int) -> dict:
+    items = [
+        {
+            "item_id": str(uuid.uuid4()),
+            "item_code": f"ITEM-{n:06d}-{i}",
+            "name": f"Bench Ring {n}-{i}",
+            "price": 25000,
+            "quantity": 1,
+            "subtotal": 25000,
+        }
+        for i in range(3)
+    ]
+    return {
+        "_id": str(uuid.uuid4()),
+        "customer_name": "Bench Customer",
+        "customer_phone": "+1234567890",
+        "customer_address": "123 Benchmark Street, Test City, 12345",
+        "items": items,
+        "total_amount": 75000,
+        "status": "pending",
+        "payment_method": "COD",
+        "order_date": datetime.now(timezone.utc),
+        "delivery_date": None,
+        "version": 1,
+    }
+
+
+def validated_items_page(docs):
+    items = [
+        JewelleryItem(
+            id=item["_id"],
+            item_code=item["item_code"],
+            name=item["name"],
+            description=item["description"],
+            category=item["category"],
+            price=item["price"],
+            weight=item["weight"],
+            material=item["material"],
+            images=item.get("images", []),
+            status=item["status"],
+            version=item.get("version", 1),
+            created_at=item["created_at"],
+            updated_at=item["updated_at"],
+        )
+        for item in docs
+    ]
+    response = JewelleryItemsResponse(items=items, page=1, total=len(docs), has_more=False)
+    # FastAPI dumps the returned model, re-validates it against the
+    # response_model and then runs jsonable_encoder over the result.
+    return jsonable_encoder(JewelleryItemsResponse.model_validate(response.model_dump()))
+
+
+def trusted_items_page(docs):
+    response = JewelleryItemsResponse.model_construct(
+        items=[item_from_doc(item) for item in docs], page=1, total=len(docs), has_more=False
+    )
+    return trusted_response(response)
+
+
+def validated_orders_page(docs):
+    orders = [
+        Order(
+            id=order["_id"],
+            customer_name=order["customer_name"],
+            customer_phone=order["customer_phone"],
+            customer_address=order["customer_address"],
+            items=[OrderItem(**item) for item in order["items"]],
+            total_amount=order["total_amount"],
+            status=order["status"],
+            payment_method=order["payment_method"],
+            order_date=order["order_date"],
+            delivery_date=order.get("delivery_date"),
+            version=order.get("version", 1),
+        )
+        for order in docs
+    ]
+    response = OrdersResponse(orders=orders, page=1, total=len(docs))
+    return jsonable_encoder(OrdersResponse.model_validate(response.model_dump()))
+
+
+def trusted_orders_page(docs):
+    response = OrdersResponse.model_construct(
+        orders=[order_from_doc(order) for order in docs], page=1, total=len(docs)
+    )
+    return trusted_response(response)
+
+
+def bench(label: str, func, docs, repeat: int) -> float:
+    per_page = min(timeit.repeat(lambda: func(docs), number=1, repeat=repeat))
+    print(f"  {label:<10} {per_page * 1000:8.3f} ms/page")
+    return per_page
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    item_docs = [make_item_doc(n) for n in range(args.page_size)]
+    order_docs = [make_order_doc(n) for n in range(args.page_size)]
+
+    for name, validated, trusted, docs in [
+        ("JewelleryItemsResponse", validated_items_page, trusted_items_page, item_docs),
+        ("OrdersResponse", validated_orders_page, trusted_orders_page, order_docs),
+    ]:
+        print(f"{name} ({args.page_size} rows)")
+        before = bench("validated", validated, docs, args.repeat)
+        after = bench("trusted", trusted, docs, args.repeat)
+        print(f"  saved      {(before - after) * 1000:8.3f} ms/page ({before / after:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
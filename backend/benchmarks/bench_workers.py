@@ -0,0 +1,89 @@
+"""Benchmark /inventory/items throughput scaling across worker processes.
+
+Starts ``launcher.py`` with 1, 2, 4 ... workers against the Mongo configured
+in ``.env``, drives ``/api/inventory/items`` at fixed concurrency and reports
+requests per second and scaling efficiency relative to one worker.
+
+Usage:
+    cd backend && python benchmarks/bench_workers.py --workers 1 2 4 --requests 4000
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+async def wait_until_ready(url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(timeout=2) as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(url)).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"Server at {url} did not become ready")
+
+
+async def drive(url: str, total: int, concurrency: int) -> float:
+    remaining = total
+
+    async with httpx.AsyncClient(timeout=30, limits=httpx.Limits(max_connections=concurrency)) as client:
+
+        async def worker():
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                response = await client.get(url)
+                response.raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return total / (time.perf_counter() - started)
+
+
+def run_with_workers(workers: int, port: int, args) -> float:
+    process = subprocess.Popen(
+        [sys.executable, "launcher.py", "--workers", str(workers), "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+    )
+    try:
+        base = f"http://127.0.0.1:{port}/api"
+        asyncio.run(wait_until_ready(f"{base}/"))
+        url = f"{base}/inventory/items?limit={args.limit}"
+        asyncio.run(drive(url, args.warmup, args.concurrency))
+        return asyncio.run(drive(url, args.requests, args.concurrency))
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--requests", type=int, default=4000)
+    parser.add_argument("--warmup", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--port", type=int, default=8011)
+    args = parser.parse_args()
+
+    baseline = None
+    print(f"{'workers':>7} {'req/s':>10} {'speedup':>8} {'efficiency':>10}")
+    for workers in args.workers:
+        throughput = run_with_workers(workers, args.port, args)
+        baseline = baseline or throughput / workers
+        speedup = throughput / baseline
+        print(f"{workers:>7} {throughput:>10.1f} {speedup:>7.2f}x {speedup / workers:>9.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+"""Load-test the API against synthetic catalogues and order histories.
+
+For each catalogue size, seeds items and a year of orders with
+``generate_data`` plus a login user, then drives the inventory, order,
+report and login endpoints at each concurrency level and records
+throughput and latency percentiles. Results are written as JSON so runs can
+be diffed against a stored baseline before deploy.
+
+By default the app runs in-process on an in-memory mongomock database
+(``MONGO_URL=mongomock://``) and is driven through ``httpx.ASGITransport``,
+so no server or network loopback is involved. Point --mongo-url at a local
+``mongod`` for numbers representative of production, and add --base-url to
+drive an already running server over HTTP instead (seeding still goes
+through --mongo-url, which must then be the server's database). Seeding
+empties the target database's users, items and orders, and the database is
+dropped afterwards unless --keep is given, so a --base-url run also needs
+--wipe-database to confirm that database may be wiped. mongomock
+answers every query with a collection scan, so its numbers only compare
+with other mongomock runs, and it cannot run the time-series report.
+
+Usage:
+    cd backend && python benchmarks/load_test.py --items 10000 --concurrency 1 16 --output load.json
+    cd backend && python benchmarks/load_test.py --mongo-url mongodb://localhost:27017 \\
+        --items 10000 100000 1000000 --concurrency 16 64
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Callable, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+from auth import hash_password
+from database import MOCK_MONGO_URL
+from generate_data import CATEGORIES, MATERIALS, generate
+from seed_db import ensure_indexes
+
+LOGIN = {"email": "loadtest-owner@test.com", "password": "loadtest123"}
+ORDER_STATUSES = ["pending", "confirmed", "delivered", "cancelled"]
+
+
+async def seed(db, items: int, orders: int, parallel: int) -> None:
+    for name in ("jewellery_items", "orders", "item_sales_daily", "report_jobs", "users", "login_attempts"):
+        await db[name].delete_many({})
+
+    await db.users.insert_one(
+        {
+            "_id": "loadtest-owner",
+            "username": "loadtest",
+            "email": LOGIN["email"],
+            "password_hash": hash_password(LOGIN["password"]),
+            "role": "owner",
+            "created_at": datetime.now(timezone.utc),
+        }
+    )
+    await generate(db, items, orders, seed=items, days=365, parallel=parallel)
+    # The app's indexes, so mongod runs measure indexed queries rather than collection scans
+    await ensure_indexes(db)
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+@dataclass
+class Scenario:
+    name: str
+    # rng -> keyword arguments for httpx.AsyncClient.request
+    build: Callable[[random.Random], dict]
+    auth: bool = True
+
+
+def page(rng: random.Random) -> int:
+    return rng.randint(1, 50)
+
+
+def scenarios(available_items: List[str], mock: bool) -> List[Scenario]:
+    selected = [
+        Scenario("auth.login", lambda rng: {"method": "POST", "url": "/auth/login", "json": LOGIN}, auth=False),
+        Scenario(
+            "inventory.list",
+            lambda rng: {"method": "GET", "url": "/inventory/items", "params": {"page": page(rng), "limit": 20}},
+            auth=False,
+        ),
+        Scenario(
+            "inventory.filter",
+            lambda rng: {
+                "method": "GET",
+                "url": "/inventory/items",
+                "params": {
+                    "category": rng.choice(list(CATEGORIES)),
+                    "material": rng.choice(list(MATERIALS)),
+                    "status": "available",
+                },
+            },
+            auth=False,
+        ),
+        Scenario(
+            "inventory.search",
+            lambda rng: {"method": "GET", "url": "/inventory/items", "params": {"search": rng.choice(list(MATERIALS))}},
+            auth=False,
+        ),
+        Scenario(
+            "orders.list",
+            lambda rng: {
+                "method": "GET",
+                "url": "/orders",
+                "params": {"page": page(rng), "status": rng.choice(ORDER_STATUSES)},
+            },
+        ),
+        Scenario(
+            "orders.create",
+            lambda rng: {
+                "method": "POST",
+                "url": "/orders",
+                "json": {
+                    "customer_name": "Load Test",
+                    "customer_phone": f"97{rng.randrange(10**8):08d}",
+                    "customer_address": "2 Load Test Lane",
+                    "items": [{"item_id": available_items.pop(), "quantity": 1}],
+                },
+            },
+            auth=False,
+        ),
+        Scenario("reports.inventory", lambda rng: {"method": "GET", "url": "/reports/inventory"}),
+        Scenario("reports.sales", lambda rng: {"method": "GET", "url": "/reports/sales"}),
+        Scenario("reports.top_sellers", lambda rng: {"method": "GET", "url": "/reports/top-sellers"}),
+    ]
+    if not mock:
+        selected.append(
+            Scenario(
+                "reports.sales_timeseries",
+                lambda rng: {"method": "GET", "url": "/reports/sales/timeseries", "params": {"interval": "week"}},
+            )
+        )
+    return selected
+
+
+async def drive(client: httpx.AsyncClient, scenario: Scenario, token: str, total: int, concurrency: int) -> dict:
+    rng = random.Random(scenario.name)
+    headers = {"Authorization": f"Bearer {token}"} if scenario.auth else {}
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    remaining = total
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            request = scenario.build(rng)
+            started = time.perf_counter()
+            try:
+                response = await client.request(headers=headers, **request)
+                statuses[str(response.status_code)] += 1
+            except httpx.HTTPError as exc:
+                statuses[type(exc).__name__] += 1
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    errors = sum(count for status, count in statuses.items() if not status.startswith("2"))
+    return {
+        "scenario": scenario.name,
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "status_codes": dict(statuses),
+        "throughput_rps": round(total / elapsed, 2) if elapsed > 0 else 0.0,
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+            "p50": round(percentile(latencies, 0.50), 3),
+            "p95": round(percentile(latencies, 0.95), 3),
+            "p99": round(percentile(latencies, 0.99), 3),
+            "max": round(latencies[-1], 3) if latencies else 0.0,
+        },
+    }
+
+
+@asynccontextmanager
+async def api_client(base_url: Optional[str]):
+    """Yield (client, db): the app in-process via ASGITransport, or a running server over HTTP."""
+    if base_url:
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        mongo = AsyncIOMotorClient(os.environ["MONGO_URL"])
+        try:
+            async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+                yield client, mongo[os.environ["DB_NAME"]]
+        finally:
+            mongo.close()
+        return
+
+    from server import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest/api", timeout=60) as client:
+            yield client, app.state.db
+
+
+async def run(args) -> dict:
+    results = []
+    started_at = datetime.now(timezone.utc)
+    mock = args.mongo_url.startswith(MOCK_MONGO_URL)
+
+    async with api_client(args.base_url) as (client, db):
+        try:
+            for items in args.items:
+                orders = int(items * args.orders_per_item)
+                seed_started = time.perf_counter()
+                await seed(db, items, orders, args.parallel)
+                seed_seconds = round(time.perf_counter() - seed_started, 2)
+                print(f"Seeded {items} items and {orders} orders in {seed_seconds}s", file=sys.stderr)
+
+                response = await client.post("/auth/login", json=LOGIN)
+                response.raise_for_status()
+                token = response.json()["token"]
+
+                available = [doc["_id"] async for doc in db.jewellery_items.find({"status": "available"}, {"_id": 1})]
+                random.Random(items).shuffle(available)
+                for concurrency in args.concurrency:
+                    for scenario in scenarios(available, mock):
+                        if args.scenarios and scenario.name not in args.scenarios:
+                            continue
+                        if scenario.name == "orders.create" and len(available) < args.warmup + args.requests:
+                            continue
+                        if args.warmup:
+                            await drive(client, scenario, token, args.warmup, min(concurrency, args.warmup))
+                        result = await drive(client, scenario, token, args.requests, concurrency)
+                        result["dataset"] = {"items": items, "orders": orders, "seed_seconds": seed_seconds}
+                        results.append(result)
+                        print(
+                            f"{items:>8} items c={concurrency:<3} {scenario.name:<26} "
+                            f"{result['throughput_rps']:>9.1f} req/s  p50 {result['latency_ms']['p50']:>8.1f} ms  "
+                            f"p99 {result['latency_ms']['p99']:>8.1f} ms  errors {result['errors']}",
+                            file=sys.stderr,
+                        )
+        finally:
+            if not args.keep and not mock:
+                await db.client.drop_database(db.name)
+
+    return {
+        "meta": {
+            "started_at": started_at.isoformat(),
+            "mongo": "mongomock" if mock else "mongod",
+            "target": args.base_url or "in-process",
+            "requests_per_scenario": args.requests,
+            "python": platform.python_version(),
+        },
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, nargs="+", default=[10000])
+    parser.add_argument("--orders-per-item", type=float, default=1.0)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16])
+    parser.add_argument("--requests", type=int, default=200, help="Measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--parallel", type=int, default=os.cpu_count() or 4, help="Data generator processes")
+    parser.add_argument("--scenarios", nargs="*", help="Only run these scenarios (e.g. inventory.list auth.login)")
+    parser.add_argument("--mongo-url", default=MOCK_MONGO_URL)
+    parser.add_argument("--database", default="bench_load_test")
+    parser.add_argument("--base-url", help="Drive a running server (e.g. http://localhost:8001/api)")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch database")
+    parser.add_argument(
+        "--wipe-database",
+        action="store_true",
+        help="Confirm --base-url may empty and drop --database on the server's MongoDB",
+    )
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    # The in-process app reads these in its lifespan; .env does not override them
+    os.environ["MONGO_URL"] = args.mongo_url
+    os.environ["DB_NAME"] = args.database
+    if args.base_url and args.mongo_url.startswith(MOCK_MONGO_URL):
+        parser.error("--base-url needs --mongo-url pointing at the server's MongoDB")
+    if args.base_url and not args.wipe_database:
+        parser.error(f"--base-url seeds into and then drops {args.database!r}; pass --wipe-database to confirm")
+    if args.requests < 1 or args.warmup < 0:
+        parser.error("--requests must be at least 1 and --warmup at least 0")
+
+    report = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
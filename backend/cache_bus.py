@@ -0,0 +1,160 @@
+"""Cross-process cache invalidation over a pub/sub channel.
+
+Each worker keeps its own in-process caches (``app.state.agent_cache`` and
+friends) and registers them on the bus by name. Invalidations are published
+to every worker; receivers drop the key, or clear the whole cache when no
+key is given.
+
+``LocalCacheBus`` applies messages in-process and is the default for single
+worker runs and tests. ``MongoCacheBus`` fans messages out through a capped
+collection tailed by every worker, so no extra broker is needed. A worker
+whose tail is interrupted resumes after the last message it saw, in the
+collection's insertion order; if that message has since been overwritten,
+it clears every cache rather than risk keeping stale entries.
+"""
+
+import asyncio
+import logging
+import os
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from typing import Dict, MutableMapping, Optional
+
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_COLLECTION = "cache_invalidations"
+INVALIDATION_COLLECTION_BYTES = 1024 * 1024
+
+
+class CacheBus(ABC):
+    """Registry of named in-process caches plus a publish channel."""
+
+    def __init__(self):
+        self._caches: Dict[str, MutableMapping] = {}
+        self.origin = os.getpid()
+
+    def register(self, name: str, cache: MutableMapping) -> None:
+        self._caches[name] = cache
+
+    def has_cache(self, name: str) -> bool:
+        return name in self._caches
+
+    def apply(self, message: dict) -> None:
+        """Apply an invalidation message to the local cache it names."""
+        cache = self._caches.get(message.get("cache"))
+        if cache is None:
+            return
+
+        key = message.get("key")
+        if key is None:
+            cache.clear()
+        else:
+            cache.pop(key, None)
+
+    def clear_all(self) -> None:
+        for cache in self._caches.values():
+            cache.clear()
+
+    async def invalidate(self, cache: str, key: Optional[str] = None) -> None:
+        """Invalidate a key (or a whole cache) in every worker."""
+        await self.publish({"cache": cache, "key": key})
+
+    @abstractmethod
+    async def publish(self, message: dict) -> None:
+        """Deliver an invalidation message to every worker, this one included."""
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+
+class LocalCacheBus(CacheBus):
+    """In-process bus: invalidations only reach this worker."""
+
+    async def publish(self, message: dict) -> None:
+        self.apply(message)
+
+
+class MongoCacheBus(CacheBus):
+    """Bus backed by a capped collection tailed by every worker."""
+
+    def __init__(self, db, poll_interval: float = 1.0):
+        super().__init__()
+        self.collection = db[INVALIDATION_COLLECTION]
+        self._db = db
+        self._poll_interval = poll_interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        try:
+            await self._db.create_collection(
+                INVALIDATION_COLLECTION, capped=True, size=INVALIDATION_COLLECTION_BYTES
+            )
+        except CollectionInvalid:
+            pass  # already created by another worker
+
+        # Only react to messages published after this worker started
+        latest = await self.collection.find_one({}, sort=[("$natural", -1)])
+        last_id = latest["_id"] if latest else None
+        self._task = asyncio.create_task(self._tail(last_id))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def publish(self, message: dict) -> None:
+        # Apply locally right away; the tailing loop re-applies it idempotently
+        self.apply(message)
+        await self.collection.insert_one(
+            {**message, "origin": self.origin, "published_at": datetime.now(timezone.utc)}
+        )
+
+    async def _tail(self, last_id) -> None:
+        while True:
+            # ObjectIds are generated by each publishing process, so they do not
+            # follow insertion order; resume from the last message seen in the
+            # capped collection's natural order instead of filtering on _id
+            resumed = last_id is None
+            try:
+                cursor = self.collection.find({}, cursor_type=CursorType.TAILABLE_AWAIT)
+                while cursor.alive:
+                    newest = last_id
+                    async for message in cursor:
+                        newest = message["_id"]
+                        if resumed:
+                            self.apply(message)
+                        else:
+                            resumed = newest == last_id
+                    if not resumed:
+                        # The last message seen was overwritten while disconnected,
+                        # so some invalidations may have been missed
+                        logger.warning("Cache invalidations missed while disconnected; clearing every cache")
+                        self.clear_all()
+                        resumed = True
+                    last_id = newest
+                    await asyncio.sleep(self._poll_interval)
+            except asyncio.CancelledError:
+                raise
+            except PyMongoError as exc:
+                logger.warning("Cache invalidation tail interrupted: %s", exc)
+            await asyncio.sleep(self._poll_interval)
+
+
+def create_cache_bus(db) -> CacheBus:
+    """Pick the bus backend from CACHE_BUS ("local" or "mongo")."""
+    backend = os.getenv("CACHE_BUS", "local").lower()
+    if backend == "mongo":
+        return MongoCacheBus(db)
+    if backend != "local":
+        raise RuntimeError(f"Unknown CACHE_BUS backend {backend!r}; expected 'local' or 'mongo'")
+    return LocalCacheBus()
@@ -0,0 +1,234 @@
+"""Response compression middleware with gzip, brotli and zstd negotiation.
+
+gzip is always available. brotli (``brotli`` package) and zstd
+(``zstandard`` package) are used when installed and the client accepts
+them. Small bodies, already-encoded responses and media types that do not
+compress well are passed through untouched; streaming responses are
+compressed chunk by chunk.
+"""
+
+import zlib
+from typing import Callable, Dict, Iterable, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+
+DEFAULT_EXCLUDED_MEDIA_TYPES = (
+    "image/",
+    "video/",
+    "audio/",
+    "font/woff",
+    "application/zip",
+    "application/gzip",
+    "application/x-gzip",
+    "application/zstd",
+    "application/octet-stream",
+    "text/event-stream",
+)
+
+
+class _GzipCompressor:
+    def __init__(self, level: int):
+        self._obj = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.compress(data)
+
+    def flush(self) -> bytes:
+        return self._obj.flush()
+
+
+class _BrotliCompressor:
+    def __init__(self, quality: int):
+        self._obj = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.process(data)
+
+    def flush(self) -> bytes:
+        return self._obj.finish()
+
+
+class _ZstdCompressor:
+    def __init__(self, level: int):
+        self._obj = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.compress(data)
+
+    def flush(self) -> bytes:
+        return self._obj.flush()
+
+
+def available_encodings(gzip_level: int = 6, brotli_quality: int = 4, zstd_level: int = 3) -> Dict[str, Callable]:
+    """Compressor factories for installed encodings, in server preference order."""
+    encodings = {}
+    if zstandard is not None:
+        encodings["zstd"] = lambda: _ZstdCompressor(zstd_level)
+    if brotli is not None:
+        encodings["br"] = lambda: _BrotliCompressor(brotli_quality)
+    encodings["gzip"] = lambda: _GzipCompressor(gzip_level)
+    return encodings
+
+
+def negotiate_encoding(accept_encoding: str, supported: Iterable[str]) -> Optional[str]:
+    """Pick the best supported encoding from an Accept-Encoding header."""
+    weights = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        weights[token] = quality
+
+    best, best_quality = None, 0.0
+    for encoding in supported:
+        quality = weights.get(encoding, weights.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+class CompressionMiddleware:
+    """ASGI middleware that compresses HTTP responses the client accepts."""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1000,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+        zstd_level: int = 3,
+        excluded_media_types: Iterable[str] = DEFAULT_EXCLUDED_MEDIA_TYPES,
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.excluded_media_types = tuple(excluded_media_types)
+        self.encodings = available_encodings(gzip_level, brotli_quality, zstd_level)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = Headers(scope=scope).get("accept-encoding", "")
+        encoding = negotiate_encoding(accept_encoding, self.encodings)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressionResponder(
+            self.app,
+            encoding,
+            self.encodings[encoding],
+            self.minimum_size,
+            self.excluded_media_types,
+        )
+        await responder(scope, receive, send)
+
+
+class _CompressionResponder:
+    def __init__(
+        self,
+        app: ASGIApp,
+        encoding: str,
+        compressor_factory: Callable,
+        minimum_size: int,
+        excluded_media_types: tuple,
+    ) -> None:
+        self.app = app
+        self.encoding = encoding
+        self.compressor_factory = compressor_factory
+        self.minimum_size = minimum_size
+        self.excluded_media_types = excluded_media_types
+        self.send: Send = None
+        self.initial_message: Message = {}
+        self.started = False
+        self.passthrough = False
+        self.compressor = None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.send = send
+        await self.app(scope, receive, self.send_with_compression)
+
+    def _should_skip(self, headers: Headers) -> bool:
+        if "content-encoding" in headers:
+            return True
+        media_type = headers.get("content-type", "")
+        return media_type.startswith(self.excluded_media_types)
+
+    async def send_with_compression(self, message: Message) -> None:
+        message_type = message["type"]
+
+        if message_type == "http.response.start":
+            # Defer until the first body chunk tells us the body size
+            self.initial_message = message
+            self.passthrough = self._should_skip(Headers(raw=message["headers"]))
+            return
+
+        if message_type != "http.response.body":
+            await self.send(message)
+            return
+
+        if self.passthrough:
+            if not self.started:
+                self.started = True
+                await self.send(self.initial_message)
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if not self.started:
+            self.started = True
+            headers = MutableHeaders(raw=self.initial_message["headers"])
+
+            if not more_body and len(body) < self.minimum_size:
+                await self.send(self.initial_message)
+                await self.send(message)
+                return
+
+            self.compressor = self.compressor_factory()
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+
+            if not more_body:
+                # Whole body is known: compress in one shot
+                body = self.compressor.compress(body) + self.compressor.flush()
+                headers["Content-Length"] = str(len(body))
+                await self.send(self.initial_message)
+                await self.send({"type": "http.response.body", "body": body})
+                return
+
+            # Streaming: length is unknown once compressed
+            del headers["Content-Length"]
+            await self.send(self.initial_message)
+
+        if self.compressor is None:
+            # Small single-body response already sent uncompressed
+            await self.send(message)
+            return
+
+        chunk = self.compressor.compress(body)
+        if not more_body:
+            chunk += self.compressor.flush()
+        await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
@@ -0,0 +1,57 @@
+"""Optimistic-concurrency helpers for atomic document updates."""
+
+from typing import Optional
+
+from fastapi import HTTPException
+
+
+def version_filter(doc_id: str, expected_version: Optional[int]) -> dict:
+    """
+    Build a find_one_and_update filter that only matches the expected version.
+    Documents written before versioning was introduced count as version 1.
+    Clients may omit the version, in which case the update is last-write-wins.
+    """
+    query = {"_id": doc_id}
+    if expected_version is None:
+        return query
+
+    if expected_version == 1:
+        query["$or"] = [{"version": 1}, {"version": {"$exists": False}}]
+    else:
+        query["version"] = expected_version
+    return query
+
+
+def version_conflict() -> HTTPException:
+    """409 raised when the expected version no longer matches."""
+    return HTTPException(
+        status_code=409,
+        detail={
+            "error": {
+                "code": "VERSION_CONFLICT",
+                "message": "Resource was modified by another request",
+            }
+        },
+    )
+
+
+async def raise_not_found_or_conflict(
+    collection,
+    doc_id: str,
+    expected_version: Optional[int],
+    not_found_code: str,
+    not_found_message: str,
+):
+    """
+    Explain why an atomic update matched nothing.
+    Only costs an extra read on the failure path.
+    """
+    if expected_version is not None:
+        exists = await collection.find_one({"_id": doc_id}, {"_id": 1})
+        if exists:
+            raise version_conflict()
+
+    raise HTTPException(
+        status_code=404,
+        detail={"error": {"code": not_found_code, "message": not_found_message}},
+    )
@@ -0,0 +1,230 @@
+"""MongoDB client settings, read routing and connection-pool metrics."""
+
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReadPreference, monitoring
+
+
+READ_PREFERENCES = {
+    "primary": ReadPreference.PRIMARY,
+    "primaryPreferred": ReadPreference.PRIMARY_PREFERRED,
+    "secondary": ReadPreference.SECONDARY,
+    "secondaryPreferred": ReadPreference.SECONDARY_PREFERRED,
+    "nearest": ReadPreference.NEAREST,
+}
+
+# MONGO_URL selecting an in-process mongomock database instead of a server
+MOCK_MONGO_URL = "mongomock://"
+
+
+def env_int(name: str, default: Optional[int]) -> Optional[int]:
+    """Read an optional integer environment variable."""
+    value = os.getenv(name)
+    if value is None or value == "":
+        return default
+    try:
+        return int(value)
+    except ValueError as exc:
+        raise RuntimeError(f"{name} must be an integer, got {value!r}") from exc
+
+
+@dataclass
+class DatabaseSettings:
+    """Typed Motor client configuration, loaded from MONGO_* environment variables."""
+
+    mongo_url: str
+    db_name: str
+    app_name: str = "jewellery-api"
+    max_pool_size: int = 100
+    min_pool_size: int = 0
+    max_idle_time_ms: Optional[int] = None
+    wait_queue_timeout_ms: Optional[int] = 5000
+    server_selection_timeout_ms: int = 5000
+    connect_timeout_ms: int = 10000
+    socket_timeout_ms: Optional[int] = None
+    compressors: List[str] = field(default_factory=list)
+    # Orders and writes stay on the primary
+    read_preference: str = "primary"
+    # Reports and exports tolerate slightly stale reads
+    analytics_read_preference: str = "secondaryPreferred"
+
+    def __post_init__(self):
+        for name in (self.read_preference, self.analytics_read_preference):
+            if name not in READ_PREFERENCES:
+                raise RuntimeError(
+                    f"Unknown read preference {name!r}; expected one of {', '.join(READ_PREFERENCES)}"
+                )
+
+    @classmethod
+    def from_env(cls) -> "DatabaseSettings":
+        mongo_url = os.getenv("MONGO_URL")
+        db_name = os.getenv("DB_NAME")
+
+        if not mongo_url or not db_name:
+            missing = [name for name, value in {"MONGO_URL": mongo_url, "DB_NAME": db_name}.items() if not value]
+            raise RuntimeError(f"Missing required environment variables: {', '.join(missing)}")
+
+        compressors = os.getenv("MONGO_COMPRESSORS", "")
+
+        return cls(
+            mongo_url=mongo_url,
+            db_name=db_name,
+            app_name=os.getenv("MONGO_APP_NAME", cls.app_name),
+            max_pool_size=env_int("MONGO_MAX_POOL_SIZE", cls.max_pool_size),
+            min_pool_size=env_int("MONGO_MIN_POOL_SIZE", cls.min_pool_size),
+            max_idle_time_ms=env_int("MONGO_MAX_IDLE_TIME_MS", cls.max_idle_time_ms),
+            wait_queue_timeout_ms=env_int("MONGO_WAIT_QUEUE_TIMEOUT_MS", cls.wait_queue_timeout_ms),
+            server_selection_timeout_ms=env_int(
+                "MONGO_SERVER_SELECTION_TIMEOUT_MS", cls.server_selection_timeout_ms
+            ),
+            connect_timeout_ms=env_int("MONGO_CONNECT_TIMEOUT_MS", cls.connect_timeout_ms),
+            socket_timeout_ms=env_int("MONGO_SOCKET_TIMEOUT_MS", cls.socket_timeout_ms),
+            compressors=[name.strip() for name in compressors.split(",") if name.strip()],
+            read_preference=os.getenv("MONGO_READ_PREFERENCE", cls.read_preference),
+            analytics_read_preference=os.getenv(
+                "MONGO_ANALYTICS_READ_PREFERENCE", cls.analytics_read_preference
+            ),
+        )
+
+    def client_kwargs(self) -> dict:
+        """Keyword arguments for AsyncIOMotorClient."""
+        kwargs = {
+            "appname": self.app_name,
+            "maxPoolSize": self.max_pool_size,
+            "minPoolSize": self.min_pool_size,
+            "serverSelectionTimeoutMS": self.server_selection_timeout_ms,
+            "connectTimeoutMS": self.connect_timeout_ms,
+            "readPreference": self.read_preference,
+        }
+        if self.max_idle_time_ms is not None:
+            kwargs["maxIdleTimeMS"] = self.max_idle_time_ms
+        if self.wait_queue_timeout_ms is not None:
+            kwargs["waitQueueTimeoutMS"] = self.wait_queue_timeout_ms
+        if self.socket_timeout_ms is not None:
+            kwargs["socketTimeoutMS"] = self.socket_timeout_ms
+        if self.compressors:
+            kwargs["compressors"] = ",".join(self.compressors)
+        return kwargs
+
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """
+    Record connection-pool checkout wait times.
+    pymongo emits checkout events synchronously on the thread doing the
+    checkout, so the start time is kept in a thread-local.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.checked_out = 0
+        self.wait_total_ms = 0.0
+        self.wait_max_ms = 0.0
+        self.connections_created = 0
+        self.connections_closed = 0
+        self.pools_cleared = 0
+
+    def _wait_ms(self) -> float:
+        started = getattr(self._local, "started", None)
+        self._local.started = None
+        if started is None:
+            return 0.0
+        return (time.perf_counter() - started) * 1000
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        waited = self._wait_ms()
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.wait_total_ms += waited
+            self.wait_max_ms = max(self.wait_max_ms, waited)
+
+    def connection_check_out_failed(self, event):
+        waited = self._wait_ms()
+        with self._lock:
+            self.checkout_failures += 1
+            self.wait_total_ms += waited
+            self.wait_max_ms = max(self.wait_max_ms, waited)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out = max(0, self.checked_out - 1)
+
+    def connection_created(self, event):
+        with self._lock:
+            self.connections_created += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.connections_closed += 1
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pools_cleared += 1
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def snapshot(self) -> Dict[str, float]:
+        """Point-in-time copy of the pool counters."""
+        with self._lock:
+            attempts = self.checkouts + self.checkout_failures
+            return {
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "checked_out": self.checked_out,
+                "wait_total_ms": round(self.wait_total_ms, 3),
+                "wait_avg_ms": round(self.wait_total_ms / attempts, 3) if attempts else 0.0,
+                "wait_max_ms": round(self.wait_max_ms, 3),
+                "connections_created": self.connections_created,
+                "connections_closed": self.connections_closed,
+                "pools_cleared": self.pools_cleared,
+            }
+
+
+def create_client(
+    settings: DatabaseSettings,
+    pool_monitor: PoolMonitor,
+    listeners: Sequence[monitoring.CommandListener] = (),
+) -> AsyncIOMotorClient:
+    """Build the Motor client from settings with pool monitoring and any command listeners attached."""
+    if settings.mongo_url.startswith(MOCK_MONGO_URL):
+        # In-memory stand-in for benchmarks and tests; emits no pool or command events
+        try:
+            from mongomock_motor import AsyncMongoMockClient
+        except ImportError as exc:
+            raise RuntimeError("MONGO_URL=mongomock:// requires the mongomock-motor package") from exc
+        return AsyncMongoMockClient()
+
+    return AsyncIOMotorClient(
+        settings.mongo_url,
+        event_listeners=[pool_monitor, *listeners],
+        **settings.client_kwargs(),
+    )
+
+
+def analytics_database(client: AsyncIOMotorClient, settings: DatabaseSettings):
+    """Database handle for reports and exports, routed by analytics_read_preference."""
+    return client.get_database(
+        settings.db_name,
+        read_preference=READ_PREFERENCES[settings.analytics_read_preference],
+    )
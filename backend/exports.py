@@ -0,0 +1,192 @@
+"""Streaming CSV/JSONL export helpers for inventory and orders."""
+
+import csv
+import io
+import json
+from datetime import datetime, timezone, tzinfo
+from typing import Any, AsyncIterator, Callable, Dict, List, Literal, Optional
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+# Documents pulled from Mongo per cursor batch; also the number of rows
+# buffered before a chunk is flushed to the client.
+EXPORT_BATCH_SIZE = 500
+
+ExportFormat = Literal["csv", "jsonl"]
+
+ITEM_EXPORT_FIELDS = [
+    "id",
+    "item_code",
+    "name",
+    "description",
+    "category",
+    "price",
+    "weight",
+    "material",
+    "images",
+    "status",
+    "created_at",
+    "updated_at",
+]
+
+ORDER_EXPORT_FIELDS = [
+    "id",
+    "order_date",
+    "customer_name",
+    "customer_phone",
+    "customer_address",
+    "status",
+    "payment_method",
+    "total_amount",
+    "delivery_date",
+    "item_count",
+    "items",
+]
+
+MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "jsonl": "application/x-ndjson",
+}
+
+
+def parse_datetime(value: Optional[str], field: str, tz: tzinfo = timezone.utc) -> Optional[datetime]:
+    """Parse an ISO 8601 query parameter as UTC, accepting a trailing 'Z'; no offset means `tz`."""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        raise HTTPException(
+            status_code=400,
+            detail={"error": {"code": "INVALID_DATE", "message": f"{field} must be an ISO 8601 datetime"}},
+        )
+    # Aware either way, so bounds with and without an offset compare
+    return (parsed if parsed.tzinfo else parsed.replace(tzinfo=tz)).astimezone(timezone.utc)
+
+
+def date_range_filter(start_date: Optional[str], end_date: Optional[str]) -> Dict[str, datetime]:
+    """Build a Mongo range filter from optional start/end query parameters."""
+    start_dt = parse_datetime(start_date, "start_date")
+    end_dt = parse_datetime(end_date, "end_date")
+
+    if start_dt and end_dt and end_dt < start_dt:
+        raise HTTPException(
+            status_code=400,
+            detail={"error": {"code": "INVALID_DATE_RANGE", "message": "end_date must be after start_date"}},
+        )
+
+    date_filter = {}
+    if start_dt:
+        date_filter["$gte"] = start_dt
+    if end_dt:
+        date_filter["$lte"] = end_dt
+    return date_filter
+
+
+def _format_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def item_row(item: dict) -> Dict[str, Any]:
+    """Map a stored jewellery item document to an export row."""
+    return {
+        "id": item["_id"],
+        "item_code": item["item_code"],
+        "name": item["name"],
+        "description": item["description"],
+        "category": item["category"],
+        "price": item["price"],
+        "weight": item["weight"],
+        "material": item["material"],
+        "images": item.get("images", []),
+        "status": item["status"],
+        "created_at": _format_value(item["created_at"]),
+        "updated_at": _format_value(item["updated_at"]),
+    }
+
+
+def order_row(order: dict) -> Dict[str, Any]:
+    """Map a stored order document to an export row."""
+    return {
+        "id": order["_id"],
+        "order_date": _format_value(order["order_date"]),
+        "customer_name": order["customer_name"],
+        "customer_phone": order["customer_phone"],
+        "customer_address": order["customer_address"],
+        "status": order["status"],
+        "payment_method": order["payment_method"],
+        "total_amount": order["total_amount"],
+        "delivery_date": _format_value(order.get("delivery_date")),
+        "item_count": sum(item["quantity"] for item in order["items"]),
+        "items": order["items"],
+    }
+
+
+def _csv_cell(value: Any) -> Any:
+    """Flatten list values so each export row stays a single CSV line."""
+    if isinstance(value, list):
+        return "|".join(
+            f"{entry['item_code']} x{entry['quantity']}" if isinstance(entry, dict) else str(entry)
+            for entry in value
+        )
+    if value is None:
+        return ""
+    return value
+
+
+async def _iter_csv(
+    cursor, fields: List[str], to_row: Callable[[dict], Dict[str, Any]]
+) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+
+    pending = 0
+    async for doc in cursor:
+        row = to_row(doc)
+        writer.writerow([_csv_cell(row[field]) for field in fields])
+        pending += 1
+        if pending >= EXPORT_BATCH_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+            pending = 0
+
+    yield buffer.getvalue()
+
+
+async def _iter_jsonl(cursor, to_row: Callable[[dict], Dict[str, Any]]) -> AsyncIterator[str]:
+    lines = []
+    async for doc in cursor:
+        lines.append(json.dumps(to_row(doc), default=str))
+        if len(lines) >= EXPORT_BATCH_SIZE:
+            yield "\n".join(lines) + "\n"
+            lines = []
+
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+def export_response(
+    cursor,
+    fmt: ExportFormat,
+    fields: List[str],
+    to_row: Callable[[dict], Dict[str, Any]],
+    filename: str,
+) -> StreamingResponse:
+    """Stream a Motor cursor to the client as CSV or JSONL in fixed-size batches."""
+    cursor = cursor.batch_size(EXPORT_BATCH_SIZE)
+
+    if fmt == "csv":
+        body = _iter_csv(cursor, fields, to_row)
+    else:
+        body = _iter_jsonl(cursor, to_row)
+
+    return StreamingResponse(
+        body,
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'},
+    )
@@ -0,0 +1,399 @@
+"""Generate a synthetic catalogue and order history at production scale.
+
+Items follow the storefront's categories and materials with skewed shares,
+log-normal weights per category and prices derived from weight, a per-gram
+material rate and a making charge. Orders pick items by a power-law
+popularity (so a clear set of best-sellers emerges), mostly contain one
+piece, come from a pool of repeat customers, and are dated with yearly
+seasonality (festival and wedding peaks), busier weekends and shop-hour
+timing. Older orders are mostly delivered; recent ones are still pending or
+confirmed.
+
+Documents are built in worker processes, in batches that are seeded from
+``--seed`` and the batch number, so a run is reproducible. Batches are
+written with unordered ``insert_many`` calls, several at a time. Delivered
+orders are counted into the top-sellers leaderboard as they are generated,
+and indexes are built once at the end through ``seed_db.seed_database``.
+Item statuses come from their own distribution; they are not reconciled
+with the generated orders.
+
+Usage:
+    cd backend && python generate_data.py --items 100000 --orders 1000000 --drop
+"""
+
+import argparse
+import asyncio
+import functools
+import math
+import os
+import random
+import sys
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from itertools import accumulate
+from typing import Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+
+sys.path.insert(0, os.path.dirname(__file__))
+from leaderboard import LEADERBOARD_COLLECTION, day_bucket
+from phone import normalise_phone
+
+BATCH_SIZE = 5000
+ID_NAMESPACE = uuid.UUID("6f1c2a52-3b0e-4a59-9a4e-2d0c7f1b8e11")
+
+# Share of the catalogue, and (median grams, log-normal sigma) per category
+CATEGORIES = {
+    "ring": (0.32, 4.0, 0.35),
+    "earring": (0.24, 5.0, 0.40),
+    "necklace": (0.16, 22.0, 0.50),
+    "pendant": (0.16, 4.0, 0.40),
+    "bracelet": (0.12, 14.0, 0.40),
+}
+# Share of the catalogue, and metal rate per gram in cents
+MATERIALS = {
+    "gold": (0.46, 620000),
+    "silver": (0.20, 9000),
+    "diamond": (0.14, 620000),
+    "platinum": (0.08, 340000),
+    "ruby": (0.07, 620000),
+    "emerald": (0.05, 620000),
+}
+# Stone premium for gem-set pieces, as (median, sigma) of a log-normal in cents
+STONE_PREMIUM = {"diamond": (4000000, 0.8), "ruby": (1500000, 0.7), "emerald": (1800000, 0.7)}
+ITEM_STATUSES = (("available", 0.80), ("sold", 0.17), ("reserved", 0.03))
+STYLES = ["Classic", "Heritage", "Solitaire", "Filigree", "Temple", "Minimal", "Bridal", "Floral", "Twisted", "Kundan"]
+
+# Festival and wedding seasons (Oct-Nov, Apr-May), Valentine's Day and year-end
+MONTH_FACTORS = [0.8, 1.0, 0.9, 1.2, 1.1, 0.8, 0.7, 0.9, 0.9, 1.4, 1.6, 1.2]
+WEEKDAY_FACTORS = [0.85, 0.85, 0.9, 0.95, 1.05, 1.3, 1.25]
+# Shop hours, local time
+HOUR_WEIGHTS = {10: 4, 11: 7, 12: 8, 13: 7, 14: 6, 15: 6, 16: 7, 17: 9, 18: 10, 19: 10, 20: 8, 21: 4}
+UTC_OFFSET = timedelta(hours=5, minutes=30)
+# Items per order: mostly single pieces
+ORDER_SIZES = ((1, 0.72), (2, 0.19), (3, 0.06), (4, 0.03))
+# Yearly growth of order volume
+GROWTH_PER_YEAR = 0.25
+# Items ranked by popularity get weight 1 / rank ** POPULARITY_EXPONENT
+POPULARITY_EXPONENT = 0.8
+
+FIRST_NAMES = ["Aarav", "Ananya", "Diya", "Ishaan", "Kavya", "Meera", "Neha", "Priya", "Rahul", "Riya", "Rohan", "Sara"]
+LAST_NAMES = ["Sharma", "Patel", "Iyer", "Reddy", "Gupta", "Nair", "Khan", "Das", "Mehta", "Singh", "Rao", "Bose"]
+CITIES = ["Mumbai", "Delhi", "Bengaluru", "Chennai", "Hyderabad", "Kolkata", "Pune", "Jaipur", "Ahmedabad", "Kochi"]
+
+
+def _weighted(rng: random.Random, pairs) -> object:
+    return rng.choices([value for value, _ in pairs], weights=[weight for _, weight in pairs])[0]
+
+
+def item_id(seed: int, index: int) -> str:
+    return str(uuid.uuid5(ID_NAMESPACE, f"{seed}:item:{index}"))
+
+
+def make_item(seed: int, index: int, now: datetime) -> dict:
+    """Item ``index`` of the catalogue; the same seed and index always give the same item."""
+    rng = random.Random(seed * 1_000_003 + index)
+    category = rng.choices(list(CATEGORIES), weights=[share for share, _, _ in CATEGORIES.values()])[0]
+    material = rng.choices(list(MATERIALS), weights=[share for share, _ in MATERIALS.values()])[0]
+    _, median_grams, sigma = CATEGORIES[category]
+    weight = round(max(0.5, rng.lognormvariate(math.log(median_grams), sigma)), 2)
+
+    price = weight * MATERIALS[material][1] * rng.uniform(1.08, 1.25)
+    if material in STONE_PREMIUM:
+        median, stone_sigma = STONE_PREMIUM[material]
+        price += rng.lognormvariate(math.log(median), stone_sigma)
+    style = rng.choice(STYLES)
+    created = now - timedelta(seconds=rng.randrange(3 * 365 * 24 * 3600))
+
+    return {
+        "_id": item_id(seed, index),
+        "item_code": f"SYN-{index:07d}",
+        "name": f"{style} {material.title()} {category.title()}",
+        "description": f"{style} {category} in {material}, {weight} g",
+        "category": category,
+        "price": int(round(price, -3)),
+        "weight": weight,
+        "material": material,
+        "images": [],
+        "status": _weighted(rng, ITEM_STATUSES),
+        "version": 1,
+        "created_at": created,
+        "updated_at": created,
+    }
+
+
+def item_batch(seed: int, start: int, count: int, now: datetime) -> List[dict]:
+    return [make_item(seed, index, now) for index in range(start, start + count)]
+
+
+@functools.lru_cache(maxsize=4)
+def _order_tables(seed: int, item_count: int, start: datetime, days: int) -> tuple:
+    """Cumulative day and popularity weights, computed once per worker process."""
+    day_weights = []
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        trend = 1 + GROWTH_PER_YEAR * offset / 365
+        day_weights.append(trend * MONTH_FACTORS[day.month - 1] * WEEKDAY_FACTORS[day.weekday()])
+
+    popularity = (1 / rank**POPULARITY_EXPONENT for rank in range(1, item_count + 1))
+    # Popularity rank -> catalogue index, so best-sellers are spread across the catalogue
+    rank_to_index = list(range(item_count))
+    random.Random(seed).shuffle(rank_to_index)
+    return list(accumulate(day_weights)), list(accumulate(popularity)), rank_to_index
+
+
+def _customer(rng: random.Random, customers: int) -> tuple:
+    # Skewed towards low numbers: a few loyal customers order often, most once or twice
+    number = int(customers * rng.random() ** 1.3)
+    crng = random.Random(number)
+    phone = f"+91 9{crng.randrange(10**9):09d}"
+    name = f"{crng.choice(FIRST_NAMES)} {crng.choice(LAST_NAMES)}"
+    address = f"{crng.randrange(1, 500)} {crng.choice(STYLES)} Road, {crng.choice(CITIES)}"
+    return name, phone, address
+
+
+def order_batch(
+    seed: int, batch: int, count: int, item_count: int, customers: int, start: datetime, end: datetime
+) -> Tuple[List[dict], Dict[str, list]]:
+    """Orders of one batch, and their leaderboard rows as id -> [quantity, revenue, document]."""
+    rng = random.Random(f"{seed}:orders:{batch}")
+    days = max(1, (end - start).days)
+    day_weights, popularity, rank_to_index = _order_tables(seed, item_count, start, days)
+    hours = list(HOUR_WEIGHTS)
+    hour_weights = list(accumulate(HOUR_WEIGHTS.values()))
+    item_cache = {}
+
+    orders = []
+    sales: Dict[str, list] = {}
+    for day_offset in rng.choices(range(days), cum_weights=day_weights, k=count):
+        local = start.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(
+            days=day_offset,
+            hours=rng.choices(hours, cum_weights=hour_weights)[0],
+            seconds=rng.randrange(3600),
+        )
+        order_date = local - UTC_OFFSET
+        if order_date > end:
+            order_date = end - timedelta(seconds=rng.randrange(3600))
+
+        size = min(item_count, _weighted(rng, ORDER_SIZES))
+        ranks = {rng.choices(range(item_count), cum_weights=popularity)[0] for _ in range(size)}
+        picked = []
+        for rank in ranks:
+            index = rank_to_index[rank]
+            if index not in item_cache:
+                item_cache[index] = make_item(seed, index, end)
+            picked.append(item_cache[index])
+        lines = [
+            {
+                "item_id": item["_id"],
+                "item_code": item["item_code"],
+                "name": item["name"],
+                "price": item["price"],
+                "quantity": 1,
+                "subtotal": item["price"],
+            }
+            for item in picked
+        ]
+
+        age_days = (end - order_date).days
+        if age_days < 3:
+            status = _weighted(rng, (("pending", 0.55), ("confirmed", 0.35), ("cancelled", 0.10)))
+        elif age_days < 10:
+            status = _weighted(rng, (("confirmed", 0.45), ("delivered", 0.45), ("cancelled", 0.10)))
+        else:
+            status = _weighted(rng, (("delivered", 0.90), ("cancelled", 0.10)))
+        delivery_date = order_date + timedelta(days=rng.randint(2, 7)) if status == "delivered" else None
+
+        if status == "delivered":
+            day = day_bucket(order_date)
+            for item in picked:
+                key = f"{day.date().isoformat()}:{item['item_code']}"
+                if key not in sales:
+                    row = {"day": day, "item_code": item["item_code"], "category": item["category"]}
+                    sales[key] = [0, 0, row]
+                sales[key][0] += 1
+                sales[key][1] += item["price"]
+                sales[key][2]["name"] = item["name"]
+
+        name, phone, address = _customer(rng, customers)
+        orders.append(
+            {
+                "_id": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+                "customer_name": name,
+                "customer_phone": phone,
+                "customer_phone_normalised": normalise_phone(phone),
+                "customer_address": address,
+                "items": lines,
+                "total_amount": sum(line["subtotal"] for line in lines),
+                "status": status,
+                "payment_method": "COD",
+                "order_date": order_date,
+                "delivery_date": delivery_date,
+                "version": 1,
+                # Counted in the leaderboard rows written alongside
+                "leaderboard_recorded": status == "delivered",
+            }
+        )
+    return orders, sales
+
+
+async def _insert_all(collection, futures, parallel: int, sales: Optional[Dict[str, list]] = None) -> int:
+    """
+    Insert batches as worker processes finish them, ``parallel`` insert_many
+    calls at a time. Batches that also carry leaderboard rows merge them into sales.
+    """
+    semaphore = asyncio.Semaphore(parallel)
+    inserted = 0
+
+    async def insert(future):
+        nonlocal inserted
+        documents = await asyncio.wrap_future(future)
+        if sales is not None:
+            documents, batch_sales = documents
+            for key, (quantity, revenue, row) in batch_sales.items():
+                merged = sales.setdefault(key, [0, 0, row])
+                merged[0] += quantity
+                merged[1] += revenue
+        async with semaphore:
+            await collection.insert_many(documents, ordered=False)
+        inserted += len(documents)
+
+    await asyncio.gather(*(insert(future) for future in futures))
+    return inserted
+
+
+async def _write_leaderboard(db, sales: Dict[str, list], parallel: int, batch_size: int) -> None:
+    collection = db[LEADERBOARD_COLLECTION]
+    if await collection.estimated_document_count():
+        # Adding to an existing history: merge into its rows
+        requests = [
+            UpdateOne(
+                {"_id": key},
+                {
+                    "$inc": {"quantity": quantity, "revenue": revenue},
+                    "$set": {"name": row["name"]},
+                    "$setOnInsert": {"day": row["day"], "item_code": row["item_code"], "category": row["category"]},
+                },
+                upsert=True,
+            )
+            for key, (quantity, revenue, row) in sales.items()
+        ]
+        write = functools.partial(collection.bulk_write, ordered=False)
+    else:
+        requests = [
+            {"_id": key, **row, "quantity": quantity, "revenue": revenue}
+            for key, (quantity, revenue, row) in sales.items()
+        ]
+        write = functools.partial(collection.insert_many, ordered=False)
+
+    semaphore = asyncio.Semaphore(parallel)
+
+    async def write_chunk(offset: int) -> None:
+        async with semaphore:
+            await write(requests[offset : offset + batch_size])
+
+    await asyncio.gather(*(write_chunk(offset) for offset in range(0, len(requests), batch_size)))
+
+
+async def generate(
+    db,
+    items: int,
+    orders: int,
+    seed: int = 1,
+    days: int = 730,
+    customers: Optional[int] = None,
+    parallel: int = 4,
+    batch_size: int = BATCH_SIZE,
+    now: Optional[datetime] = None,
+) -> dict:
+    """Insert ``items`` items and ``orders`` orders into db; returns counts and timings."""
+    now = now or datetime.now(timezone.utc)
+    start = now - timedelta(days=days)
+    customers = customers or max(1, orders // 3)
+    timings = {}
+
+    with ProcessPoolExecutor(max_workers=parallel) as pool:
+        started = time.perf_counter()
+        item_futures = [
+            pool.submit(item_batch, seed, offset, min(batch_size, items - offset), now)
+            for offset in range(0, items, batch_size)
+        ]
+        await _insert_all(db.jewellery_items, item_futures, parallel)
+        timings["items_seconds"] = round(time.perf_counter() - started, 2)
+
+        started = time.perf_counter()
+        sales: Dict[str, list] = {}
+        order_futures = [
+            pool.submit(order_batch, seed, batch, min(batch_size, orders - offset), items, customers, start, now)
+            for batch, offset in enumerate(range(0, orders, batch_size))
+        ]
+        await _insert_all(db.orders, order_futures, parallel, sales)
+        # Delivered orders arrive already counted, so no per-order rebuild is needed
+        await _write_leaderboard(db, sales, parallel, batch_size)
+        timings["orders_seconds"] = round(time.perf_counter() - started, 2)
+
+    return {"items": items, "orders": orders, **timings}
+
+
+async def run(args) -> None:
+    load_dotenv()
+    mongo_url = os.getenv("MONGO_URL")
+    db_name = args.database or os.getenv("DB_NAME")
+    if not mongo_url or not db_name:
+        print("Error: MONGO_URL and DB_NAME must be set in .env")
+        return
+
+    from seed_db import seed_database
+
+    client = AsyncIOMotorClient(mongo_url)
+    db = client[db_name]
+    try:
+        if args.drop:
+            for name in ("jewellery_items", "orders", "item_sales_daily", "report_jobs"):
+                await db[name].drop()
+
+        result = await generate(
+            db,
+            args.items,
+            args.orders,
+            seed=args.seed,
+            days=args.days,
+            customers=args.customers,
+            parallel=args.parallel,
+            batch_size=args.batch_size,
+        )
+        print(
+            f"Inserted {result['items']} items in {result['items_seconds']}s "
+            f"and {result['orders']} orders in {result['orders_seconds']}s"
+        )
+
+        # Indexes, test users and the leaderboard, after the bulk load
+        started = time.perf_counter()
+        await seed_database(db)
+        print(f"Built indexes and leaderboard in {time.perf_counter() - started:.1f}s")
+    finally:
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=10000)
+    parser.add_argument("--orders", type=int, default=100000)
+    parser.add_argument("--days", type=int, default=730, help="Length of the order history")
+    parser.add_argument("--customers", type=int, help="Distinct customers (default: a third of the orders)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument(
+        "--parallel", type=int, default=os.cpu_count() or 4, help="Generator processes and concurrent inserts"
+    )
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--database", help="Database name (default: DB_NAME)")
+    parser.add_argument("--drop", action="store_true", help="Drop existing items, orders and report data first")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+"""Idempotency-Key support for retried POST requests.
+
+The first request carrying a given ``Idempotency-Key`` claims a record in the
+``idempotency_keys`` collection, runs normally and stores its response.
+Replays within the TTL get the stored response back without the endpoint
+running again (no validation, no writes). Concurrent duplicates wait for the
+first request to finish and then replay its response. Keys are scoped to the
+method, path and caller credentials; reusing a key with a different body
+returns 422.
+
+A claim is held for ``app.state.idempotency_claim_timeout`` seconds, which
+the lifespan reads from the environment. If its worker dies before
+storing a response, the next retry takes the stale claim over atomically
+(as ``report_jobs`` does with running jobs) instead of seeing 409 until the
+record expires. Stored responses keep their status, headers and body.
+"""
+
+import asyncio
+import hashlib
+import logging
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pymongo.errors import DuplicateKeyError
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from json_response import dumps
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_COLLECTION = "idempotency_keys"
+IDEMPOTENCY_HEADER = "idempotency-key"
+MAX_KEY_LENGTH = 255
+
+# Responses to these statuses depend on state the client can fix, so a retry
+# with the same key should run again rather than replay them
+NON_REPLAYABLE_STATUSES = {401, 403, 409, 429}
+
+
+async def ensure_idempotency_indexes(db, ttl_seconds: int) -> None:
+    """Expire stored responses after the replay window."""
+    await db[IDEMPOTENCY_COLLECTION].create_index("created_at", expireAfterSeconds=ttl_seconds)
+
+
+def _error(status_code: int, code: str, message: str) -> Tuple[int, bytes]:
+    return status_code, dumps({"detail": {"error": {"code": code, "message": message}}})
+
+
+class IdempotencyMiddleware:
+    """ASGI middleware applying Idempotency-Key semantics to selected routes."""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        routes: Iterable[Tuple[str, str]],
+        wait_timeout: float = 10.0,
+        poll_interval: float = 0.05,
+    ) -> None:
+        self.app = app
+        self.routes = {(method.upper(), path.rstrip("/")) for method, path in routes}
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        # Requests in flight in this worker, so local duplicates wait without polling
+        self._in_flight: Dict[str, asyncio.Event] = {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or (scope["method"], scope["path"].rstrip("/")) not in self.routes:
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        key = headers.get(IDEMPOTENCY_HEADER)
+        if key is None:
+            await self.app(scope, receive, send)
+            return
+
+        if not key or len(key) > MAX_KEY_LENGTH:
+            status, body = _error(
+                400, "INVALID_IDEMPOTENCY_KEY", f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters"
+            )
+            await self._send_error(send, status, body)
+            return
+
+        # Read the whole body so it can be fingerprinted and then replayed to the app
+        body = b""
+        more_body = True
+        while more_body:
+            message = await receive()
+            body += message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+        caller = hashlib.sha256(headers.get("authorization", "").encode()).hexdigest()
+        record_id = hashlib.sha256(
+            f"{scope['method']}|{scope['path']}|{caller}|{key}".encode()
+        ).hexdigest()
+        request_hash = hashlib.sha256(body).hexdigest()
+
+        state = scope["app"].state
+        collection = state.db[IDEMPOTENCY_COLLECTION]
+        claim_id = uuid.uuid4().hex
+        deadline = time.monotonic() + self.wait_timeout
+
+        while not await self._claim(collection, record_id, request_hash, claim_id, state.idempotency_claim_timeout):
+            try:
+                record = await self._wait_for_completion(collection, record_id, deadline)
+            except asyncio.TimeoutError:
+                status, body = _error(
+                    409,
+                    "IDEMPOTENCY_KEY_IN_PROGRESS",
+                    "A request with this Idempotency-Key has not completed; retry later",
+                )
+                await self._send_error(send, status, body)
+                return
+            if record is not None:
+                await self._replay(record, request_hash, send)
+                return
+            # The key was released or its claim went stale: try to claim it again
+
+        event = asyncio.Event()
+        self._in_flight[record_id] = event
+        try:
+            await self._run_and_store(scope, body, send, collection, record_id, claim_id)
+        finally:
+            event.set()
+            self._in_flight.pop(record_id, None)
+
+    async def _claim(
+        self, collection, record_id: str, request_hash: str, claim_id: str, claim_timeout: float
+    ) -> bool:
+        """Claim the key unless it has a stored response or a live claim."""
+        now = datetime.now(timezone.utc)
+        try:
+            await collection.update_one(
+                {
+                    "_id": record_id,
+                    "$nor": [
+                        {"state": "completed"},
+                        {"state": "in_progress", "claimed_until": {"$gt": now}},
+                    ],
+                },
+                {
+                    "$set": {
+                        "state": "in_progress",
+                        "claim_id": claim_id,
+                        "claimed_until": now + timedelta(seconds=claim_timeout),
+                        "request_hash": request_hash,
+                        "created_at": now,
+                    }
+                },
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            # The record exists and is not claimable
+            return False
+        return True
+
+    async def _run_and_store(
+        self, scope: Scope, body: bytes, send: Send, collection, record_id: str, claim_id: str
+    ) -> None:
+        body_sent = False
+
+        async def replay_receive() -> Message:
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return {"type": "http.disconnect"}
+
+        status_code = 500
+        headers: List[List[str]] = []
+        chunks = []
+
+        async def capture_send(message: Message) -> None:
+            nonlocal status_code, headers
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = [
+                    [name.decode("latin-1"), value.decode("latin-1")]
+                    for name, value in message.get("headers", [])
+                    if name.lower() != b"content-length"
+                ]
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+            await send(message)
+
+        # Only this claim's owner may release or complete the record; a stale
+        # claim may have been taken over by a retry in the meantime
+        owned = {"_id": record_id, "claim_id": claim_id}
+        try:
+            await self.app(scope, replay_receive, capture_send)
+        except BaseException:
+            await collection.delete_one(owned)
+            raise
+
+        if status_code >= 500 or status_code in NON_REPLAYABLE_STATUSES:
+            # Let the client retry with the same key
+            await collection.delete_one(owned)
+            return
+
+        await collection.update_one(
+            owned,
+            {
+                "$set": {
+                    "state": "completed",
+                    "status_code": status_code,
+                    "headers": headers,
+                    "body": b"".join(chunks),
+                },
+                "$unset": {"claimed_until": ""},
+            },
+        )
+
+    async def _replay(self, record: dict, request_hash: str, send: Send) -> None:
+        if record["request_hash"] != request_hash:
+            status, body = _error(
+                422, "IDEMPOTENCY_KEY_REUSED", "Idempotency-Key was already used with a different request body"
+            )
+            await self._send_error(send, status, body)
+            return
+
+        await self._send_stored(send, record["status_code"], record["headers"], record["body"], replayed=True)
+
+    async def _wait_for_completion(self, collection, record_id: str, deadline: float) -> Optional[dict]:
+        """Wait for a concurrent duplicate to finish and return its completed record.
+
+        Returns None once the key may be claimed again: the first attempt
+        released it, or its claim expired. Raises asyncio.TimeoutError if it
+        is still running at `deadline` (a ``time.monotonic()`` value).
+        """
+        while True:
+            record = await collection.find_one({"_id": record_id})
+            if record is None or record["state"] == "completed":
+                return record
+
+            claimed_until = record.get("claimed_until")
+            if claimed_until is None or claimed_until.replace(tzinfo=timezone.utc) <= datetime.now(timezone.utc):
+                return None
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise asyncio.TimeoutError
+
+            event = self._in_flight.get(record_id)
+            if event is not None:
+                try:
+                    await asyncio.wait_for(event.wait(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    pass
+            else:
+                # Owned by another worker: poll
+                await asyncio.sleep(min(self.poll_interval, remaining))
+
+    async def _send_error(self, send: Send, status_code: int, body: bytes) -> None:
+        await self._send_stored(send, status_code, [["content-type", "application/json"]], body, replayed=False)
+
+    async def _send_stored(
+        self, send: Send, status_code: int, headers: List[List[str]], body: bytes, replayed: bool
+    ) -> None:
+        raw_headers = [(name.encode("latin-1"), value.encode("latin-1")) for name, value in headers]
+        raw_headers.append((b"content-length", str(len(body)).encode("latin-1")))
+        if replayed:
+            raw_headers.append((b"idempotent-replayed", b"true"))
+        await send({"type": "http.response.start", "status": status_code, "headers": raw_headers})
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,55 @@
+"""High-throughput JSON response class used as the API default.
+
+Uses orjson when it is installed and falls back to the stdlib ``json``
+module otherwise. Both paths encode datetimes, Pydantic models and the
+``ErrorResponse`` shape the same way Pydantic's JSON mode does.
+"""
+
+import json
+from datetime import date, datetime, timezone
+from typing import Any
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - exercised only without orjson
+    orjson = None
+
+
+def _default(obj: Any) -> Any:
+    """Encode values the JSON backends do not handle natively."""
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    if isinstance(obj, datetime):
+        value = obj.isoformat()
+        # Match Pydantic/orjson OPT_UTC_Z output for UTC datetimes
+        if obj.utcoffset() is not None and obj.utcoffset() == timezone.utc.utcoffset(None):
+            value = value[:-6] + "Z"
+        return value
+    if isinstance(obj, date):
+        return obj.isoformat()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """Serialise content to compact UTF-8 JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        content,
+        default=_default,
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse that renders with orjson when available."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,49 @@
+"""Multi-worker launcher for the API.
+
+Runs ``server:app`` under uvicorn with N worker processes. Each worker runs
+``lifespan`` on its own (Mongo pool, agents, warm-up); in-process caches are
+kept consistent through the cache bus, which defaults to the Mongo-backed
+channel whenever more than one worker is started.
+
+Usage:
+    cd backend && python launcher.py --workers 4 --port 8001
+"""
+
+import argparse
+import os
+from pathlib import Path
+
+import uvicorn
+
+ROOT_DIR = Path(__file__).parent
+
+
+def default_workers() -> int:
+    return int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the API with multiple worker processes")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8001")))
+    parser.add_argument("--workers", type=int, default=default_workers())
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args(argv)
+
+    if args.workers > 1:
+        # Workers inherit the environment, so they all agree on shared backends
+        os.environ.setdefault("CACHE_BUS", "mongo")
+        os.environ.setdefault("LOGIN_RATE_LIMIT_BACKEND", "mongo")
+
+    uvicorn.run(
+        "server:app",
+        app_dir=str(ROOT_DIR),
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        log_level=args.log_level,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""Precomputed top-sellers leaderboard.
+
+``item_sales_daily`` holds one document per (day, item_code) with the
+quantity and revenue sold on delivered orders placed that day (UTC). It is
+incremented once per order when the order is delivered, so top-N queries
+for any window aggregate a few documents per item and day instead of
+scanning orders. Windows are therefore counted in whole UTC days.
+
+Each row lists the orders counted into it, and an increment only applies if
+its order is not listed yet. Recording an order again is therefore a no-op.
+Orders are flagged ``leaderboard_recorded`` after their rows are written. A
+worker that dies in between leaves the flag unset, and
+``record_unrecorded_orders`` finishes the job. At startup it runs through
+``repair_leaderboard``, which lets only one worker claim it.
+"""
+
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+LEADERBOARD_COLLECTION = "item_sales_daily"
+# One claim document per repair job, so only one worker runs it
+REPAIRS_COLLECTION = "leaderboard_repairs"
+REPAIR_CLAIM_TIMEOUT = timedelta(minutes=30)
+REPAIR_INTERVAL = timedelta(hours=1)
+DUPLICATE_KEY = 11000
+
+
+def day_bucket(value: datetime) -> datetime:
+    """Truncate a datetime to its UTC day; naive datetimes are taken as UTC."""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+async def ensure_leaderboard_indexes(db) -> None:
+    await db[LEADERBOARD_COLLECTION].create_index([("day", 1), ("category", 1)])
+
+
+async def _write_rows(collection, operations: List[UpdateOne]) -> None:
+    try:
+        await collection.bulk_write(operations, ordered=False)
+    except BulkWriteError as exc:
+        errors = exc.details.get("writeErrors", [])
+        if any(error["code"] != DUPLICATE_KEY for error in errors):
+            raise
+        # The row exists: it either counts this order already, or another
+        # order created it concurrently. Retrying against it settles which.
+        retry = [operations[error["index"]] for error in errors]
+        try:
+            await collection.bulk_write(retry, ordered=False)
+        except BulkWriteError as retry_exc:
+            if any(error["code"] != DUPLICATE_KEY for error in retry_exc.details.get("writeErrors", [])):
+                raise
+
+
+async def _item_categories(db, item_ids: List[str]) -> Dict[str, Optional[str]]:
+    return {
+        item["_id"]: item.get("category")
+        async for item in db.jewellery_items.find({"_id": {"$in": item_ids}}, {"category": 1})
+    }
+
+
+def _row_operations(order: dict, categories: Dict[str, Optional[str]]) -> List[UpdateOne]:
+    day = day_bucket(order["order_date"])
+    return [
+        UpdateOne(
+            {"_id": f"{day.date().isoformat()}:{item['item_code']}", "orders": {"$ne": order["_id"]}},
+            {
+                "$inc": {"quantity": item["quantity"], "revenue": item["subtotal"]},
+                "$push": {"orders": order["_id"]},
+                "$set": {"name": item["name"]},
+                "$setOnInsert": {
+                    "day": day,
+                    "item_code": item["item_code"],
+                    "category": categories.get(item["item_id"]),
+                },
+            },
+            upsert=True,
+        )
+        for item in order["items"]
+    ]
+
+
+async def record_delivered_order(db, order: dict) -> bool:
+    """
+    Add a delivered order's items to the leaderboard exactly once.
+    Rows skip orders they already count, so retries, concurrent staff
+    updates and repairs cannot count it twice. Returns False if it was
+    already recorded.
+    """
+    if order.get("leaderboard_recorded"):
+        return False
+
+    categories = await _item_categories(db, [item["item_id"] for item in order["items"]])
+    operations = _row_operations(order, categories)
+    if operations:
+        await _write_rows(db[LEADERBOARD_COLLECTION], operations)
+
+    flagged = await db.orders.update_one(
+        {"_id": order["_id"], "status": "delivered", "leaderboard_recorded": {"$ne": True}},
+        {"$set": {"leaderboard_recorded": True}},
+    )
+    return bool(flagged.modified_count)
+
+
+async def record_unrecorded_orders(db, batch_size: int = 500) -> int:
+    """
+    Record delivered orders whose recording was interrupted, a batch at a
+    time: one item lookup, one row write and one flag update per batch.
+    Returns orders recorded.
+    """
+    recorded = 0
+    query = {"status": "delivered", "leaderboard_recorded": {"$ne": True}}
+    last_id = None
+    while True:
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        batch = await (
+            db.orders.find(query, {"items": 1, "order_date": 1})
+            .sort("_id", 1)
+            .limit(batch_size)
+            .to_list(length=batch_size)
+        )
+        if not batch:
+            return recorded
+        last_id = batch[-1]["_id"]
+
+        categories = await _item_categories(
+            db, list({item["item_id"] for order in batch for item in order["items"]})
+        )
+        operations = [operation for order in batch for operation in _row_operations(order, categories)]
+        if operations:
+            await _write_rows(db[LEADERBOARD_COLLECTION], operations)
+
+        flagged = await db.orders.update_many(
+            {
+                "_id": {"$in": [order["_id"] for order in batch]},
+                "status": "delivered",
+                "leaderboard_recorded": {"$ne": True},
+            },
+            {"$set": {"leaderboard_recorded": True}},
+        )
+        recorded += flagged.modified_count
+        if len(batch) < batch_size:
+            return recorded
+
+
+async def repair_leaderboard(db) -> int:
+    """
+    Run ``record_unrecorded_orders`` on one worker only. Workers starting
+    together race for a claim document; the others skip the repair, as do
+    workers starting within ``REPAIR_INTERVAL`` of the last completed one.
+    Returns orders recorded.
+    """
+    now = datetime.now(timezone.utc)
+    try:
+        await db[REPAIRS_COLLECTION].update_one(
+            {
+                "_id": LEADERBOARD_COLLECTION,
+                "$nor": [
+                    {"status": "running", "started_at": {"$gte": now - REPAIR_CLAIM_TIMEOUT}},
+                    {"status": "completed", "completed_at": {"$gte": now - REPAIR_INTERVAL}},
+                ],
+            },
+            {"$set": {"status": "running", "started_at": now, "worker": os.getpid()}},
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        return 0
+
+    claim = {"_id": LEADERBOARD_COLLECTION, "status": "running", "started_at": now}
+    try:
+        recorded = await record_unrecorded_orders(db)
+    except BaseException:
+        await db[REPAIRS_COLLECTION].update_one(claim, {"$set": {"status": "failed"}})
+        raise
+    await db[REPAIRS_COLLECTION].update_one(
+        claim, {"$set": {"status": "completed", "completed_at": datetime.now(timezone.utc)}}
+    )
+    return recorded
+
+
+async def top_sellers(
+    db,
+    start: datetime,
+    end: datetime,
+    limit: int = 10,
+    category: Optional[str] = None,
+) -> List[dict]:
+    """Top items by quantity for orders placed between start and end (day granularity)."""
+    match = {"day": {"$gte": day_bucket(start), "$lte": end}}
+    if category:
+        match["category"] = category
+
+    pipeline = [
+        {"$match": match},
+        {
+            "$group": {
+                "_id": "$item_code",
+                "name": {"$last": "$name"},
+                "quantity": {"$sum": "$quantity"},
+            }
+        },
+        {"$sort": {"quantity": -1, "_id": 1}},
+        {"$limit": limit},
+    ]
+    rows = await db[LEADERBOARD_COLLECTION].aggregate(pipeline).to_list(length=limit)
+    return [{"item_code": row["_id"], "name": row["name"], "quantity": row["quantity"]} for row in rows]
+
+
+async def rebuild_leaderboard(db) -> int:
+    """Recompute the leaderboard from every delivered order. Returns orders counted."""
+    await db[LEADERBOARD_COLLECTION].delete_many({})
+    await db.orders.update_many({}, {"$unset": {"leaderboard_recorded": ""}})
+
+    return await record_unrecorded_orders(db)
@@ -0,0 +1,374 @@
+"""Prometheus metrics in the text exposition format.
+
+Request counts, an in-flight gauge and latency histograms are kept per route
+template (``/api/inventory/items/{item_id}``, not the raw path), so the label
+set stays bounded. Counters and histograms are plain Python numbers updated
+on the event loop, with no locks on the request path; values owned by other
+components (Mongo pool counters, cache hit/miss counts) are read through
+collectors only when ``/metrics`` is scraped.
+
+Every worker process keeps its own registry, so with several workers scrape
+each one directly (or run one worker per scrape target) rather than through
+a shared load balancer.
+
+``/metrics`` exposes per-route traffic and pool internals, so it is only
+served with a bearer token, or to anyone when ``METRICS_ALLOW_ANONYMOUS`` is
+set for a port that only the scraper can reach. Settings are read in the
+lifespan, after ``.env`` is loaded, and kept on ``app.state.metrics_settings``.
+
+Configuration (environment):
+    METRICS_ENABLED           serve /metrics and record request metrics (default true)
+    METRICS_TOKEN             bearer token required to scrape /metrics (default none: not served)
+    METRICS_ALLOW_ANONYMOUS   serve /metrics without a token (default false)
+"""
+
+import bisect
+import os
+import secrets
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; covers cached reads through to slow report aggregations
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# LLM and tool round trips are slower
+AGENT_BUCKETS = (0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+# (name, labels, value) produced by a collector at scrape time
+Sample = Tuple[str, Dict[str, str], float]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric(ABC):
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: Sequence[str]) -> Tuple[str, ...]:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {labels}")
+        return tuple(labels)
+
+    def _labels(self, key: Tuple[str, ...]) -> Dict[str, str]:
+        return dict(zip(self.labelnames, key))
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    @abstractmethod
+    def render(self) -> List[str]:
+        """Sample lines for this metric; the HELP and TYPE lines come from header()."""
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        # An unlabelled series is exported as 0 before its first update
+        self._values: Dict[Tuple[str, ...], float] = {} if self.labelnames else {(): 0}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def render(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self._labels(key))} {_format_value(value)}"
+            for key, value in list(self._values.items())
+        ]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        # An unlabelled series is exported as 0 before its first update
+        self._values: Dict[Tuple[str, ...], float] = {} if self.labelnames else {(): 0}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value: float, *labels: str) -> None:
+        self._values[self._key(labels)] = value
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def render(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self._labels(key))} {_format_value(value)}"
+            for key, value in list(self._values.items())
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [per-bucket counts..., +Inf count, sum]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        key = self._key(labels)
+        counts = self._values.get(key)
+        if counts is None:
+            counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def count(self, *labels: str) -> int:
+        counts = self._values.get(self._key(labels))
+        return int(sum(counts[:-1])) if counts else 0
+
+    def render(self) -> List[str]:
+        lines = []
+        for key, counts in list(self._values.items()):
+            labels = self._labels(key)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts[:-1]):
+                cumulative += count
+                bucket_labels = {**labels, "le": _format_value(bound)}
+                lines.append(f"{self.name}_bucket{_format_labels(bucket_labels)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(counts[-1])}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {cumulative}")
+        return lines
+
+
+@dataclass
+class _CollectorFamily:
+    name: str
+    kind: str
+    documentation: str
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._families: Dict[str, _CollectorFamily] = {}
+        self._collectors: Dict[str, Callable[[], Iterable[Sample]]] = {}
+
+    def _add(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics or metric.name in self._families:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._add(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._add(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._add(Histogram(name, documentation, labelnames, buckets))
+
+    def describe(self, name: str, kind: str, documentation: str) -> None:
+        """Declare a family whose samples come from collectors."""
+        self._families[name] = _CollectorFamily(name, kind, documentation)
+
+    def register_collector(self, key: str, collector: Callable[[], Iterable[Sample]]) -> None:
+        """Add or replace a scrape-time collector; replacing keeps lifespan restarts idempotent."""
+        self._collectors[key] = collector
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.header())
+            lines.extend(metric.render())
+
+        collected: Dict[str, List[str]] = {}
+        for collector in list(self._collectors.values()):
+            for name, labels, value in collector():
+                collected.setdefault(name, []).append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        for name, samples in collected.items():
+            family = self._families.get(name)
+            if family is not None:
+                lines.append(f"# HELP {name} {family.documentation}")
+                lines.append(f"# TYPE {name} {family.kind}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+http_requests_total = registry.counter(
+    "http_requests_total", "HTTP requests completed.", ("method", "route", "status")
+)
+http_requests_in_flight = registry.gauge("http_requests_in_flight", "HTTP requests currently being served.")
+http_request_duration_seconds = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template.", ("method", "route")
+)
+agent_call_duration_seconds = registry.histogram(
+    "agent_call_duration_seconds", "AI agent execution latency.", ("agent", "outcome"), buckets=AGENT_BUCKETS
+)
+
+registry.describe("mongo_pool_checkouts_total", "counter", "Mongo connection checkouts.")
+registry.describe("mongo_pool_checkout_failures_total", "counter", "Mongo connection checkouts that failed.")
+registry.describe("mongo_pool_checked_out", "gauge", "Mongo connections currently checked out.")
+registry.describe("mongo_pool_wait_seconds_total", "counter", "Time spent waiting for a Mongo connection.")
+registry.describe("mongo_pool_wait_seconds_max", "gauge", "Longest wait for a Mongo connection.")
+registry.describe("mongo_pool_connections_created_total", "counter", "Mongo connections opened.")
+registry.describe("mongo_pool_connections_closed_total", "counter", "Mongo connections closed.")
+registry.describe("cache_hits_total", "counter", "Cache lookups served from the cache.")
+registry.describe("cache_misses_total", "counter", "Cache lookups that missed.")
+registry.describe("cache_hit_ratio", "gauge", "Share of cache lookups that hit since start.")
+registry.describe("cache_entries", "gauge", "Entries held by an in-process cache.")
+registry.describe("reservation_sweeps_total", "counter", "Reservation sweeps completed.")
+registry.describe("reservation_sweep_failures_total", "counter", "Reservation sweeps that failed.")
+registry.describe("reservation_orders_cancelled_total", "counter", "Pending orders cancelled as expired.")
+registry.describe("reservation_items_released_total", "counter", "Reserved pieces returned to available.")
+registry.describe(
+    "reservation_orphans_released_total", "counter", "Pieces released because their order was never written."
+)
+
+
+def pool_collector(pool_monitor) -> Callable[[], Iterable[Sample]]:
+    def collect() -> Iterable[Sample]:
+        stats = pool_monitor.snapshot()
+        return [
+            ("mongo_pool_checkouts_total", {}, stats["checkouts"]),
+            ("mongo_pool_checkout_failures_total", {}, stats["checkout_failures"]),
+            ("mongo_pool_checked_out", {}, stats["checked_out"]),
+            ("mongo_pool_wait_seconds_total", {}, stats["wait_total_ms"] / 1000),
+            ("mongo_pool_wait_seconds_max", {}, stats["wait_max_ms"] / 1000),
+            ("mongo_pool_connections_created_total", {}, stats["connections_created"]),
+            ("mongo_pool_connections_closed_total", {}, stats["connections_closed"]),
+        ]
+
+    return collect
+
+
+def cache_collector(caches: Dict[str, object]) -> Callable[[], Iterable[Sample]]:
+    """Samples for objects with a ``stats()`` dict of hits, misses, hit_ratio and optional size."""
+
+    def collect() -> Iterable[Sample]:
+        samples: List[Sample] = []
+        for name, cache in caches.items():
+            stats = cache.stats()
+            labels = {"cache": name}
+            samples.append(("cache_hits_total", labels, stats["hits"]))
+            samples.append(("cache_misses_total", labels, stats["misses"]))
+            samples.append(("cache_hit_ratio", labels, stats["hit_ratio"]))
+            if "size" in stats:
+                samples.append(("cache_entries", labels, stats["size"]))
+        return samples
+
+    return collect
+
+
+def sweeper_collector(sweeper) -> Callable[[], Iterable[Sample]]:
+    def collect() -> Iterable[Sample]:
+        stats = sweeper.stats
+        return [
+            ("reservation_sweeps_total", {}, stats.runs),
+            ("reservation_sweep_failures_total", {}, stats.failures),
+            ("reservation_orders_cancelled_total", {}, stats.orders_cancelled),
+            ("reservation_items_released_total", {}, stats.items_released),
+            ("reservation_orphans_released_total", {}, stats.orphans_released),
+        ]
+
+    return collect
+
+
+@dataclass
+class MetricsSettings:
+    enabled: bool = True
+    token: Optional[str] = None
+    allow_anonymous: bool = False
+
+    @classmethod
+    def from_env(cls) -> "MetricsSettings":
+        return cls(
+            enabled=os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes"),
+            token=os.getenv("METRICS_TOKEN") or None,
+            allow_anonymous=os.getenv("METRICS_ALLOW_ANONYMOUS", "false").lower() in ("1", "true", "yes"),
+        )
+
+    @property
+    def served(self) -> bool:
+        return self.enabled and (self.token is not None or self.allow_anonymous)
+
+    def authorized(self, authorization: Optional[str]) -> bool:
+        if self.token is None:
+            return self.allow_anonymous
+        return secrets.compare_digest(authorization or "", f"Bearer {self.token}")
+
+
+class MetricsMiddleware:
+    """ASGI middleware counting requests and timing them per route template."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        settings: Optional[MetricsSettings] = (
+            getattr(scope["app"].state, "metrics_settings", None) if scope["type"] == "http" else None
+        )
+        if settings is None or not settings.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_requests_in_flight.dec()
+            route = scope.get("route")
+            # Unmatched paths share one label so scanners cannot grow the series count
+            template = route.path if route is not None else "unmatched"
+            method = scope["method"]
+            http_request_duration_seconds.observe(time.perf_counter() - started, method, template)
+            http_requests_total.inc(method, template, str(status))
@@ -37,9 +37,21 @@ class LoginRequest(BaseModel):
 
 class LoginResponse(BaseModel):
     token: str
+    refresh_token: str
+    expires_in: int  # access token lifetime in seconds
     user: User
 
 
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+
+class RefreshResponse(BaseModel):
+    token: str
+    refresh_token: str
+    expires_in: int
+
+
 # Jewellery Item models
 ItemStatus = Literal["available", "sold", "reserved"]
 
@@ -55,6 +67,7 @@ class JewelleryItem(BaseModel):
     material: str
     images: List[str] = Field(default_factory=list)
     status: ItemStatus = "available"
+    version: int = 1  # incremented on every write, for optimistic concurrency
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
@@ -111,6 +124,7 @@ class JewelleryItemUpdate(BaseModel):
     material: Optional[str] = None
     images: Optional[List[str]] = None
     status: Optional[ItemStatus] = None
+    version: Optional[int] = None  # expected current version; 409 on mismatch
 
 
 class JewelleryItemsResponse(BaseModel):
@@ -144,6 +158,7 @@ class Order(BaseModel):
     payment_method: Literal["COD"] = "COD"
     order_date: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     delivery_date: Optional[datetime] = None
+    version: int = 1  # incremented on every write, for optimistic concurrency
 
     @field_validator("customer_name")
     @classmethod
@@ -189,6 +204,7 @@ class OrderCreate(BaseModel):
 class OrderStatusUpdate(BaseModel):
     status: OrderStatus
     delivery_date: Optional[datetime] = None
+    version: Optional[int] = None  # expected current version; 409 on mismatch
 
 
 class OrdersResponse(BaseModel):
@@ -197,6 +213,20 @@ class OrdersResponse(BaseModel):
     total: int
 
 
+class CustomerSummary(BaseModel):
+    customer_phone_normalised: str
+    customer_name: str  # from the most recent order
+    order_count: int
+    lifetime_spend: int  # cents, delivered orders only
+    last_order_date: datetime
+
+
+class CustomerHistoryResponse(BaseModel):
+    phone: str
+    customers: List[CustomerSummary]
+    orders: List[Order]
+
+
 # Report models
 class InventoryReport(BaseModel):
     total_items: int
@@ -220,9 +250,60 @@ class SalesReport(BaseModel):
     pending_orders: int
     total_revenue: int  # cents
     date_range: dict[str, str]
+    # From the daily leaderboard, so counted over the whole UTC days overlapping
+    # date_range: a window starting or ending mid-day can differ from the totals
     top_selling_items: List[TopSellingItem]
 
 
+class TopSellersReport(BaseModel):
+    date_range: dict[str, str]
+    category: Optional[str] = None
+    items: List[TopSellingItem]
+
+
+class SalesTimeseriesBucket(BaseModel):
+    bucket_start: datetime
+    orders: int
+    completed_orders: int
+    revenue: int  # cents, delivered orders only
+
+
+class SalesTimeseries(BaseModel):
+    interval: str
+    timezone: str
+    date_range: dict[str, str]
+    buckets: List[SalesTimeseriesBucket]
+    truncated: bool = False
+
+
+class ReportJobRequest(BaseModel):
+    report: Literal["sales", "inventory"]
+    # sales
+    start_date: Optional[str] = None
+    end_date: Optional[str] = None
+    # inventory
+    category: Optional[str] = None
+    material: Optional[str] = None
+
+
+class ReportJob(BaseModel):
+    id: str
+    report: str
+    params: dict[str, str]
+    status: Literal["running", "completed", "failed"]
+    result: Optional[dict] = None  # latest completed snapshot, kept while a refresh runs
+    error: Optional[str] = None
+    requested_at: datetime
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+
+
+# Admin models
+class CacheInvalidateRequest(BaseModel):
+    cache: str
+    key: Optional[str] = None  # omit to clear the whole cache
+
+
 # Error model
 class ErrorResponse(BaseModel):
     error: dict[str, str]
\ No newline at end of file
@@ -0,0 +1,107 @@
+"""Order status state machine and the inventory changes each transition implies.
+
+Placing an order reserves its pieces. Delivering it marks them sold and
+cancelling it releases them back to ``available``. Every item write is a
+single ``update_many`` scoped to the pieces this order reserved, so
+re-applying a transition (client retries, concurrent staff updates, or a
+crash between the order and item writes) is a no-op rather than a double
+release.
+"""
+
+from datetime import datetime, timezone
+from typing import Dict, FrozenSet, List
+
+from models import OrderStatus
+
+# Allowed target statuses per current status; delivered and cancelled are terminal
+ORDER_TRANSITIONS: Dict[str, FrozenSet[str]] = {
+    "pending": frozenset({"confirmed", "cancelled"}),
+    "confirmed": frozenset({"delivered", "cancelled"}),
+    "delivered": frozenset(),
+    "cancelled": frozenset(),
+}
+
+
+def allowed_sources(target: OrderStatus) -> List[str]:
+    """Statuses an order may be in for a transition to `target`."""
+    return [source for source, targets in ORDER_TRANSITIONS.items() if target in targets]
+
+
+def order_item_ids(order: dict) -> List[str]:
+    return list({item["item_id"] for item in order["items"]})
+
+
+async def reserve_item(db, item_id: str, order_id: str):
+    """Atomically move one available piece to reserved for an order."""
+    return await db.jewellery_items.find_one_and_update(
+        {"_id": item_id, "status": "available"},
+        {
+            "$set": {
+                "status": "reserved",
+                "reserved_order_id": order_id,
+                "updated_at": datetime.now(timezone.utc),
+            },
+            "$inc": {"version": 1},
+        },
+    )
+
+
+async def release_items(db, order_id: str, item_ids: List[str]) -> int:
+    """Return pieces reserved by an order to available. Returns items released."""
+    if not item_ids:
+        return 0
+    result = await db.jewellery_items.update_many(
+        {"_id": {"$in": item_ids}, "status": "reserved", "reserved_order_id": order_id},
+        {
+            "$set": {"status": "available", "updated_at": datetime.now(timezone.utc)},
+            "$unset": {"reserved_order_id": ""},
+            "$inc": {"version": 1},
+        },
+    )
+    return result.modified_count
+
+
+async def release_orders_items(db, order_ids: List[str]) -> int:
+    """Release every piece reserved by any of the given orders in one write."""
+    if not order_ids:
+        return 0
+    result = await db.jewellery_items.update_many(
+        {"status": "reserved", "reserved_order_id": {"$in": order_ids}},
+        {
+            "$set": {"status": "available", "updated_at": datetime.now(timezone.utc)},
+            "$unset": {"reserved_order_id": ""},
+            "$inc": {"version": 1},
+        },
+    )
+    return result.modified_count
+
+
+async def mark_items_sold(db, order_id: str, item_ids: List[str]) -> int:
+    """Mark an order's pieces sold. Returns items updated."""
+    if not item_ids:
+        return 0
+    result = await db.jewellery_items.update_many(
+        {
+            "_id": {"$in": item_ids},
+            "$or": [
+                {"status": "reserved", "reserved_order_id": order_id},
+                # Orders placed before reservations existed never reserved stock
+                {"status": "available", "reserved_order_id": {"$exists": False}},
+            ],
+        },
+        {
+            "$set": {"status": "sold", "updated_at": datetime.now(timezone.utc)},
+            "$unset": {"reserved_order_id": ""},
+            "$inc": {"version": 1},
+        },
+    )
+    return result.modified_count
+
+
+async def apply_item_transition(db, order: dict) -> int:
+    """Bring an order's pieces in line with its current status."""
+    if order["status"] == "delivered":
+        return await mark_items_sold(db, order["_id"], order_item_ids(order))
+    if order["status"] == "cancelled":
+        return await release_items(db, order["_id"], order_item_ids(order))
+    return 0
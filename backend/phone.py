@@ -0,0 +1,45 @@
+"""Phone number normalisation for customer lookups.
+
+Orders store ``customer_phone_normalised`` next to the number as typed, and
+every phone filter matches on it. Orders written before the field existed
+are backfilled in the background at startup.
+"""
+
+import re
+
+from pymongo import UpdateOne
+
+_NON_DIGITS = re.compile(r"\D")
+
+
+def normalise_phone(phone: str) -> str:
+    """
+    Reduce a free-text phone number to its digits.
+    "+1 (234) 567-890" and "1234567890" normalise to the same key.
+    """
+    return _NON_DIGITS.sub("", phone or "")
+
+
+async def ensure_customer_phone_indexes(db) -> None:
+    await db.orders.create_index([("customer_phone_normalised", 1), ("order_date", -1)])
+
+
+async def backfill_normalised_phones(db, batch_size: int = 1000) -> int:
+    """Store the normalised phone on orders that lack it. Returns orders updated."""
+    backfilled = 0
+    missing = {"customer_phone_normalised": {"$exists": False}}
+    while True:
+        batch = await db.orders.find(missing, {"customer_phone": 1}).limit(batch_size).to_list(length=batch_size)
+        if not batch:
+            return backfilled
+        await db.orders.bulk_write(
+            [
+                UpdateOne(
+                    {"_id": order["_id"], **missing},
+                    {"$set": {"customer_phone_normalised": normalise_phone(order.get("customer_phone"))}},
+                )
+                for order in batch
+            ],
+            ordered=False,
+        )
+        backfilled += len(batch)
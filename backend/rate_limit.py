@@ -0,0 +1,224 @@
+"""Sliding-window throttling of failed logins.
+
+Failed attempts are counted per email and per client IP over
+``LOGIN_RATE_LIMIT_WINDOW_SECONDS``. Once a key reaches its limit, further
+logins are rejected with 429 and ``Retry-After`` *before* the password is
+checked, so bad-password floods cannot pin CPU on bcrypt. A successful
+login clears the email's failures.
+
+Attempts are kept in an ``AttemptStore``. ``LocalAttemptStore`` is in-process
+and the default. ``MongoAttemptStore`` shares attempts across workers
+through a TTL-indexed collection. Either way, a key found over the limit is
+remembered locally until it frees up, so rejections stay in-memory.
+
+The per-IP key uses the socket peer unless that peer is one of
+``LOGIN_TRUSTED_PROXIES`` (comma-separated addresses or CIDR ranges, e.g.
+the ingress in front of the API). Then the client is the right-most
+``X-Forwarded-For`` hop that is not itself a trusted proxy. Without this,
+every login behind a proxy shares the proxy's address and one client's
+failures lock everyone out. Leave it empty when clients connect directly:
+a client can write any ``X-Forwarded-For`` it likes.
+"""
+
+import ipaddress
+import math
+import os
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Deque, Dict, List, Tuple
+
+from fastapi import HTTPException, Request
+
+from database import env_int
+
+LOGIN_ATTEMPTS_COLLECTION = "login_attempts"
+MAX_BLOCKED_KEYS = 100_000
+
+
+@dataclass
+class RateLimitSettings:
+    enabled: bool = True
+    email_limit: int = 5
+    ip_limit: int = 20
+    window_seconds: int = 300
+    trusted_proxies: Tuple[str, ...] = ()
+
+    @classmethod
+    def from_env(cls) -> "RateLimitSettings":
+        return cls(
+            enabled=os.getenv("LOGIN_RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes"),
+            email_limit=env_int("LOGIN_RATE_LIMIT_PER_EMAIL", cls.email_limit),
+            ip_limit=env_int("LOGIN_RATE_LIMIT_PER_IP", cls.ip_limit),
+            window_seconds=env_int("LOGIN_RATE_LIMIT_WINDOW_SECONDS", cls.window_seconds),
+            trusted_proxies=tuple(
+                proxy.strip() for proxy in os.getenv("LOGIN_TRUSTED_PROXIES", "").split(",") if proxy.strip()
+            ),
+        )
+
+
+class AttemptStore(ABC):
+    """Timestamps (epoch seconds) of failed attempts per key."""
+
+    @abstractmethod
+    async def add(self, key: str, at: float) -> None:
+        """Record a failed attempt."""
+
+    @abstractmethod
+    async def recent(self, key: str, since: float) -> List[float]:
+        """Attempts after `since`, oldest first."""
+
+    @abstractmethod
+    async def clear(self, key: str) -> None:
+        """Forget every attempt for a key."""
+
+    async def ensure_indexes(self, window_seconds: int) -> None:
+        pass
+
+
+class LocalAttemptStore(AttemptStore):
+    """In-process store: limits apply per worker."""
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._attempts: Dict[str, Deque[float]] = {}
+
+    async def add(self, key: str, at: float) -> None:
+        if key not in self._attempts and len(self._attempts) >= self.max_keys:
+            # Bound memory under key-spraying: forget the oldest key
+            del self._attempts[next(iter(self._attempts))]
+        self._attempts.setdefault(key, deque()).append(at)
+
+    async def recent(self, key: str, since: float) -> List[float]:
+        attempts = self._attempts.get(key)
+        if not attempts:
+            return []
+        while attempts and attempts[0] <= since:
+            attempts.popleft()
+        if not attempts:
+            del self._attempts[key]
+            return []
+        return list(attempts)
+
+    async def clear(self, key: str) -> None:
+        self._attempts.pop(key, None)
+
+
+class MongoAttemptStore(AttemptStore):
+    """Store shared by every worker through a TTL-indexed collection."""
+
+    def __init__(self, db):
+        self.collection = db[LOGIN_ATTEMPTS_COLLECTION]
+
+    async def ensure_indexes(self, window_seconds: int) -> None:
+        await self.collection.create_index([("key", 1), ("at", 1)])
+        await self.collection.create_index("at", expireAfterSeconds=window_seconds)
+
+    async def add(self, key: str, at: float) -> None:
+        await self.collection.insert_one({"key": key, "at": datetime.fromtimestamp(at, timezone.utc)})
+
+    async def recent(self, key: str, since: float) -> List[float]:
+        cursor = self.collection.find(
+            {"key": key, "at": {"$gt": datetime.fromtimestamp(since, timezone.utc)}}, {"at": 1, "_id": 0}
+        ).sort("at", 1)
+        return [doc["at"].replace(tzinfo=timezone.utc).timestamp() async for doc in cursor]
+
+    async def clear(self, key: str) -> None:
+        await self.collection.delete_many({"key": key})
+
+
+class LoginRateLimiter:
+    """Reject logins for emails or IPs with too many recent failures."""
+
+    def __init__(self, store: AttemptStore, settings: RateLimitSettings):
+        self.store = store
+        self.settings = settings
+        # A malformed LOGIN_TRUSTED_PROXIES entry fails startup rather than trusting nothing
+        self._trusted_networks = [ipaddress.ip_network(proxy, strict=False) for proxy in settings.trusted_proxies]
+        # key -> epoch seconds until which it is known to be over the limit
+        self._blocked_until: Dict[str, float] = {}
+        self.rejected = 0
+
+    def _is_trusted(self, address: str) -> bool:
+        try:
+            ip = ipaddress.ip_address(address)
+        except ValueError:
+            return False
+        return any(ip in network for network in self._trusted_networks)
+
+    def client_ip(self, request: Request) -> str:
+        """The address to throttle: the peer, or the forwarded client behind trusted proxies."""
+        peer = request.client.host if request.client else "unknown"
+        if not self._is_trusted(peer):
+            return peer
+        hops = [hop.strip() for hop in request.headers.get("x-forwarded-for", "").split(",") if hop.strip()]
+        for hop in reversed(hops):
+            if not self._is_trusted(hop):
+                return hop
+        return hops[0] if hops else peer
+
+    def _keys(self, email: str, ip: str) -> List[Tuple[str, int]]:
+        return [(f"email:{email.lower()}", self.settings.email_limit), (f"ip:{ip}", self.settings.ip_limit)]
+
+    async def check(self, email: str, ip: str) -> None:
+        """Raise 429 if either key is over its limit."""
+        if not self.settings.enabled:
+            return
+
+        now = time.time()
+        retry_after = 0.0
+        for key, limit in self._keys(email, ip):
+            blocked_until = self._blocked_until.get(key)
+            if blocked_until is not None:
+                if blocked_until > now:
+                    retry_after = max(retry_after, blocked_until - now)
+                    continue
+                del self._blocked_until[key]
+
+            attempts = await self.store.recent(key, now - self.settings.window_seconds)
+            if len(attempts) >= limit:
+                # Free once enough of the oldest attempts slide out of the window
+                until = attempts[len(attempts) - limit] + self.settings.window_seconds
+                if len(self._blocked_until) >= MAX_BLOCKED_KEYS:
+                    self._blocked_until = {k: v for k, v in self._blocked_until.items() if v > now}
+                self._blocked_until[key] = until
+                retry_after = max(retry_after, until - now)
+
+        if retry_after > 0:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=429,
+                detail={"error": {"code": "TOO_MANY_LOGIN_ATTEMPTS", "message": "Too many failed login attempts"}},
+                headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+            )
+
+    async def ensure_indexes(self) -> None:
+        await self.store.ensure_indexes(self.settings.window_seconds)
+
+    async def record_failure(self, email: str, ip: str) -> None:
+        if not self.settings.enabled:
+            return
+        now = time.time()
+        for key, _ in self._keys(email, ip):
+            await self.store.add(key, now)
+
+    async def record_success(self, email: str) -> None:
+        if not self.settings.enabled:
+            return
+        key = f"email:{email.lower()}"
+        self._blocked_until.pop(key, None)
+        await self.store.clear(key)
+
+
+def create_login_rate_limiter(db) -> LoginRateLimiter:
+    """Pick the attempt store from LOGIN_RATE_LIMIT_BACKEND ("local" or "mongo")."""
+    backend = os.getenv("LOGIN_RATE_LIMIT_BACKEND", "local").lower()
+    if backend == "mongo":
+        store = MongoAttemptStore(db)
+    elif backend == "local":
+        store = LocalAttemptStore()
+    else:
+        raise RuntimeError(f"Unknown LOGIN_RATE_LIMIT_BACKEND {backend!r}; expected 'local' or 'mongo'")
+    return LoginRateLimiter(store, RateLimitSettings.from_env())
@@ -0,0 +1,138 @@
+"""Rotating refresh tokens for short-lived access tokens.
+
+Refresh tokens are opaque random strings. Only their SHA-256 digest is
+stored in ``refresh_tokens`` (TTL-indexed on ``expires_at``). Each login
+starts a session (``family_id``). Every refresh consumes the presented token
+and issues a new one in the same family. Presenting a consumed token again
+means it leaked, so the whole family is revoked.
+
+Two tabs refreshing at once, or a client retrying a refresh whose response
+it never got, also present a consumed token. Within
+``REFRESH_TOKEN_REUSE_GRACE_SECONDS`` of its rotation, such a token gets the
+same successor instead: the successor is derived from the consumed token
+with an HMAC under the JWT secret, so it can be handed out again without
+storing it.
+"""
+
+import base64
+import hashlib
+import hmac
+import secrets
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+from pymongo.errors import DuplicateKeyError
+
+from auth import SECRET_KEY
+from database import env_int
+
+REFRESH_TOKENS_COLLECTION = "refresh_tokens"
+
+
+@dataclass
+class RefreshTokenSettings:
+    expire_days: int = 14
+    # A consumed token presented again this soon after its rotation is a retry, not a leak
+    reuse_grace_seconds: int = 30
+
+    @classmethod
+    def from_env(cls) -> "RefreshTokenSettings":
+        return cls(
+            expire_days=env_int("REFRESH_TOKEN_EXPIRE_DAYS", cls.expire_days),
+            reuse_grace_seconds=env_int("REFRESH_TOKEN_REUSE_GRACE_SECONDS", cls.reuse_grace_seconds),
+        )
+
+
+def _digest(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def _successor(token: str) -> str:
+    mac = hmac.new(SECRET_KEY.encode(), f"refresh:{token}".encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(mac).rstrip(b"=").decode()
+
+
+def _invalid_refresh_token() -> HTTPException:
+    return HTTPException(
+        status_code=401,
+        detail={"error": {"code": "INVALID_REFRESH_TOKEN", "message": "Refresh token is invalid or expired"}},
+    )
+
+
+async def ensure_refresh_token_indexes(db) -> None:
+    await db[REFRESH_TOKENS_COLLECTION].create_index("expires_at", expireAfterSeconds=0)
+    await db[REFRESH_TOKENS_COLLECTION].create_index("family_id")
+    await db[REFRESH_TOKENS_COLLECTION].create_index("user_id")
+
+
+async def issue_refresh_token(
+    db,
+    settings: RefreshTokenSettings,
+    user_id: str,
+    family_id: Optional[str] = None,
+    rotated_from: Optional[str] = None,
+) -> Tuple[str, str]:
+    """
+    Store a new refresh token. Returns (token, family_id). Rotating
+    `rotated_from` always yields the same token, so retried refreshes agree.
+    """
+    token = _successor(rotated_from) if rotated_from else secrets.token_urlsafe(32)
+    family_id = family_id or uuid.uuid4().hex
+    now = datetime.now(timezone.utc)
+    try:
+        await db[REFRESH_TOKENS_COLLECTION].insert_one(
+            {
+                "_id": _digest(token),
+                "user_id": user_id,
+                "family_id": family_id,
+                "created_at": now,
+                "expires_at": now + timedelta(days=settings.expire_days),
+                "used_at": None,
+            }
+        )
+    except DuplicateKeyError:
+        if not rotated_from:
+            raise
+        # A concurrent refresh with the same token already stored this successor
+    return token, family_id
+
+
+async def consume_refresh_token(db, settings: RefreshTokenSettings, token: str) -> dict:
+    """
+    Mark a refresh token used and return its record. A token that was
+    already used revokes its whole family, unless it was used within the
+    reuse grace window.
+    """
+    now = datetime.now(timezone.utc)
+    collection = db[REFRESH_TOKENS_COLLECTION]
+    record = await collection.find_one_and_update(
+        {"_id": _digest(token), "used_at": None, "expires_at": {"$gt": now}},
+        {"$set": {"used_at": now}},
+    )
+    if record is not None:
+        return record
+
+    grace_start = now - timedelta(seconds=settings.reuse_grace_seconds)
+    record = await collection.find_one(
+        {"_id": _digest(token), "used_at": {"$gte": grace_start}, "expires_at": {"$gt": now}}
+    )
+    if record is not None:
+        return record
+
+    reused = await collection.find_one({"_id": _digest(token)}, {"family_id": 1, "used_at": 1})
+    if reused is not None and reused.get("used_at") is not None:
+        await revoke_session(db, reused["family_id"])
+    raise _invalid_refresh_token()
+
+
+async def revoke_session(db, family_id: str) -> int:
+    result = await db[REFRESH_TOKENS_COLLECTION].delete_many({"family_id": family_id})
+    return result.deleted_count
+
+
+async def revoke_user_sessions(db, user_id: str) -> int:
+    result = await db[REFRESH_TOKENS_COLLECTION].delete_many({"user_id": user_id})
+    return result.deleted_count
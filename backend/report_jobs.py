@@ -0,0 +1,160 @@
+"""Background report jobs with cached, coalesced results.
+
+A job is identified by its report name and parameters, so every requester
+of the same report shares one ``report_jobs`` document. Submitting returns
+the stored snapshot straight away while it is within the freshness window;
+otherwise one worker claims the job with a conditional update and computes
+it in the background while the others poll. The previous snapshot is kept
+while a refresh runs, so dashboards can render it immediately.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from database import env_int
+
+logger = logging.getLogger(__name__)
+
+REPORT_JOBS_COLLECTION = "report_jobs"
+
+# Report name -> coroutine computing the report's JSON-ready result from params
+ReportBuilder = Callable[[object, dict], Awaitable[dict]]
+
+
+@dataclass
+class ReportJobSettings:
+    # How long a completed snapshot is served without recomputing
+    fresh_seconds: int = 300
+    # A running claim older than this is presumed dead and may be taken over
+    timeout_seconds: int = 600
+    # Job documents (and their snapshots) are removed after this long unused
+    retention_seconds: int = 24 * 60 * 60
+
+    @classmethod
+    def from_env(cls) -> "ReportJobSettings":
+        return cls(
+            fresh_seconds=env_int("REPORT_CACHE_FRESH_SECONDS", cls.fresh_seconds),
+            timeout_seconds=env_int("REPORT_JOB_TIMEOUT_SECONDS", cls.timeout_seconds),
+            retention_seconds=env_int("REPORT_JOB_RETENTION_SECONDS", cls.retention_seconds),
+        )
+
+
+def job_id(report: str, params: dict) -> str:
+    """Stable job id for a report and its parameters."""
+    canonical = json.dumps({"report": report, "params": params}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()[:32]
+
+
+class ReportJobs:
+    """Submit and look up report jobs; computes claimed jobs on this worker."""
+
+    def __init__(self, db, analytics_db, builders: Dict[str, ReportBuilder], settings: ReportJobSettings):
+        self.collection = db[REPORT_JOBS_COLLECTION]
+        self.analytics_db = analytics_db
+        self.builders = builders
+        self.settings = settings
+        self._tasks: Dict[str, asyncio.Task] = {}
+        # Requests answered by a fresh snapshot vs. ones that had to wait for a computation
+        self.hits = 0
+        self.misses = 0
+
+    async def ensure_indexes(self) -> None:
+        await self.collection.create_index("expires_at", expireAfterSeconds=0)
+
+    async def submit(self, report: str, params: dict) -> dict:
+        """Return the job for these parameters, starting a computation if it is not fresh."""
+        now = datetime.now(timezone.utc)
+        doc_id = job_id(report, params)
+        fresh_after = now - timedelta(seconds=self.settings.fresh_seconds)
+        stale_claim = now - timedelta(seconds=self.settings.timeout_seconds)
+        expires_at = now + timedelta(seconds=self.settings.retention_seconds)
+
+        # Claim unless a fresh snapshot exists or another requester is computing it
+        claim_filter = {
+            "_id": doc_id,
+            "$nor": [
+                {"status": "completed", "completed_at": {"$gte": fresh_after}},
+                {"status": "running", "started_at": {"$gte": stale_claim}},
+            ],
+        }
+        try:
+            job = await self.collection.find_one_and_update(
+                claim_filter,
+                {
+                    "$set": {
+                        "status": "running",
+                        "started_at": now,
+                        "worker": os.getpid(),
+                        "expires_at": expires_at,
+                        "error": None,
+                    },
+                    "$setOnInsert": {"report": report, "params": params, "requested_at": now},
+                },
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+        except DuplicateKeyError:
+            # The document exists but is fresh or being computed: coalesce onto it
+            job = await self.collection.find_one_and_update(
+                {"_id": doc_id}, {"$set": {"expires_at": expires_at}}, return_document=ReturnDocument.AFTER
+            )
+            if job is not None and job.get("status") == "completed":
+                self.hits += 1
+            else:
+                self.misses += 1
+            return job
+
+        self.misses += 1
+        self._tasks[doc_id] = asyncio.create_task(self._run(doc_id, report, params, now))
+        return job
+
+    def stats(self) -> dict:
+        requests = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / requests, 4) if requests else 0.0,
+        }
+
+    async def get(self, doc_id: str) -> Optional[dict]:
+        return await self.collection.find_one({"_id": doc_id})
+
+    async def _run(self, doc_id: str, report: str, params: dict, started_at: datetime) -> None:
+        # Only the claim that started this run may record its outcome
+        claim = {"_id": doc_id, "status": "running", "started_at": started_at}
+        try:
+            result = await self.builders[report](self.analytics_db, params)
+        except asyncio.CancelledError:
+            await self.collection.update_one(claim, {"$set": {"status": "failed", "error": "Cancelled"}})
+            raise
+        except Exception as exc:
+            logger.exception("Report job %s (%s) failed", doc_id, report)
+            await self.collection.update_one(claim, {"$set": {"status": "failed", "error": str(exc)}})
+        else:
+            await self.collection.update_one(
+                claim,
+                {
+                    "$set": {
+                        "status": "completed",
+                        "result": result,
+                        "completed_at": datetime.now(timezone.utc),
+                    }
+                },
+            )
+        finally:
+            self._tasks.pop(doc_id, None)
+
+    async def stop(self) -> None:
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
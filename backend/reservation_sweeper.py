@@ -0,0 +1,216 @@
+"""Background sweeper that cancels abandoned COD orders and releases their stock.
+
+Pending orders hold their pieces as ``reserved``. Orders still pending after
+``RESERVATION_TTL_HOURS`` are cancelled in batches found through the
+``(status, order_date)`` index, and every piece they reserved is released
+with one bulk write per batch.
+
+Each sweep also releases orphaned reservations: pieces reserved for an
+order that was never written, e.g. when the order insert failed or the
+worker died mid-request. Only reservations older than
+``RESERVATION_ORPHAN_GRACE_MINUTES`` are considered, so orders still being
+placed are left alone. They are paged through the
+``(status, updated_at, _id)`` index rather than by scanning every piece.
+
+Cancelled orders and released pieces are counted in ``SweeperStats`` and
+exported as ``reservation_*_total`` metrics.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+
+from database import env_int
+from order_workflow import release_orders_items
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SweeperSettings:
+    enabled: bool = True
+    ttl_hours: int = 48
+    interval_seconds: int = 300
+    batch_size: int = 200
+    orphan_grace_minutes: int = 10
+
+    @classmethod
+    def from_env(cls) -> "SweeperSettings":
+        return cls(
+            enabled=os.getenv("RESERVATION_SWEEPER_ENABLED", "true").lower() in ("1", "true", "yes"),
+            ttl_hours=env_int("RESERVATION_TTL_HOURS", cls.ttl_hours),
+            interval_seconds=env_int("RESERVATION_SWEEP_INTERVAL_SECONDS", cls.interval_seconds),
+            batch_size=env_int("RESERVATION_SWEEP_BATCH_SIZE", cls.batch_size),
+            orphan_grace_minutes=env_int("RESERVATION_ORPHAN_GRACE_MINUTES", cls.orphan_grace_minutes),
+        )
+
+
+@dataclass
+class SweeperStats:
+    runs: int = 0
+    failures: int = 0
+    orders_cancelled: int = 0
+    items_released: int = 0
+    orphans_released: int = 0
+    last_run_at: Optional[datetime] = None
+    last_run_ms: float = 0.0
+    last_orders_cancelled: int = 0
+    last_items_released: int = 0
+
+
+class ReservationSweeper:
+    """Periodically expire pending orders older than the reservation TTL."""
+
+    def __init__(self, db, settings: SweeperSettings):
+        self.db = db
+        self.settings = settings
+        self.stats = SweeperStats()
+        self._task: Optional[asyncio.Task] = None
+
+    async def ensure_indexes(self) -> None:
+        await self.db.orders.create_index([("status", 1), ("order_date", 1)])
+        await self.db.jewellery_items.create_index([("reserved_order_id", 1)], sparse=True)
+        # Orphan pass: reserved pieces paged by (updated_at, _id)
+        await self.db.jewellery_items.create_index([("status", 1), ("updated_at", 1), ("_id", 1)])
+
+    async def release_orphans(self, now: datetime) -> int:
+        """Release pieces reserved for orders that do not exist. Returns items released."""
+        cutoff = now - timedelta(minutes=self.settings.orphan_grace_minutes)
+        released = 0
+        last = None
+
+        while True:
+            query = {"status": "reserved", "updated_at": {"$lt": cutoff}}
+            if last is not None:
+                last_updated_at, last_id = last
+                query["$or"] = [
+                    {"updated_at": {"$gt": last_updated_at}},
+                    {"updated_at": last_updated_at, "_id": {"$gt": last_id}},
+                ]
+            batch = await (
+                self.db.jewellery_items.find(query, {"reserved_order_id": 1, "updated_at": 1})
+                .sort([("updated_at", 1), ("_id", 1)])
+                .limit(self.settings.batch_size)
+                .to_list(length=self.settings.batch_size)
+            )
+            if not batch:
+                break
+            last = (batch[-1]["updated_at"], batch[-1]["_id"])
+
+            order_ids = list({item["reserved_order_id"] for item in batch if item.get("reserved_order_id")})
+            existing = await self.db.orders.find({"_id": {"$in": order_ids}}, {"_id": 1}).to_list(
+                length=len(order_ids)
+            )
+            existing_ids = {order["_id"] for order in existing}
+            released += await release_orders_items(
+                self.db, [order_id for order_id in order_ids if order_id not in existing_ids]
+            )
+
+            if len(batch) < self.settings.batch_size:
+                break
+
+        return released
+
+    async def sweep_once(self) -> Tuple[int, int]:
+        """Cancel expired pending orders and release orphaned reservations.
+
+        Returns (orders cancelled, items released).
+        """
+        started = time.perf_counter()
+        now = datetime.now(timezone.utc)
+        cutoff = now - timedelta(hours=self.settings.ttl_hours)
+        expired_query = {"status": "pending", "order_date": {"$lt": cutoff}}
+
+        orders_cancelled = 0
+        items_released = 0
+
+        while True:
+            batch = await (
+                self.db.orders.find(expired_query, {"_id": 1})
+                .sort("order_date", 1)
+                .limit(self.settings.batch_size)
+                .to_list(length=self.settings.batch_size)
+            )
+            if not batch:
+                break
+
+            batch_ids = [order["_id"] for order in batch]
+
+            # Re-check the status so orders confirmed meanwhile are left alone
+            result = await self.db.orders.update_many(
+                {"_id": {"$in": batch_ids}, "status": "pending"},
+                {
+                    "$set": {"status": "cancelled", "cancellation_reason": "reservation_expired"},
+                    "$inc": {"version": 1},
+                },
+            )
+            orders_cancelled += result.modified_count
+
+            cancelled = await self.db.orders.find(
+                {"_id": {"$in": batch_ids}, "status": "cancelled"}, {"_id": 1}
+            ).to_list(length=len(batch_ids))
+            items_released += await release_orders_items(
+                self.db, [order["_id"] for order in cancelled]
+            )
+
+            if len(batch) < self.settings.batch_size:
+                break
+
+        orphans_released = await self.release_orphans(now)
+        items_released += orphans_released
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.stats.runs += 1
+        self.stats.orders_cancelled += orders_cancelled
+        self.stats.items_released += items_released
+        self.stats.orphans_released += orphans_released
+        self.stats.last_run_at = now
+        self.stats.last_run_ms = round(elapsed_ms, 3)
+        self.stats.last_orders_cancelled = orders_cancelled
+        self.stats.last_items_released = items_released
+
+        if orphans_released:
+            logger.warning("Reservation sweep released %s items reserved for missing orders", orphans_released)
+        if orders_cancelled:
+            logger.info(
+                "Reservation sweep cancelled %s orders and released %s items in %.1f ms",
+                orders_cancelled,
+                items_released,
+                elapsed_ms,
+            )
+        return orders_cancelled, items_released
+
+    async def _run(self) -> None:
+        indexed = False
+        while True:
+            try:
+                # Built here rather than in start() so an unreachable Mongo at boot is retried
+                if not indexed:
+                    await self.ensure_indexes()
+                    indexed = True
+                await self.sweep_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.stats.failures += 1
+                logger.exception("Reservation sweep failed")
+            await asyncio.sleep(self.settings.interval_seconds)
+
+    async def start(self) -> None:
+        if not self.settings.enabled:
+            logger.info("Reservation sweeper disabled")
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,186 @@
+"""Operational routes for owners."""
+
+from dataclasses import asdict
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.security import HTTPAuthorizationCredentials
+
+from auth import get_optional_user, require_role, security
+from leaderboard import rebuild_leaderboard
+from models import CacheInvalidateRequest
+from refresh_tokens import revoke_user_sessions
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+
+@router.get("/db-pool")
+async def get_db_pool_stats(
+    request: Request,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+):
+    """Get Mongo connection-pool checkout metrics. Requires owner role."""
+    # Authenticate and check role
+    user = await get_optional_user(request, credentials)
+    if not user:
+        raise HTTPException(status_code=401, detail="Authorization required")
+    require_role("owner")(user)
+
+    settings = request.app.state.db_settings
+
+    return {
+        "pool": request.app.state.pool_monitor.snapshot(),
+        "settings": {
+            "max_pool_size": settings.max_pool_size,
+            "min_pool_size": settings.min_pool_size,
+            "wait_queue_timeout_ms": settings.wait_queue_timeout_ms,
+            "read_preference": settings.read_preference,
+            "analytics_read_preference": settings.analytics_read_preference,
+        },
+    }
+
+
+@router.post("/cache/invalidate")
+async def invalidate_cache(
+    invalidation: CacheInvalidateRequest,
+    request: Request,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+):
+    """Invalidate an in-process cache in every worker. Requires owner role."""
+    # Authenticate and check role
+    user = await get_optional_user(request, credentials)
+    if not user:
+        raise HTTPException(status_code=401, detail="Authorization required")
+    require_role("owner")(user)
+
+    cache_bus = request.app.state.cache_bus
+    if not cache_bus.has_cache(invalidation.cache):
+        raise HTTPException(
+            status_code=404,
+            detail={"error": {"code": "CACHE_NOT_FOUND", "message": f"Unknown cache '{invalidation.cache}'"}},
+        )
+
+    await cache_bus.invalidate(invalidation.cache, invalidation.key)
+
+    return {"success": True, "cache": invalidation.cache, "key": invalidation.key}
+
+
+@router.get("/reservation-sweeper")
+async def get_reservation_sweeper_stats(
+    request: Request,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+):
+    """Get reservation expiry metrics. Requires manager+ role."""
+    # Authenticate and check role
+    user = await get_optional_user(request, credentials)
+    if not user:
+        raise HTTPException(status_code=401, detail="Authorization required")
+    require_role("manager")(user)
+
+    sweeper = request.app.state.reservation_sweeper
+
+    return {
+        "settings": asdict(sweeper.settings),
+        "stats": asdict(sweeper.stats),
+    }
+
+
+@router.post("/reservation-sweeper/run")
+async def run_reservation_sweep(
+    request: Request,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+):
+    """Expire abandoned pending orders now. Requires owner role."""
+    # Authenticate and check role
+    user = await get_optional_user(request, credentials)
+    if not user:
+        raise HTTPException(status_code=401, detail="Authorization required")
+    require_role("owner")(user)
+
+    orders_cancelled, items_released = await request.app.state.reservation_sweeper.sweep_once()
+
+    return {"orders_cancelled": orders_cancelled, "items_released": items_released}
+
+
+@router.post("/leaderboard/rebuild")
+async def rebuild_top_sellers(
+    request: Request,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+):
+    """Recompute the top-sellers leaderboard from delivered orders. Requires owner role."""
+    # Authenticate and check role
+    user = await get_optional_user(request, credentials)
+    if not user:
+        raise HTTPException(status_code=401, detail="Authorization required")
+    require_role("owner")(user)
+
+    orders_counted = await rebuild_leaderboard(request.app.state.db)
+
+    return {"orders_counted": orders_counted}
+
+
+@router.post("/users/{user_id}/revoke-tokens")
+async def revoke_user_tokens(
+    user_id: str,
+    request: Request,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+):
+    """Revoke every token issued to a user so far. Requires owner role."""
+    # Authenticate and check role
+    user = await get_optional_user(request, credentials)
+    if not user:
+        raise HTTPException(status_code=401, detail="Authorization required")
+    require_role("owner")(user)
+
+    if not await request.app.state.db.users.find_one({"_id": user_id}, {"_id": 1}):
+        raise HTTPException(
+            status_code=404,
+            detail={"error": {"code": "USER_NOT_FOUND", "message": "User not found"}},
+        )
+
+    valid_after = await request.app.state.token_revocations.revoke_user(user_id)
+    sessions_revoked = await revoke_user_sessions(request.app.state.db, user_id)
+
+    return {
+        "success": True,
+        "user_id": user_id,
+        "tokens_valid_after": valid_after,
+        "sessions_revoked": sessions_revoked,
+    }
+
+
+@router.get("/slow-queries")
+async def get_slow_queries(
+    request: Request,
+    limit: int = Query(50, ge=1, le=200),
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+):
+    """Get this worker's slow Mongo query shapes with sampled explain plans. Requires owner role."""
+    # Authenticate and check role
+    user = await get_optional_user(request, credentials)
+    if not user:
+        raise HTTPException(status_code=401, detail="Authorization required")
+    require_role("owner")(user)
+
+    recorder = request.app.state.slow_queries
+
+    return {
+        "settings": asdict(recorder.settings),
+        "queries": recorder.snapshot(limit),
+    }
+
+
+@router.delete("/slow-queries")
+async def reset_slow_queries(
+    request: Request,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+):
+    """Clear this worker's slow query log. Requires owner role."""
+    # Authenticate and check role
+    user = await get_optional_user(request, credentials)
+    if not user:
+        raise HTTPException(status_code=401, detail="Authorization required")
+    require_role("owner")(user)
+
+    request.app.state.slow_queries.reset()
+
+    return {"success": True}
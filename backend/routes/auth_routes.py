@@ -3,8 +3,15 @@
 from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.security import HTTPAuthorizationCredentials
 
-from auth import create_access_token, get_current_user, security, verify_password
-from models import LoginRequest, LoginResponse, User
+from auth import (
+    ACCESS_TOKEN_EXPIRE_MINUTES,
+    create_access_token,
+    get_current_user,
+    security,
+    verify_password,
+)
+from models import LoginRequest, LoginResponse, RefreshRequest, RefreshResponse, User
+from refresh_tokens import consume_refresh_token, issue_refresh_token, revoke_session
 
 router = APIRouter(prefix="/auth", tags=["authentication"])
 
@@ -13,14 +20,56 @@ router = APIRouter(prefix="/auth", tags=["authentication"])
 async def login(login_data: LoginRequest, request: Request):
     """Authenticate user and return JWT token."""
     db = request.app.state.db
+    limiter = request.app.state.login_rate_limiter
+    client_ip = limiter.client_ip(request)
+
+    # Throttled clients are turned away before any bcrypt work
+    await limiter.check(login_data.email, client_ip)
 
     user_data = await db.users.find_one({"email": login_data.email})
     if not user_data:
+        await limiter.record_failure(login_data.email, client_ip)
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
     if not verify_password(login_data.password, user_data["password_hash"]):
+        await limiter.record_failure(login_data.email, client_ip)
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
+    await limiter.record_success(login_data.email)
+
+    user = User(
+        id=user_data["_id"],
+        username=user_data["username"],
+        email=user_data["email"],
+        role=user_data["role"],
+        created_at=user_data["created_at"],
+    )
+
+    refresh_token, session_id = await issue_refresh_token(db, request.app.state.refresh_token_settings, user.id)
+    token = create_access_token(user, session_id)
+
+    return LoginResponse(
+        token=token,
+        refresh_token=refresh_token,
+        expires_in=ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+        user=user,
+    )
+
+
+@router.post("/refresh", response_model=RefreshResponse)
+async def refresh(refresh_data: RefreshRequest, request: Request):
+    """Exchange a refresh token for a new access token and a rotated refresh token."""
+    db = request.app.state.db
+    settings = request.app.state.refresh_token_settings
+
+    record = await consume_refresh_token(db, settings, refresh_data.refresh_token)
+
+    # Re-read the user so role changes apply from the next access token
+    user_data = await db.users.find_one({"_id": record["user_id"]})
+    if not user_data:
+        await revoke_session(db, record["family_id"])
+        raise HTTPException(status_code=401, detail="User not found")
+
     user = User(
         id=user_data["_id"],
         username=user_data["username"],
@@ -29,9 +78,16 @@ async def login(login_data: LoginRequest, request: Request):
         created_at=user_data["created_at"],
     )
 
-    token = create_access_token(user)
+    refresh_token, session_id = await issue_refresh_token(
+        db, settings, user.id, record["family_id"], rotated_from=refresh_data.refresh_token
+    )
+    token = create_access_token(user, session_id)
 
-    return LoginResponse(token=token, user=user)
+    return RefreshResponse(
+        token=token,
+        refresh_token=refresh_token,
+        expires_in=ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+    )
 
 
 @router.get("/me", response_model=User)
@@ -40,4 +96,20 @@ async def get_me(
     credentials: HTTPAuthorizationCredentials = Depends(security),
 ):
     """Get current authenticated user."""
-    return await get_current_user(request, credentials)
\ No newline at end of file
+    return await get_current_user(request, credentials)
+
+
+@router.post("/logout")
+async def logout(
+    request: Request,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+):
+    """Revoke the presented token until it expires, and end its refresh session."""
+    await get_current_user(request, credentials)
+    payload = request.state.token_claims
+
+    revoked = await request.app.state.token_revocations.revoke_token(payload)
+    if payload.get("sid"):
+        await revoke_session(request.app.state.db, payload["sid"])
+
+    return {"success": True, "revoked": revoked}
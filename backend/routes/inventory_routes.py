@@ -1,12 +1,23 @@
 """Inventory management routes."""
 
 from datetime import datetime, timezone
-from typing import Optional
+from typing import List, Literal, Optional, Tuple
 
 from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 
 from auth import get_optional_user, require_role, security
+from concurrency import raise_not_found_or_conflict, version_filter
+from exports import (
+    ITEM_EXPORT_FIELDS,
+    ExportFormat,
+    date_range_filter,
+    export_response,
+    item_row,
+)
+from json_response import FastJSONResponse
 from models import (
     JewelleryItem,
     JewelleryItemCreate,
@@ -14,13 +25,95 @@ from models import (
     JewelleryItemUpdate,
     User,
 )
+from serializers import item_from_doc, sparse_item, trusted_response
 
 router = APIRouter(prefix="/inventory", tags=["inventory"])
 
+# Sparse listing views: "card" is the storefront grid (code, name, price, first image)
+ItemView = Literal["full", "card"]
+CARD_FIELDS = ("id", "item_code", "name", "price", "images")
+
 # Optional security dependency that doesn't raise exceptions
 optional_security = HTTPBearer(auto_error=False)
 
 
+async def ensure_item_indexes(db) -> None:
+    # update_item relies on this index to reject duplicate item codes
+    await db.jewellery_items.create_index("item_code", unique=True)
+
+
+def _build_items_query(
+    user: Optional[User],
+    category: Optional[str],
+    material: Optional[str],
+    status: Optional[str],
+    search: Optional[str],
+) -> dict:
+    """Build the Mongo filter shared by listing and export endpoints."""
+    query = {}
+
+    # Public users can only see available items
+    if user is None:
+        query["status"] = "available"
+    elif status:
+        query["status"] = status
+
+    if category:
+        query["category"] = category
+    if material:
+        query["material"] = material
+    if search:
+        query["$or"] = [
+            {"name": {"$regex": search, "$options": "i"}},
+            {"description": {"$regex": search, "$options": "i"}},
+            {"item_code": {"$regex": search, "$options": "i"}},
+        ]
+
+    return query
+
+
+def _item_projection(
+    fields: Optional[str], view: ItemView
+) -> Tuple[Optional[List[str]], Optional[dict]]:
+    """Resolve `fields`/`view` into the selected field list and a Mongo projection."""
+    if view == "card" and fields:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "error": {
+                    "code": "INVALID_FIELDS",
+                    "message": "fields cannot be combined with view=card",
+                }
+            },
+        )
+    if view == "card":
+        selected = list(CARD_FIELDS)
+    elif fields:
+        selected = [name.strip() for name in fields.split(",") if name.strip()]
+        unknown = [name for name in selected if name not in JewelleryItem.model_fields]
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail={
+                    "error": {
+                        "code": "INVALID_FIELDS",
+                        "message": f"Unknown fields: {', '.join(unknown)}",
+                    }
+                },
+            )
+        if "id" not in selected:
+            selected.insert(0, "id")
+    else:
+        return None, None
+
+    # _id is always returned by Mongo and mapped to "id"
+    projection = {name: 1 for name in selected if name != "id"}
+    if view == "card":
+        projection["images"] = {"$slice": 1}
+
+    return selected, projection
+
+
 @router.get("/items", response_model=JewelleryItemsResponse)
 async def get_items(
     request: Request,
@@ -30,44 +123,30 @@ async def get_items(
     material: Optional[str] = None,
     status: Optional[str] = None,
     search: Optional[str] = None,
+    fields: Optional[str] = None,
+    view: ItemView = "full",
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security),
 ):
     """
     Get jewellery items.
     Public users only see available items.
     Authenticated users see all items.
+    `fields` (comma-separated) or `view=card` return sparse items projected in Mongo.
     """
     db = request.app.state.db
 
     # Get current user if authenticated
     user = await get_optional_user(request, credentials)
 
-    # Build query
-    query = {}
-
-    # Public users can only see available items
-    if user is None:
-        query["status"] = "available"
-    elif status:
-        query["status"] = status
-
-    if category:
-        query["category"] = category
-    if material:
-        query["material"] = material
-    if search:
-        query["$or"] = [
-            {"name": {"$regex": search, "$options": "i"}},
-            {"description": {"$regex": search, "$options": "i"}},
-            {"item_code": {"$regex": search, "$options": "i"}},
-        ]
+    query = _build_items_query(user, category, material, status, search)
+    selected_fields, projection = _item_projection(fields, view)
 
     # Pagination
     limit = min(limit, 100)
     skip = (page - 1) * limit
 
     # Execute query
-    items_cursor = db.jewellery_items.find(query).skip(skip).limit(limit + 1)
+    items_cursor = db.jewellery_items.find(query, projection).skip(skip).limit(limit + 1)
     items_list = await items_cursor.to_list(length=limit + 1)
 
     has_more = len(items_list) > limit
@@ -75,31 +154,60 @@ async def get_items(
 
     total = await db.jewellery_items.count_documents(query)
 
-    items = [
-        JewelleryItem(
-            id=item["_id"],
-            item_code=item["item_code"],
-            name=item["name"],
-            description=item["description"],
-            category=item["category"],
-            price=item["price"],
-            weight=item["weight"],
-            material=item["material"],
-            images=item.get("images", []),
-            status=item["status"],
-            created_at=item["created_at"],
-            updated_at=item["updated_at"],
+    if selected_fields is not None:
+        return FastJSONResponse(
+            content={
+                "items": [sparse_item(item, selected_fields) for item in items_list],
+                "page": page,
+                "total": total,
+                "has_more": has_more,
+            }
         )
-        for item in items_list
-    ]
 
-    return JewelleryItemsResponse(
-        items=items,
+    response = JewelleryItemsResponse.model_construct(
+        items=[item_from_doc(item) for item in items_list],
         page=page,
         total=total,
         has_more=has_more,
     )
 
+    return trusted_response(response)
+
+
+@router.get("/items/export")
+async def export_items(
+    request: Request,
+    format: ExportFormat = "csv",
+    category: Optional[str] = None,
+    material: Optional[str] = None,
+    status: Optional[str] = None,
+    search: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+):
+    """
+    Stream jewellery items as CSV or JSONL. Requires staff+ role.
+    Accepts the same filters as the listing plus a created_at date range.
+    """
+    # Exports may be served by secondaries
+    db = request.app.state.analytics_db
+
+    # Authenticate and check role
+    user = await get_optional_user(request, credentials)
+    if not user:
+        raise HTTPException(status_code=401, detail="Authorization required")
+    require_role("staff")(user)
+
+    query = _build_items_query(user, category, material, status, search)
+    created_range = date_range_filter(start_date, end_date)
+    if created_range:
+        query["created_at"] = created_range
+
+    cursor = db.jewellery_items.find(query).sort("created_at", 1)
+
+    return export_response(cursor, format, ITEM_EXPORT_FIELDS, item_row, "jewellery_items")
+
 
 @router.post("/items", response_model=JewelleryItem, status_code=201)
 async def create_item(
@@ -174,46 +282,32 @@ async def update_item(
         raise HTTPException(status_code=401, detail="Authorization required")
     require_role("staff")(user)
 
-    # Check if item exists
-    existing = await db.jewellery_items.find_one({"_id": item_id})
-    if not existing:
-        raise HTTPException(
-            status_code=404,
-            detail={"error": {"code": "ITEM_NOT_FOUND", "message": "Item not found"}},
-        )
+    # Build update dict (only include provided fields)
+    update_dict = update_data.model_dump(exclude_unset=True)
+    expected_version = update_dict.pop("version", None)
 
-    # Check if new item_code conflicts with another item
-    if update_data.item_code and update_data.item_code != existing["item_code"]:
-        code_exists = await db.jewellery_items.find_one(
-            {"item_code": update_data.item_code, "_id": {"$ne": item_id}}
-        )
-        if code_exists:
+    if update_dict:
+        update_dict["updated_at"] = datetime.now(timezone.utc)
+
+        # Apply and read back in a single round-trip; the unique item_code
+        # index rejects a code taken by another item, so no lookup is needed
+        try:
+            updated_item = await db.jewellery_items.find_one_and_update(
+                version_filter(item_id, expected_version),
+                {"$set": update_dict, "$inc": {"version": 1}},
+                return_document=ReturnDocument.AFTER,
+            )
+        except DuplicateKeyError:
             raise HTTPException(
                 status_code=400,
                 detail={"error": {"code": "ITEM_CODE_EXISTS", "message": "Item code already exists"}},
             )
+    else:
+        updated_item = await db.jewellery_items.find_one(version_filter(item_id, expected_version))
 
-    # Build update dict (only include provided fields)
-    update_dict = update_data.model_dump(exclude_unset=True)
-    if update_dict:
-        update_dict["updated_at"] = datetime.now(timezone.utc)
+    if not updated_item:
+        await raise_not_found_or_conflict(
+            db.jewellery_items, item_id, expected_version, "ITEM_NOT_FOUND", "Item not found"
+        )
 
-        await db.jewellery_items.update_one({"_id": item_id}, {"$set": update_dict})
-
-    # Fetch and return updated item
-    updated_item = await db.jewellery_items.find_one({"_id": item_id})
-
-    return JewelleryItem(
-        id=updated_item["_id"],
-        item_code=updated_item["item_code"],
-        name=updated_item["name"],
-        description=updated_item["description"],
-        category=updated_item["category"],
-        price=updated_item["price"],
-        weight=updated_item["weight"],
-        material=updated_item["material"],
-        images=updated_item.get("images", []),
-        status=updated_item["status"],
-        created_at=updated_item["created_at"],
-        updated_at=updated_item["updated_at"],
-    )
\ No newline at end of file
+    return trusted_response(item_from_doc(updated_item))
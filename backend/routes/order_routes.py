@@ -1,13 +1,26 @@
 """Order management routes."""
 
+import uuid
 from datetime import datetime, timezone
 from typing import Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.security import HTTPAuthorizationCredentials
+from pymongo import ReturnDocument
 
 from auth import get_optional_user, require_role, security
+from concurrency import version_conflict, version_filter
+from exports import (
+    ORDER_EXPORT_FIELDS,
+    ExportFormat,
+    date_range_filter,
+    export_response,
+    order_row,
+)
+from leaderboard import record_delivered_order
 from models import (
+    CustomerHistoryResponse,
+    CustomerSummary,
     JewelleryItem,
     Order,
     OrderCreate,
@@ -15,9 +28,15 @@ from models import (
     OrdersResponse,
     OrderStatusUpdate,
 )
+from order_workflow import allowed_sources, apply_item_transition, release_orders_items, reserve_item
+from phone import normalise_phone
+from serializers import order_from_doc, trusted_response
 
 router = APIRouter(prefix="/orders", tags=["orders"])
 
+# Shortest phone fragment accepted by the customer-history lookup
+MIN_PHONE_PREFIX_DIGITS = 4
+
 
 @router.post("", response_model=Order, status_code=201)
 async def create_order(order_data: OrderCreate, request: Request):
@@ -26,68 +45,100 @@ async def create_order(order_data: OrderCreate, request: Request):
     Public endpoint - no authentication required.
     """
     db = request.app.state.db
+    order_id = str(uuid.uuid4())
+
+    item_ids = [item_req.item_id for item_req in order_data.items]
+    if len(set(item_ids)) != len(item_ids):
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "error": {
+                    "code": "DUPLICATE_ITEM",
+                    "message": "Each item may appear only once in an order",
+                }
+            },
+        )
 
-    # Validate all items exist and are available
+    # Reserve every item atomically; on any failure release what was reserved
     order_items = []
     total_amount = 0
 
-    for item_req in order_data.items:
-        item = await db.jewellery_items.find_one({"_id": item_req.item_id})
-
-        if not item:
-            raise HTTPException(
-                status_code=404,
-                detail={
-                    "error": {
-                        "code": "ITEM_NOT_FOUND",
-                        "message": f"Item {item_req.item_id} not found",
-                    }
-                },
-            )
-
-        if item["status"] != "available":
-            raise HTTPException(
-                status_code=400,
-                detail={
-                    "error": {
-                        "code": "ITEM_UNAVAILABLE",
-                        "message": f"Item {item['item_code']} is not available",
-                    }
-                },
+    try:
+        for item_req in order_data.items:
+            item = await reserve_item(db, item_req.item_id, order_id)
+
+            if not item:
+                existing = await db.jewellery_items.find_one({"_id": item_req.item_id}, {"item_code": 1})
+                if not existing:
+                    raise HTTPException(
+                        status_code=404,
+                        detail={
+                            "error": {
+                                "code": "ITEM_NOT_FOUND",
+                                "message": f"Item {item_req.item_id} not found",
+                            }
+                        },
+                    )
+
+                raise HTTPException(
+                    status_code=400,
+                    detail={
+                        "error": {
+                            "code": "ITEM_UNAVAILABLE",
+                            "message": f"Item {existing['item_code']} is not available",
+                        }
+                    },
+                )
+
+            subtotal = item["price"] * item_req.quantity
+            total_amount += subtotal
+
+            order_items.append(
+                OrderItem(
+                    item_id=item["_id"],
+                    item_code=item["item_code"],
+                    name=item["name"],
+                    price=item["price"],
+                    quantity=item_req.quantity,
+                    subtotal=subtotal,
+                )
             )
 
-        subtotal = item["price"] * item_req.quantity
-        total_amount += subtotal
-
-        order_items.append(
-            OrderItem(
-                item_id=item["_id"],
-                item_code=item["item_code"],
-                name=item["name"],
-                price=item["price"],
-                quantity=item_req.quantity,
-                subtotal=subtotal,
-            )
+        # Create order
+        order = Order(
+            id=order_id,
+            customer_name=order_data.customer_name,
+            customer_phone=order_data.customer_phone,
+            customer_address=order_data.customer_address,
+            items=order_items,
+            total_amount=total_amount,
         )
 
-    # Create order
-    order = Order(
-        customer_name=order_data.customer_name,
-        customer_phone=order_data.customer_phone,
-        customer_address=order_data.customer_address,
-        items=order_items,
-        total_amount=total_amount,
-    )
-
-    # Convert to dict and use _id instead of id for MongoDB
-    order_dict = order.model_dump()
-    order_dict["_id"] = order_dict.pop("id")
-    order_dict["items"] = [item.model_dump() for item in order_items]
-    await db.orders.insert_one(order_dict)
+        # Convert to dict and use _id instead of id for MongoDB
+        order_dict = order.model_dump()
+        order_dict["_id"] = order_dict.pop("id")
+        order_dict["customer_phone_normalised"] = normalise_phone(order.customer_phone)
+        order_dict["items"] = [item.model_dump() for item in order_items]
+        await db.orders.insert_one(order_dict)
+    except BaseException:
+        # Also on cancellation: release by order id, which covers a reservation
+        # whose reply never arrived. The sweeper catches anything left behind.
+        await release_orders_items(db, [order_id])
+        raise
 
     return order
 
 
+def _build_orders_query(status: Optional[str], customer_phone: Optional[str]) -> dict:
+    """Build the Mongo filter shared by listing and export endpoints."""
+    query = {}
+    if status:
+        query["status"] = status
+    if customer_phone:
+        query["customer_phone_normalised"] = normalise_phone(customer_phone)
+    return query
+
+
 @router.get("", response_model=OrdersResponse)
 async def get_orders(
     request: Request,
@@ -106,12 +157,7 @@ async def get_orders(
         raise HTTPException(status_code=401, detail="Authorization required")
     require_role("staff")(user)
 
-    # Build query
-    query = {}
-    if status:
-        query["status"] = status
-    if customer_phone:
-        query["customer_phone"] = customer_phone
+    query = _build_orders_query(status, customer_phone)
 
     # Pagination
     limit = min(limit, 100)
@@ -125,23 +171,130 @@ async def get_orders(
 
     total = await db.orders.count_documents(query)
 
-    orders = [
-        Order(
-            id=order["_id"],
-            customer_name=order["customer_name"],
-            customer_phone=order["customer_phone"],
-            customer_address=order["customer_address"],
-            items=[OrderItem(**item) for item in order["items"]],
-            total_amount=order["total_amount"],
-            status=order["status"],
-            payment_method=order["payment_method"],
-            order_date=order["order_date"],
-            delivery_date=order.get("delivery_date"),
+    response = OrdersResponse.model_construct(
+        orders=[order_from_doc(order) for order in orders_list],
+        page=page,
+        total=total,
+    )
+
+    return trusted_response(response)
+
+
+@router.get("/customer-history", response_model=CustomerHistoryResponse)
+async def get_customer_history(
+    request: Request,
+    phone: str,
+    prefix: bool = False,
+    limit: int = 50,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+):
+    """
+    Get a customer's orders and lifetime spend by phone. Requires staff+ role.
+    With prefix=true, matches every number starting with the given digits.
+    """
+    db = request.app.state.db
+
+    # Authenticate and check role
+    user = await get_optional_user(request, credentials)
+    if not user:
+        raise HTTPException(status_code=401, detail="Authorization required")
+    require_role("staff")(user)
+
+    digits = normalise_phone(phone)
+    if len(digits) < MIN_PHONE_PREFIX_DIGITS:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "error": {
+                    "code": "INVALID_PHONE",
+                    "message": f"phone must contain at least {MIN_PHONE_PREFIX_DIGITS} digits",
+                }
+            },
         )
-        for order in orders_list
+
+    # Both forms are an index range on (customer_phone_normalised, order_date). An
+    # exact number also gets its orders in date order from the index; a prefix
+    # spanning several numbers is sorted in memory after the indexed match.
+    phone_match = {"$regex": f"^{digits}"} if prefix else digits
+    limit = min(limit, 100)
+
+    # One indexed aggregation returns both the order page and per-customer totals
+    pipeline = [
+        {"$match": {"customer_phone_normalised": phone_match}},
+        {"$sort": {"order_date": -1}},
+        {
+            "$facet": {
+                "orders": [{"$limit": limit}],
+                "customers": [
+                    {
+                        "$group": {
+                            "_id": "$customer_phone_normalised",
+                            "customer_name": {"$first": "$customer_name"},
+                            "order_count": {"$sum": 1},
+                            "lifetime_spend": {
+                                "$sum": {
+                                    "$cond": [{"$eq": ["$status", "delivered"]}, "$total_amount", 0]
+                                }
+                            },
+                            "last_order_date": {"$first": "$order_date"},
+                        }
+                    },
+                    {"$sort": {"last_order_date": -1}},
+                ],
+            }
+        },
     ]
+    result = (await db.orders.aggregate(pipeline).to_list(length=1))[0]
+
+    response = CustomerHistoryResponse.model_construct(
+        phone=digits,
+        customers=[
+            CustomerSummary.model_construct(
+                customer_phone_normalised=customer["_id"],
+                customer_name=customer["customer_name"],
+                order_count=customer["order_count"],
+                lifetime_spend=customer["lifetime_spend"],
+                last_order_date=customer["last_order_date"],
+            )
+            for customer in result["customers"]
+        ],
+        orders=[order_from_doc(order) for order in result["orders"]],
+    )
+
+    return trusted_response(response)
+
+
+@router.get("/export")
+async def export_orders(
+    request: Request,
+    format: ExportFormat = "csv",
+    status: Optional[str] = None,
+    customer_phone: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+):
+    """
+    Stream orders as CSV or JSONL. Requires staff+ role.
+    Accepts the same filters as the listing plus an order_date range.
+    """
+    # Exports may be served by secondaries
+    db = request.app.state.analytics_db
+
+    # Authenticate and check role
+    user = await get_optional_user(request, credentials)
+    if not user:
+        raise HTTPException(status_code=401, detail="Authorization required")
+    require_role("staff")(user)
+
+    query = _build_orders_query(status, customer_phone)
+    order_range = date_range_filter(start_date, end_date)
+    if order_range:
+        query["order_date"] = order_range
 
-    return OrdersResponse(orders=orders, page=page, total=total)
+    cursor = db.orders.find(query).sort("order_date", 1)
+
+    return export_response(cursor, format, ORDER_EXPORT_FIELDS, order_row, "orders")
 
 
 @router.patch("/{order_id}/status", response_model=Order)
@@ -160,37 +313,55 @@ async def update_order_status(
         raise HTTPException(status_code=401, detail="Authorization required")
     require_role("staff")(user)
 
-    # Check if order exists
-    existing = await db.orders.find_one({"_id": order_id})
-    if not existing:
-        raise HTTPException(
-            status_code=404,
-            detail={"error": {"code": "ORDER_NOT_FOUND", "message": "Order not found"}},
-        )
+    target = status_data.status
 
     # Build update dict
-    update_dict = {"status": status_data.status}
+    update_dict = {"status": target}
 
     # Set delivery_date if status is delivered and date provided
-    if status_data.status == "delivered":
+    if target == "delivered":
         update_dict["delivery_date"] = (
             status_data.delivery_date or datetime.now(timezone.utc)
         )
 
-    await db.orders.update_one({"_id": order_id}, {"$set": update_dict})
-
-    # Fetch and return updated order
-    updated_order = await db.orders.find_one({"_id": order_id})
-
-    return Order(
-        id=updated_order["_id"],
-        customer_name=updated_order["customer_name"],
-        customer_phone=updated_order["customer_phone"],
-        customer_address=updated_order["customer_address"],
-        items=[OrderItem(**item) for item in updated_order["items"]],
-        total_amount=updated_order["total_amount"],
-        status=updated_order["status"],
-        payment_method=updated_order["payment_method"],
-        order_date=updated_order["order_date"],
-        delivery_date=updated_order.get("delivery_date"),
-    )
\ No newline at end of file
+    # Only orders in a valid source status match, so concurrent updates
+    # cannot both apply a transition
+    query = version_filter(order_id, status_data.version)
+    query["status"] = {"$in": allowed_sources(target)}
+
+    updated_order = await db.orders.find_one_and_update(
+        query,
+        {"$set": update_dict, "$inc": {"version": 1}},
+        return_document=ReturnDocument.AFTER,
+    )
+
+    if not updated_order:
+        current = await db.orders.find_one({"_id": order_id})
+        if not current:
+            raise HTTPException(
+                status_code=404,
+                detail={"error": {"code": "ORDER_NOT_FOUND", "message": "Order not found"}},
+            )
+
+        if current["status"] != target:
+            if status_data.version is not None and current.get("version", 1) != status_data.version:
+                raise version_conflict()
+            raise HTTPException(
+                status_code=400,
+                detail={
+                    "error": {
+                        "code": "INVALID_STATUS_TRANSITION",
+                        "message": f"Cannot change order status from {current['status']} to {target}",
+                    }
+                },
+            )
+
+        # Already in the requested status: a retried request, re-apply item
+        # changes in case the previous attempt stopped half-way
+        updated_order = current
+
+    await apply_item_transition(db, updated_order)
+    if updated_order["status"] == "delivered":
+        await record_delivered_order(db, updated_order)
+
+    return trusted_response(order_from_doc(updated_order))
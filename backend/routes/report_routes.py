@@ -1,17 +1,68 @@
 """Reporting routes for managers and owners."""
 
-from datetime import datetime, timedelta, timezone
-from typing import Optional
+from datetime import datetime, timedelta, timezone, tzinfo
+from typing import Optional, Tuple
 
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from fastapi.security import HTTPAuthorizationCredentials
 
 from auth import get_optional_user, require_role, security
-from models import InventoryReport, SalesReport, TopSellingItem
+from exports import parse_datetime
+from leaderboard import top_sellers
+from models import (
+    InventoryReport,
+    ReportJob,
+    ReportJobRequest,
+    SalesReport,
+    SalesTimeseries,
+    SalesTimeseriesBucket,
+    TopSellersReport,
+    TopSellingItem,
+)
+from sales_timeseries import (
+    MAX_TIMESERIES_BUCKETS,
+    Interval,
+    bucket_starts,
+    dense_buckets,
+    resolve_timezone,
+    timeseries_pipeline,
+)
 
 router = APIRouter(prefix="/reports", tags=["reports"])
 
 
+def _parse_report_range(
+    start_date: Optional[str],
+    end_date: Optional[str],
+    default_days: int = 30,
+    tz: Optional[tzinfo] = None,
+) -> Tuple[datetime, datetime]:
+    """
+    Parse a report window, defaulting to the last `default_days` days and
+    capped at one year. Dates without an offset are read in `tz` (UTC when
+    not given); both bounds are returned in UTC.
+    """
+    zone = tz or timezone.utc
+    # Parse dates or use defaults (last 30 days)
+    end_dt = parse_datetime(end_date, "end_date", zone) or datetime.now(timezone.utc)
+    start_dt = parse_datetime(start_date, "start_date", zone) or end_dt - timedelta(days=default_days)
+
+    # Validate date range
+    if end_dt < start_dt:
+        raise HTTPException(
+            status_code=400,
+            detail="end_date must be after start_date",
+        )
+
+    if (end_dt - start_dt).days > 365:
+        raise HTTPException(
+            status_code=400,
+            detail="Date range cannot exceed 1 year",
+        )
+
+    return start_dt, end_dt
+
+
 @router.get("/inventory", response_model=InventoryReport)
 async def get_inventory_report(
     request: Request,
@@ -20,14 +71,20 @@ async def get_inventory_report(
     credentials: HTTPAuthorizationCredentials = Depends(security),
 ):
     """Get inventory report. Requires manager+ role."""
-    db = request.app.state.db
-
     # Authenticate and check role
     user = await get_optional_user(request, credentials)
     if not user:
         raise HTTPException(status_code=401, detail="Authorization required")
     require_role("manager")(user)
 
+    # Reports tolerate slightly stale reads and may be served by secondaries
+    return await build_inventory_report(request.app.state.analytics_db, category, material)
+
+
+async def build_inventory_report(
+    db, category: Optional[str] = None, material: Optional[str] = None
+) -> InventoryReport:
+    """Compute the inventory report; shared by the endpoint and report jobs."""
     # Build query
     query = {}
     if category:
@@ -76,37 +133,19 @@ async def get_sales_report(
     credentials: HTTPAuthorizationCredentials = Depends(security),
 ):
     """Get sales report. Requires manager+ role."""
-    db = request.app.state.db
-
     # Authenticate and check role
     user = await get_optional_user(request, credentials)
     if not user:
         raise HTTPException(status_code=401, detail="Authorization required")
     require_role("manager")(user)
 
-    # Parse dates or use defaults (last 30 days)
-    if end_date:
-        end_dt = datetime.fromisoformat(end_date.replace("Z", "+00:00"))
-    else:
-        end_dt = datetime.now(timezone.utc)
+    # Reports tolerate slightly stale reads and may be served by secondaries
+    return await build_sales_report(request.app.state.analytics_db, start_date, end_date)
 
-    if start_date:
-        start_dt = datetime.fromisoformat(start_date.replace("Z", "+00:00"))
-    else:
-        start_dt = end_dt - timedelta(days=30)
 
-    # Validate date range
-    if end_dt < start_dt:
-        raise HTTPException(
-            status_code=400,
-            detail="end_date must be after start_date",
-        )
-
-    if (end_dt - start_dt).days > 365:
-        raise HTTPException(
-            status_code=400,
-            detail="Date range cannot exceed 1 year",
-        )
+async def build_sales_report(db, start_date: Optional[str] = None, end_date: Optional[str] = None) -> SalesReport:
+    """Compute the sales report; shared by the endpoint and report jobs."""
+    start_dt, end_dt = _parse_report_range(start_date, end_date)
 
     # Build query
     query = {
@@ -132,26 +171,8 @@ async def get_sales_report(
         if order["status"] == "delivered"
     )
 
-    # Calculate top selling items
-    item_sales = {}
-    for order in orders:
-        if order["status"] == "delivered":
-            for item in order["items"]:
-                key = item["item_code"]
-                if key not in item_sales:
-                    item_sales[key] = {
-                        "item_code": item["item_code"],
-                        "name": item["name"],
-                        "quantity": 0,
-                    }
-                item_sales[key]["quantity"] += item["quantity"]
-
-    # Sort by quantity and get top 10
-    top_items = sorted(
-        item_sales.values(),
-        key=lambda x: x["quantity"],
-        reverse=True,
-    )[:10]
+    # Top selling items come from the precomputed leaderboard, in whole UTC days
+    top_items = await top_sellers(db, start_dt, end_dt, limit=10)
 
     return SalesReport(
         total_orders=total_orders,
@@ -163,4 +184,175 @@ async def get_sales_report(
             "end": end_dt.isoformat(),
         },
         top_selling_items=[TopSellingItem(**item) for item in top_items],
-    )
\ No newline at end of file
+    )
+
+
+# Default window per interval when start_date is omitted
+TIMESERIES_DEFAULT_DAYS = {"day": 30, "week": 12 * 7, "month": 365}
+
+
+@router.get("/sales/timeseries", response_model=SalesTimeseries)
+async def get_sales_timeseries(
+    request: Request,
+    interval: Interval = "day",
+    tz: str = "UTC",
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    limit: int = MAX_TIMESERIES_BUCKETS,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+):
+    """Get order counts and revenue per day, week or month. Requires manager+ role."""
+    # Reports tolerate slightly stale reads and may be served by secondaries
+    db = request.app.state.analytics_db
+
+    # Authenticate and check role
+    user = await get_optional_user(request, credentials)
+    if not user:
+        raise HTTPException(status_code=401, detail="Authorization required")
+    require_role("manager")(user)
+
+    zone = resolve_timezone(tz)
+    start_dt, end_dt = _parse_report_range(
+        start_date, end_date, default_days=TIMESERIES_DEFAULT_DAYS[interval], tz=zone
+    )
+    limit = max(1, min(limit, MAX_TIMESERIES_BUCKETS))
+
+    # One extra bucket start tells us whether the series was cut at the cap
+    starts = bucket_starts(start_dt, end_dt, interval, zone, limit + 1)
+    truncated = len(starts) > limit
+    if truncated:
+        # Stop the window where the first dropped bucket begins
+        end_dt = starts[limit] - timedelta(microseconds=1)
+        starts = starts[:limit]
+
+    pipeline = timeseries_pipeline(start_dt, end_dt, interval, tz, limit)
+    rows = await db.orders.aggregate(pipeline).to_list(length=limit)
+
+    return SalesTimeseries(
+        interval=interval,
+        timezone=tz,
+        date_range={
+            "start": start_dt.isoformat(),
+            "end": end_dt.isoformat(),
+        },
+        buckets=[SalesTimeseriesBucket(**bucket) for bucket in dense_buckets(rows, starts)],
+        truncated=truncated,
+    )
+
+
+@router.get("/top-sellers", response_model=TopSellersReport)
+async def get_top_sellers(
+    request: Request,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    limit: int = 10,
+    category: Optional[str] = None,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+):
+    """Get best-selling items from the leaderboard. Requires manager+ role."""
+    # Reports tolerate slightly stale reads and may be served by secondaries
+    db = request.app.state.analytics_db
+
+    # Authenticate and check role
+    user = await get_optional_user(request, credentials)
+    if not user:
+        raise HTTPException(status_code=401, detail="Authorization required")
+    require_role("manager")(user)
+
+    start_dt, end_dt = _parse_report_range(start_date, end_date)
+    limit = max(1, min(limit, 100))
+
+    top_items = await top_sellers(db, start_dt, end_dt, limit=limit, category=category)
+
+    return TopSellersReport(
+        date_range={
+            "start": start_dt.isoformat(),
+            "end": end_dt.isoformat(),
+        },
+        category=category,
+        items=[TopSellingItem(**item) for item in top_items],
+    )
+
+
+async def _inventory_job(db, params: dict) -> dict:
+    return (await build_inventory_report(db, **params)).model_dump(mode="json")
+
+
+async def _sales_job(db, params: dict) -> dict:
+    return (await build_sales_report(db, **params)).model_dump(mode="json")
+
+
+# Reports that can be computed as background jobs
+REPORT_BUILDERS = {
+    "inventory": _inventory_job,
+    "sales": _sales_job,
+}
+
+
+def _report_job_response(job: dict) -> ReportJob:
+    return ReportJob(
+        id=job["_id"],
+        report=job["report"],
+        params=job["params"],
+        status=job["status"],
+        result=job.get("result"),
+        error=job.get("error"),
+        requested_at=job["requested_at"],
+        started_at=job.get("started_at"),
+        completed_at=job.get("completed_at"),
+    )
+
+
+@router.post("/jobs", response_model=ReportJob)
+async def submit_report_job(
+    job_request: ReportJobRequest,
+    request: Request,
+    response: Response,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+):
+    """
+    Submit a report job. Returns 200 with the cached snapshot while it is
+    fresh, otherwise 202 with a job to poll. Requires manager+ role.
+    """
+    # Authenticate and check role
+    user = await get_optional_user(request, credentials)
+    if not user:
+        raise HTTPException(status_code=401, detail="Authorization required")
+    require_role("manager")(user)
+
+    if job_request.report == "sales":
+        # Reject bad ranges now rather than in the background
+        _parse_report_range(job_request.start_date, job_request.end_date)
+        params = {"start_date": job_request.start_date, "end_date": job_request.end_date}
+    else:
+        params = {"category": job_request.category, "material": job_request.material}
+    params = {key: value for key, value in params.items() if value is not None}
+
+    job = await request.app.state.report_jobs.submit(job_request.report, params)
+
+    if job["status"] != "completed":
+        response.status_code = 202
+    return _report_job_response(job)
+
+
+@router.get("/jobs/{job_id}", response_model=ReportJob)
+async def get_report_job(
+    job_id: str,
+    request: Request,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+):
+    """Poll a report job; `result` holds the latest snapshot. Requires manager+ role."""
+    # Authenticate and check role
+    user = await get_optional_user(request, credentials)
+    if not user:
+        raise HTTPException(status_code=401, detail="Authorization required")
+    require_role("manager")(user)
+
+    job = await request.app.state.report_jobs.get(job_id)
+    if not job:
+        raise HTTPException(
+            status_code=404,
+            detail={"error": {"code": "REPORT_JOB_NOT_FOUND", "message": "Report job not found"}},
+        )
+
+    return _report_job_response(job)
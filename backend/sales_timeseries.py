@@ -0,0 +1,106 @@
+"""Bucketed sales time series for report charts.
+
+Orders in a window are grouped server-side by ``order_date`` truncated to a
+day, ISO week (Monday start) or month in the requested time zone, using
+``$dateTrunc`` (MongoDB 5.0+). Buckets with no orders are filled with zeros
+so the series is dense for charting.
+"""
+
+import re
+from datetime import datetime, timedelta, timezone, tzinfo
+from typing import Dict, List, Literal
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from fastapi import HTTPException
+
+Interval = Literal["day", "week", "month"]
+
+# One year of daily buckets, the longest window reports allow
+MAX_TIMESERIES_BUCKETS = 366
+
+_UTC_OFFSET = re.compile(r"^([+-])(\d{2}):?(\d{2})$")
+
+
+def resolve_timezone(name: str) -> tzinfo:
+    """Resolve an Olson name or a +HH:MM offset, the forms $dateTrunc accepts."""
+    match = _UTC_OFFSET.match(name)
+    if match:
+        sign, hours, minutes = match.groups()
+        offset = timedelta(hours=int(hours), minutes=int(minutes))
+        if offset < timedelta(hours=24):
+            return timezone(-offset if sign == "-" else offset)
+    else:
+        try:
+            return ZoneInfo(name)
+        except (ZoneInfoNotFoundError, ValueError):
+            pass
+    raise HTTPException(
+        status_code=400,
+        detail={"error": {"code": "INVALID_TIMEZONE", "message": f"Unknown time zone {name!r}"}},
+    )
+
+
+def truncate(value: datetime, interval: Interval, tz: tzinfo) -> datetime:
+    """Start of the bucket containing `value`, as an aware UTC datetime."""
+    local = value.astimezone(tz).replace(hour=0, minute=0, second=0, microsecond=0)
+    if interval == "week":
+        local -= timedelta(days=local.weekday())
+    elif interval == "month":
+        local = local.replace(day=1)
+    # Rebuild from the wall-clock date so DST offsets are resolved for midnight
+    local = datetime(local.year, local.month, local.day, tzinfo=tz)
+    return local.astimezone(timezone.utc)
+
+
+def bucket_starts(start: datetime, end: datetime, interval: Interval, tz: tzinfo, limit: int) -> List[datetime]:
+    """Bucket starts (UTC) from start to end, at most `limit` of them."""
+    current = truncate(start, interval, tz).astimezone(tz)
+    starts = []
+    while current <= end and len(starts) < limit:
+        starts.append(current.astimezone(timezone.utc))
+        # Aware arithmetic on the same tzinfo is wall-clock, so DST days stay at midnight
+        if interval == "day":
+            current += timedelta(days=1)
+        elif interval == "week":
+            current += timedelta(days=7)
+        elif current.month == 12:
+            current = current.replace(year=current.year + 1, month=1)
+        else:
+            current = current.replace(month=current.month + 1)
+    return starts
+
+
+def timeseries_pipeline(start: datetime, end: datetime, interval: Interval, tz_name: str, limit: int) -> List[dict]:
+    """Aggregation grouping orders into at most `limit` buckets."""
+    trunc = {"date": "$order_date", "unit": interval, "timezone": tz_name}
+    if interval == "week":
+        trunc["startOfWeek"] = "monday"
+
+    delivered = {"$eq": ["$status", "delivered"]}
+    return [
+        {"$match": {"order_date": {"$gte": start, "$lte": end}}},
+        {
+            "$group": {
+                "_id": {"$dateTrunc": trunc},
+                "orders": {"$sum": 1},
+                "completed_orders": {"$sum": {"$cond": [delivered, 1, 0]}},
+                "revenue": {"$sum": {"$cond": [delivered, "$total_amount", 0]}},
+            }
+        },
+        {"$sort": {"_id": 1}},
+        {"$limit": limit},
+    ]
+
+
+def dense_buckets(rows: List[dict], starts: List[datetime]) -> List[Dict]:
+    """Merge aggregated rows into the full list of bucket starts, zero-filling gaps."""
+    by_start = {row["_id"].replace(tzinfo=timezone.utc): row for row in rows}
+    return [
+        {
+            "bucket_start": bucket_start,
+            "orders": by_start.get(bucket_start, {}).get("orders", 0),
+            "completed_orders": by_start.get(bucket_start, {}).get("completed_orders", 0),
+            "revenue": by_start.get(bucket_start, {}).get("revenue", 0),
+        }
+        for bucket_start in starts
+    ]
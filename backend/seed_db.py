@@ -10,22 +10,30 @@ from motor.motor_asyncio import AsyncIOMotorClient
 
 sys.path.insert(0, os.path.dirname(__file__))
 from auth import hash_password
+from leaderboard import ensure_leaderboard_indexes, record_unrecorded_orders
+from phone import backfill_normalised_phones, ensure_customer_phone_indexes
+from routes.inventory_routes import ensure_item_indexes
 
 load_dotenv()
 
 
-async def seed_users():
-    """Seed database with test users."""
-    mongo_url = os.getenv("MONGO_URL")
-    db_name = os.getenv("DB_NAME")
-
-    if not mongo_url or not db_name:
-        print("Error: MONGO_URL and DB_NAME must be set in .env")
-        return
+async def ensure_indexes(db):
+    """Create the indexes the API's queries rely on."""
+    await db.users.create_index("email", unique=True)
+    await ensure_item_indexes(db)
+    await db.jewellery_items.create_index("status")
+    await db.jewellery_items.create_index("category")
+    await db.jewellery_items.create_index("material")
+    await db.orders.create_index("status")
+    await db.orders.create_index("customer_phone")
+    await ensure_customer_phone_indexes(db)
+    await db.orders.create_index("order_date")
+    await db.orders.create_index([("status", 1), ("order_date", 1)])
+    await db.jewellery_items.create_index("reserved_order_id", sparse=True)
 
-    client = AsyncIOMotorClient(mongo_url)
-    db = client[db_name]
 
+async def seed_database(db):
+    """Create the test users, indexes and backfills on an open database."""
     # Test users
     users = [
         {
@@ -59,15 +67,31 @@ async def seed_users():
         await db.users.replace_one({"_id": user["_id"]}, user, upsert=True)
         print(f"Created user: {user['email']} (role: {user['role']})")
 
-    # Create indexes
-    await db.users.create_index("email", unique=True)
-    await db.jewellery_items.create_index("item_code", unique=True)
-    await db.jewellery_items.create_index("status")
-    await db.jewellery_items.create_index("category")
-    await db.jewellery_items.create_index("material")
-    await db.orders.create_index("status")
-    await db.orders.create_index("customer_phone")
-    await db.orders.create_index("order_date")
+    await ensure_indexes(db)
+
+    # Backfill normalised phone numbers on orders placed before they were stored
+    backfilled = await backfill_normalised_phones(db)
+    if backfilled:
+        print(f"Backfilled normalised phone numbers on {backfilled} orders")
+
+    # Count delivered orders placed before the leaderboard existed
+    await ensure_leaderboard_indexes(db)
+    counted = await record_unrecorded_orders(db)
+    if counted:
+        print(f"Added {counted} delivered orders to the top-sellers leaderboard")
+
+
+async def seed_users():
+    """Seed database with test users."""
+    mongo_url = os.getenv("MONGO_URL")
+    db_name = os.getenv("DB_NAME")
+
+    if not mongo_url or not db_name:
+        print("Error: MONGO_URL and DB_NAME must be set in .env")
+        return
+
+    client = AsyncIOMotorClient(mongo_url)
+    await seed_database(client[db_name])
 
     print("\nDatabase seeded successfully!")
     print("\nTest credentials:")
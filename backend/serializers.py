@@ -0,0 +1,73 @@
+"""Trusted-read mapping from stored Mongo documents to API responses.
+
+Documents in ``jewellery_items`` and ``orders`` were validated when they were
+written, so listing and update endpoints rebuild models with
+``model_construct`` (no ``field_validator`` runs) and return a ready
+``FastJSONResponse``, which FastAPI sends as-is instead of re-validating it
+against ``response_model``.
+"""
+
+from typing import Any, Dict, List
+
+from pydantic import BaseModel
+
+from json_response import FastJSONResponse
+from models import JewelleryItem, Order, OrderItem
+
+
+def item_from_doc(item: dict) -> JewelleryItem:
+    """Build a JewelleryItem from a stored document without validation."""
+    return JewelleryItem.model_construct(
+        id=item["_id"],
+        item_code=item["item_code"],
+        name=item["name"],
+        description=item["description"],
+        category=item["category"],
+        price=item["price"],
+        weight=item["weight"],
+        material=item["material"],
+        images=item.get("images", []),
+        status=item["status"],
+        version=item.get("version", 1),
+        created_at=item["created_at"],
+        updated_at=item["updated_at"],
+    )
+
+
+# Fields older documents may lack; both item mappings fill in the model default
+DEFAULTED_ITEM_FIELDS = ("images", "version")
+
+
+def _item_value(item: dict, name: str) -> Any:
+    if name == "id":
+        return item["_id"]
+    if name not in item and name in DEFAULTED_ITEM_FIELDS:
+        return JewelleryItem.model_fields[name].get_default(call_default_factory=True)
+    return item.get(name)
+
+
+def sparse_item(item: dict, fields: List[str]) -> Dict[str, Any]:
+    """Map a projected item document to a dict holding only the selected fields."""
+    return {name: _item_value(item, name) for name in fields}
+
+
+def order_from_doc(order: dict) -> Order:
+    """Build an Order from a stored document without validation."""
+    return Order.model_construct(
+        id=order["_id"],
+        customer_name=order["customer_name"],
+        customer_phone=order["customer_phone"],
+        customer_address=order["customer_address"],
+        items=[OrderItem.model_construct(**item) for item in order["items"]],
+        total_amount=order["total_amount"],
+        status=order["status"],
+        payment_method=order["payment_method"],
+        order_date=order["order_date"],
+        delivery_date=order.get("delivery_date"),
+        version=order.get("version", 1),
+    )
+
+
+def trusted_response(model: BaseModel, status_code: int = 200) -> FastJSONResponse:
+    """Serialise a trusted model once and bypass response_model validation."""
+    return FastJSONResponse(content=model.model_dump(mode="json"), status_code=status_code)
@@ -1,5 +1,6 @@
 """FastAPI server exposing AI agent endpoints."""
 
+import asyncio
 import logging
 import os
 import uuid
@@ -10,12 +11,36 @@ from typing import Dict, List, Optional
 
 from dotenv import load_dotenv
 from fastapi import APIRouter, FastAPI, HTTPException, Request
-from motor.motor_asyncio import AsyncIOMotorClient
+from fastapi.responses import Response
 from pydantic import BaseModel, Field
 from starlette.middleware.cors import CORSMiddleware
 
 from ai_agents.agents import AgentConfig, ChatAgent, SearchAgent
-from routes import auth_routes, inventory_routes, order_routes, report_routes
+from auth import token_cache
+from cache_bus import create_cache_bus
+from compression import CompressionMiddleware
+from database import DatabaseSettings, PoolMonitor, analytics_database, create_client, env_int
+from idempotency import IdempotencyMiddleware, ensure_idempotency_indexes
+from json_response import FastJSONResponse
+from leaderboard import ensure_leaderboard_indexes, repair_leaderboard
+from metrics import (
+    CONTENT_TYPE,
+    MetricsMiddleware,
+    MetricsSettings,
+    cache_collector,
+    pool_collector,
+    registry,
+    sweeper_collector,
+)
+from phone import backfill_normalised_phones, ensure_customer_phone_indexes
+from rate_limit import create_login_rate_limiter
+from refresh_tokens import RefreshTokenSettings, ensure_refresh_token_indexes
+from report_jobs import ReportJobSettings, ReportJobs
+from reservation_sweeper import ReservationSweeper, SweeperSettings
+from routes import admin_routes, auth_routes, inventory_routes, order_routes, report_routes
+from slow_queries import SlowQueryRecorder, SlowQuerySettings
+from token_revocation import AuthSettings, TokenRevocationList
+from tracing import MongoCommandTracer, TracingMiddleware, TracingSettings, create_exporter
 
 
 logging.basicConfig(
@@ -26,6 +51,11 @@ logger = logging.getLogger(__name__)
 
 ROOT_DIR = Path(__file__).parent
 
+# Replay window for Idempotency-Key responses
+IDEMPOTENCY_TTL_SECONDS = 24 * 60 * 60
+# How long a request may hold its key before a retry can take it over
+IDEMPOTENCY_CLAIM_TIMEOUT_SECONDS = 60
+
 
 class StatusCheck(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -79,45 +109,134 @@ def _get_agent_cache(request: Request) -> Dict[str, object]:
     return request.app.state.agent_cache
 
 
+def _build_agent(config: AgentConfig, agent_type: str):
+    if agent_type == "search":
+        return SearchAgent(config)
+    if agent_type == "chat":
+        return ChatAgent(config)
+    raise HTTPException(status_code=400, detail=f"Unknown agent type '{agent_type}'")
+
+
 async def _get_or_create_agent(request: Request, agent_type: str):
     cache = _get_agent_cache(request)
     if agent_type in cache:
         return cache[agent_type]
 
     config: AgentConfig = request.app.state.agent_config
-
-    if agent_type == "search":
-        cache[agent_type] = SearchAgent(config)
-    elif agent_type == "chat":
-        cache[agent_type] = ChatAgent(config)
-    else:
-        raise HTTPException(status_code=400, detail=f"Unknown agent type '{agent_type}'")
+    cache[agent_type] = _build_agent(config, agent_type)
 
     return cache[agent_type]
 
 
+async def _warm_up_worker(app: FastAPI) -> None:
+    """Open Mongo connections and optionally build agents before serving traffic."""
+    try:
+        await app.state.db.command("ping")
+    except Exception as exc:  # pragma: no cover - defensive
+        logger.warning("Mongo warm-up ping failed: %s", exc)
+
+    if os.getenv("WARM_UP_AGENTS", "false").lower() in ("1", "true", "yes"):
+        for agent_type in ("chat", "search"):
+            app.state.agent_cache[agent_type] = _build_agent(app.state.agent_config, agent_type)
+
+
+async def _run_backfills(db) -> None:
+    """Complete orders left by older versions or interrupted requests, without delaying startup."""
+    backfills = (
+        ("normalised phone numbers", backfill_normalised_phones),
+        ("top-sellers leaderboard", repair_leaderboard),
+    )
+    for name, backfill in backfills:
+        try:
+            backfilled = await backfill(db)
+        except Exception:
+            logger.exception("Backfilling %s failed", name)
+            continue
+        if backfilled:
+            logger.info("Backfilled %s from %s orders", name, backfilled)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     load_dotenv(ROOT_DIR / ".env")
 
-    mongo_url = os.getenv("MONGO_URL")
-    db_name = os.getenv("DB_NAME")
-
-    if not mongo_url or not db_name:
-        missing = [name for name, value in {"MONGO_URL": mongo_url, "DB_NAME": db_name}.items() if not value]
-        raise RuntimeError(f"Missing required environment variables: {', '.join(missing)}")
-
-    client = AsyncIOMotorClient(mongo_url)
+    db_settings = DatabaseSettings.from_env()
+    pool_monitor = PoolMonitor()
+    slow_queries = SlowQueryRecorder(SlowQuerySettings.from_env())
+    client = create_client(db_settings, pool_monitor, [MongoCommandTracer(), slow_queries])
 
     try:
+        # Read here rather than at import, so .env applies and importing the app writes no trace file
+        app.state.tracing_settings = TracingSettings.from_env()
+        app.state.metrics_settings = MetricsSettings.from_env()
+        app.state.span_exporter = create_exporter(app.state.tracing_settings)
         app.state.mongo_client = client
-        app.state.db = client[db_name]
+        app.state.db_settings = db_settings
+        app.state.pool_monitor = pool_monitor
+        app.state.db = client[db_settings.db_name]
+        app.state.analytics_db = analytics_database(client, db_settings)
+        app.state.slow_queries = slow_queries
+        slow_queries.bind(app.state.db)
         app.state.agent_config = AgentConfig()
         app.state.agent_cache = {}
-        logger.info("AI Agents API starting up")
+
+        # Per-worker caches are invalidated across processes through the bus
+        app.state.cache_bus = create_cache_bus(app.state.db)
+        app.state.cache_bus.register("agents", app.state.agent_cache)
+        app.state.cache_bus.register("tokens", token_cache)
+        await app.state.cache_bus.start()
+
+        # Revocations are checked in memory on every authenticated request
+        app.state.token_revocations = TokenRevocationList(app.state.db, AuthSettings.from_env())
+        await app.state.token_revocations.start()
+
+        app.state.login_rate_limiter = create_login_rate_limiter(app.state.db)
+        await app.state.login_rate_limiter.ensure_indexes()
+
+        app.state.refresh_token_settings = RefreshTokenSettings.from_env()
+        await ensure_refresh_token_indexes(app.state.db)
+        app.state.idempotency_claim_timeout = env_int(
+            "IDEMPOTENCY_CLAIM_TIMEOUT_SECONDS", IDEMPOTENCY_CLAIM_TIMEOUT_SECONDS
+        )
+        await ensure_idempotency_indexes(
+            app.state.db, env_int("IDEMPOTENCY_TTL_SECONDS", IDEMPOTENCY_TTL_SECONDS)
+        )
+        await ensure_leaderboard_indexes(app.state.db)
+        await ensure_customer_phone_indexes(app.state.db)
+        await inventory_routes.ensure_item_indexes(app.state.db)
+        await _warm_up_worker(app)
+        app.state.backfills = asyncio.create_task(_run_backfills(app.state.db))
+
+        app.state.report_jobs = ReportJobs(
+            app.state.db, app.state.analytics_db, report_routes.REPORT_BUILDERS, ReportJobSettings.from_env()
+        )
+        await app.state.report_jobs.ensure_indexes()
+
+        app.state.reservation_sweeper = ReservationSweeper(app.state.db, SweeperSettings.from_env())
+        await app.state.reservation_sweeper.start()
+
+        registry.register_collector("mongo_pool", pool_collector(pool_monitor))
+        registry.register_collector("reservation_sweeper", sweeper_collector(app.state.reservation_sweeper))
+        registry.register_collector(
+            "caches", cache_collector({"tokens": token_cache, "reports": app.state.report_jobs})
+        )
+
+        logger.info("AI Agents API starting up (pid %s)", os.getpid())
         yield
     finally:
+        if hasattr(app.state, "backfills"):
+            app.state.backfills.cancel()
+        if hasattr(app.state, "reservation_sweeper"):
+            await app.state.reservation_sweeper.stop()
+        if hasattr(app.state, "report_jobs"):
+            await app.state.report_jobs.stop()
+        if hasattr(app.state, "token_revocations"):
+            await app.state.token_revocations.stop()
+        if hasattr(app.state, "cache_bus"):
+            await app.state.cache_bus.stop()
         client.close()
+        if getattr(app.state, "span_exporter", None) is not None:
+            app.state.span_exporter.shutdown()
         logger.info("AI Agents API shutdown complete")
 
 
@@ -125,6 +244,7 @@ app = FastAPI(
     title="AI Agents API",
     description="Minimal AI Agents API with LangGraph and MCP support",
     lifespan=lifespan,
+    default_response_class=FastJSONResponse,
 )
 
 api_router = APIRouter(prefix="/api")
@@ -237,6 +357,16 @@ async def get_agent_capabilities(request: Request):
         return {"success": False, "error": str(exc)}
 
 
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics(request: Request):
+    metrics_settings: MetricsSettings = request.app.state.metrics_settings
+    if not metrics_settings.served:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not metrics_settings.authorized(request.headers.get("authorization")):
+        raise HTTPException(status_code=401, detail="Authorization required")
+    return Response(registry.render(), media_type=CONTENT_TYPE)
+
+
 app.include_router(api_router)
 
 # Include jewellery store routes
@@ -244,6 +374,14 @@ app.include_router(auth_routes.router, prefix="/api")
 app.include_router(inventory_routes.router, prefix="/api")
 app.include_router(order_routes.router, prefix="/api")
 app.include_router(report_routes.router, prefix="/api")
+app.include_router(admin_routes.router, prefix="/api")
+
+app.add_middleware(
+    IdempotencyMiddleware,
+    routes=[("POST", "/api/orders"), ("POST", "/api/inventory/items")],
+)
+
+app.add_middleware(CompressionMiddleware, minimum_size=1000)
 
 app.add_middleware(
     CORSMiddleware,
@@ -252,3 +390,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+
+app.add_middleware(MetricsMiddleware)
+
+# Outermost, so the request span and Server-Timing cover every other layer
+app.add_middleware(TracingMiddleware)
@@ -0,0 +1,282 @@
+"""Slow MongoDB query recorder with sampled explain plans.
+
+A pymongo ``CommandListener`` times every read and write command. Commands
+slower than their threshold are grouped by *query shape* (command,
+collection, and filter/sort/pipeline with literal values replaced by ``?``),
+so a regex search or a skip-heavy page shows up as one entry however many
+customers hit it. The first offender of each shape, and then at most one
+per ``SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS``, is re-run through ``explain``
+(queryPlanner verbosity, so nothing is executed) to show whether the
+planner chose an index or a COLLSCAN. Each shape also lists the routes that
+issued it, from the route ``TracingMiddleware`` records for every request,
+whether or not the request is traced.
+
+Configuration (environment):
+    SLOW_QUERY_MS                      default threshold (default 100)
+    SLOW_QUERY_THRESHOLDS              per-command overrides, e.g. "aggregate=500,find=50"
+    SLOW_QUERY_EXPLAIN                 sample explain plans (default true)
+    SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS  minimum gap between explains of one shape (default 600)
+"""
+
+import asyncio
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson.regex import Regex
+from pymongo import monitoring
+
+from database import env_int
+from tracing import current_route
+
+logger = logging.getLogger(__name__)
+
+# Commands whose duration is worth recording; getMore is part of the find it continues
+RECORDED_COMMANDS = frozenset(
+    {"find", "aggregate", "count", "distinct", "update", "delete", "findAndModify", "getMore"}
+)
+EXPLAINABLE_COMMANDS = frozenset({"find", "aggregate", "count", "distinct"})
+
+# Session and transport fields that must not be sent inside an explain
+_DRIVER_FIELDS = frozenset(
+    {
+        "lsid",
+        "txnNumber",
+        "autocommit",
+        "startTransaction",
+        "readConcern",
+        "writeConcern",
+        "$db",
+        "$clusterTime",
+        "$readPreference",
+        "apiVersion",
+        "apiStrict",
+        "apiDeprecationErrors",
+    }
+)
+
+MAX_SHAPES = 200
+
+
+@dataclass
+class SlowQuerySettings:
+    threshold_ms: int = 100
+    command_thresholds_ms: Dict[str, int] = field(default_factory=dict)
+    explain: bool = True
+    explain_interval_seconds: int = 600
+
+    @classmethod
+    def from_env(cls) -> "SlowQuerySettings":
+        overrides = {}
+        for item in os.getenv("SLOW_QUERY_THRESHOLDS", "").split(","):
+            if "=" in item:
+                command, value = item.split("=", 1)
+                overrides[command.strip()] = int(value)
+        return cls(
+            threshold_ms=env_int("SLOW_QUERY_MS", cls.threshold_ms),
+            command_thresholds_ms=overrides,
+            explain=os.getenv("SLOW_QUERY_EXPLAIN", "true").lower() in ("1", "true", "yes"),
+            explain_interval_seconds=env_int("SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS", cls.explain_interval_seconds),
+        )
+
+    def threshold_for(self, command_name: str) -> int:
+        return self.command_thresholds_ms.get(command_name, self.threshold_ms)
+
+
+def query_shape(value: Any) -> Any:
+    """Replace literal values with placeholders, keeping field names and operators."""
+    if isinstance(value, dict):
+        return {key: query_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        shapes = [query_shape(item) for item in value]
+        # Lists of literals ($in, images, ...) collapse to one placeholder
+        if all(shape == "?" for shape in shapes):
+            return "?"
+        return shapes
+    if isinstance(value, (Regex, re.Pattern)):
+        return "?regex"
+    return "?"
+
+
+def _shape_of(command_name: str, command: dict) -> dict:
+    if command_name == "find":
+        shape = {"filter": query_shape(command.get("filter", {}))}
+        if "sort" in command:
+            shape["sort"] = command["sort"]
+        if command.get("skip"):
+            shape["skip"] = "?"
+        return shape
+    if command_name == "aggregate":
+        return {"pipeline": query_shape(command.get("pipeline", []))}
+    if command_name == "count":
+        return {"query": query_shape(command.get("query", {}))}
+    if command_name == "distinct":
+        return {"key": command.get("key"), "query": query_shape(command.get("query", {}))}
+    if command_name in ("update", "delete"):
+        statements = command.get(f"{command_name}s") or [{}]
+        return {"q": query_shape(statements[0].get("q", {}))}
+    if command_name == "findAndModify":
+        return {"query": query_shape(command.get("query", {}))}
+    return {}
+
+
+def _plan_summary(explain: dict) -> dict:
+    """Stage names, index names and whether any branch scans the whole collection."""
+    stages: List[str] = []
+    indexes: List[str] = []
+
+    def walk(node: Any) -> None:
+        if isinstance(node, dict):
+            if "stage" in node:
+                stages.append(node["stage"])
+                if node.get("indexName"):
+                    indexes.append(node["indexName"])
+            for key, child in node.items():
+                if key in ("winningPlan", "queryPlan", "inputStage", "inputStages", "queryPlanner", "stages", "$cursor"):
+                    walk(child)
+        elif isinstance(node, list):
+            for child in node:
+                walk(child)
+
+    walk(explain)
+    return {"stages": stages, "indexes": indexes, "collscan": "COLLSCAN" in stages}
+
+
+@dataclass
+class SlowQueryShape:
+    command: str
+    collection: Optional[str]
+    shape: dict
+    routes: List[str] = field(default_factory=list)
+    count: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+    last_ms: float = 0.0
+    last_seen: Optional[datetime] = None
+    plan: Optional[dict] = None
+    explained_at: Optional[float] = None
+
+    def as_dict(self) -> dict:
+        data = asdict(self)
+        data["avg_ms"] = round(self.total_ms / self.count, 3) if self.count else 0.0
+        data["total_ms"] = round(self.total_ms, 3)
+        data.pop("explained_at")
+        return data
+
+
+class SlowQueryRecorder(monitoring.CommandListener):
+    """CommandListener keeping per-shape stats for commands over their threshold."""
+
+    def __init__(self, settings: SlowQuerySettings):
+        self.settings = settings
+        self._lock = threading.Lock()
+        self._started: Dict[Tuple[int, Any], Tuple[str, Optional[str], dict, Optional[str]]] = {}
+        self._shapes: "OrderedDict[str, SlowQueryShape]" = OrderedDict()
+        self._db = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def bind(self, db) -> None:
+        """Give the recorder a database and event loop for explain sampling."""
+        self._db = db
+        self._loop = asyncio.get_running_loop()
+
+    def started(self, event):
+        if event.command_name not in RECORDED_COMMANDS:
+            return
+        collection = event.command.get(event.command_name)
+        entry = (
+            event.command_name,
+            collection if isinstance(collection, str) else None,
+            event.command,
+            current_route(),
+        )
+        with self._lock:
+            self._started[(event.request_id, event.connection_id)] = entry
+
+    def succeeded(self, event):
+        with self._lock:
+            entry = self._started.pop((event.request_id, event.connection_id), None)
+        if entry is None:
+            return
+
+        duration_ms = event.duration_micros / 1000
+        command_name, collection, command, route = entry
+        if duration_ms < self.settings.threshold_for(command_name):
+            return
+        self._record(command_name, collection, command, route, duration_ms, event.database_name)
+
+    def failed(self, event):
+        with self._lock:
+            self._started.pop((event.request_id, event.connection_id), None)
+
+    def _record(self, command_name, collection, command, route, duration_ms, database_name) -> None:
+        shape = _shape_of(command_name, command)
+        key = json.dumps([command_name, collection, shape], sort_keys=True, default=str)
+        now = time.time()
+
+        with self._lock:
+            entry = self._shapes.get(key)
+            if entry is None:
+                entry = SlowQueryShape(command=command_name, collection=collection, shape=shape)
+                self._shapes[key] = entry
+                while len(self._shapes) > MAX_SHAPES:
+                    self._shapes.popitem(last=False)
+            self._shapes.move_to_end(key)
+
+            entry.count += 1
+            entry.total_ms += duration_ms
+            entry.max_ms = max(entry.max_ms, round(duration_ms, 3))
+            entry.last_ms = round(duration_ms, 3)
+            entry.last_seen = datetime.now(timezone.utc)
+            if route and route not in entry.routes:
+                entry.routes.append(route)
+
+            explain_due = (
+                self.settings.explain
+                and command_name in EXPLAINABLE_COMMANDS
+                and (entry.explained_at is None or now - entry.explained_at >= self.settings.explain_interval_seconds)
+            )
+            if explain_due:
+                entry.explained_at = now
+
+        logger.warning("Slow %s on %s: %.1f ms (%s)", command_name, collection, duration_ms, route or "no route")
+
+        if explain_due and self._loop is not None and self._db is not None:
+            explain_command = {name: value for name, value in command.items() if name not in _DRIVER_FIELDS}
+            # Listener callbacks run on driver threads; explain on the event loop
+            self._loop.call_soon_threadsafe(
+                lambda: asyncio.ensure_future(self._explain(key, database_name, explain_command))
+            )
+
+    async def _explain(self, key: str, database_name: str, command: dict) -> None:
+        try:
+            result = await self._db.client[database_name].command(
+                {"explain": command, "verbosity": "queryPlanner"}
+            )
+        except Exception as exc:
+            plan = {"error": str(exc)}
+        else:
+            plan = _plan_summary(result)
+        plan["explained_at"] = datetime.now(timezone.utc)
+
+        with self._lock:
+            entry = self._shapes.get(key)
+            if entry is not None:
+                entry.plan = plan
+
+    def snapshot(self, limit: int = 50) -> List[dict]:
+        """Slow query shapes, most total time first."""
+        with self._lock:
+            shapes = sorted(self._shapes.values(), key=lambda entry: entry.total_ms, reverse=True)
+            return [entry.as_dict() for entry in shapes[:limit]]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._shapes.clear()
@@ -0,0 +1,159 @@
+"""Shared fixtures: the API in-process, or a live server when TEST_API_URL is set.
+
+By default ``server.app`` runs inside the test process on an in-memory
+mongomock database (``MONGO_URL=mongomock://``) with a fake chat model in
+place of the LLM proxy, and is driven through
+``httpx.AsyncClient(transport=ASGITransport(app))``. The app gets its own
+event loop on a background thread, so synchronous tests can call it and no
+server or network loopback is needed. Every pytest-xdist worker builds its
+own app and database, so the suite runs in parallel:
+
+    cd backend && python -m pytest -n auto tests/test_jewellery_api.py tests/test_api.py
+
+Set TEST_MONGO_URL to run in-process against a real ``mongod`` (each worker
+uses its own database, dropped afterwards), or TEST_API_URL
+(e.g. ``http://localhost:8001/api``) to test a running server instead.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+from functools import partialmethod
+from typing import Optional
+
+import httpx
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import MOCK_MONGO_URL  # noqa: E402
+
+LIVE_API_URL = os.getenv("TEST_API_URL")
+IN_PROCESS_URL = "http://testserver"
+DEFAULT_LLM_REPLY = "This is a canned reply from the test chat model."
+
+
+class InProcessClient:
+    """Synchronous facade over an httpx.AsyncClient bound to the ASGI app."""
+
+    def __init__(self, app, base_url: str):
+        self.app = app
+        self.base_url = base_url
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="asgi-app", daemon=True)
+        self._lifespan = None
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def run(self, coroutine):
+        """Run a coroutine on the app's event loop and wait for its result."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def start(self) -> None:
+        self._thread.start()
+        self._lifespan = self.app.router.lifespan_context(self.app)
+        self.run(self._lifespan.__aenter__())
+        self._client = httpx.AsyncClient(transport=httpx.ASGITransport(app=self.app), base_url=self.base_url)
+
+    def close(self) -> None:
+        try:
+            self.run(self._client.aclose())
+            self.run(self._lifespan.__aexit__(None, None, None))
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=10)
+            self._loop.close()
+
+    def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        # Tests pass requests-style timeouts; there is no socket to time out here
+        kwargs.pop("timeout", None)
+        return self.run(self._client.request(method, url, **kwargs))
+
+    get = partialmethod(request, "GET")
+    post = partialmethod(request, "POST")
+    put = partialmethod(request, "PUT")
+    patch = partialmethod(request, "PATCH")
+    delete = partialmethod(request, "DELETE")
+
+
+def _worker_suffix() -> str:
+    return os.getenv("PYTEST_XDIST_WORKER", "main")
+
+
+@pytest.fixture(scope="session")
+def fake_llm():
+    """Chat model every agent gets in place of ChatOpenAI when in-process."""
+    return FakeListChatModel(responses=[DEFAULT_LLM_REPLY])
+
+
+@pytest.fixture(scope="session")
+def api(fake_llm):
+    """HTTP client for the API under test; paths are relative to ``/api``."""
+    if LIVE_API_URL:
+        with httpx.Client(base_url=LIVE_API_URL, timeout=30) as client:
+            client.server_url = LIVE_API_URL.rsplit("/api", 1)[0]
+            yield client
+        return
+
+    os.environ["MONGO_URL"] = os.getenv("TEST_MONGO_URL", MOCK_MONGO_URL)
+    os.environ["DB_NAME"] = f"test_jewellery_{_worker_suffix()}"
+    # Keep .env from pointing agents at the MCP servers; load_dotenv never overrides
+    os.environ["CODEXHUB_MCP_AUTH_TOKEN"] = ""
+    # ASGITransport connects as 127.0.0.1; treat it as the ingress so X-Forwarded-For is honoured
+    os.environ["LOGIN_TRUSTED_PROXIES"] = "127.0.0.1"
+    os.environ["SERVER_TIMING_ENABLED"] = "true"
+    os.environ["METRICS_TOKEN"] = "test-metrics-token"
+
+    import ai_agents.agents
+    from seed_db import seed_database
+    from server import app
+
+    ai_agents.agents.ChatOpenAI = lambda **kwargs: fake_llm
+
+    client = InProcessClient(app, f"{IN_PROCESS_URL}/api")
+    client.server_url = IN_PROCESS_URL
+    client.start()
+    try:
+        client.run(seed_database(app.state.db))
+        yield client
+    finally:
+        if not os.environ["MONGO_URL"].startswith(MOCK_MONGO_URL):
+            client.run(app.state.mongo_client.drop_database(os.environ["DB_NAME"]))
+        client.close()
+
+
+@pytest.fixture
+def llm_reply(fake_llm):
+    """Set what the fake LLM answers for this test; a no-op against a live server."""
+
+    def reply(text: str) -> None:
+        if not LIVE_API_URL:
+            fake_llm.responses = [text]
+            fake_llm.i = 0
+
+    yield reply
+    fake_llm.responses = [DEFAULT_LLM_REPLY]
+
+
+def pytest_collection_modifyitems(config, items):
+    if LIVE_API_URL:
+        # A running server has its own settings, e.g. no trusted proxies
+        skip = pytest.mark.skip(reason="relies on settings the in-process fixture applies")
+        for item in items:
+            if "in_process" in item.keywords:
+                item.add_marker(skip)
+        return
+
+    # mongomock implements no $dateTrunc, which the time-series report relies on
+    if os.getenv("TEST_MONGO_URL"):
+        return
+    skip = pytest.mark.skip(reason="needs MongoDB 5.0+ ($dateTrunc); set TEST_MONGO_URL or TEST_API_URL")
+    for item in items:
+        if "mongod" in item.keywords:
+            item.add_marker(skip)
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "mongod: needs a real MongoDB server rather than mongomock")
+    config.addinivalue_line("markers", "in_process: needs the in-process app and its test settings")
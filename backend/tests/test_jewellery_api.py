@@ -1,39 +1,41 @@
 """Tests for jewellery store management API."""
 
-import os
-import sys
-from datetime import datetime
+import asyncio
+import hashlib
+import json
+import time
+from datetime import datetime, timedelta, timezone
 
+import httpx
 import pytest
-import requests
-from dotenv import load_dotenv
 
-# Load environment variables
-sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
-load_dotenv()
 
-API_BASE = os.getenv("TEST_API_URL", "http://localhost:8001/api")
+async def _call_app(app, path: str) -> httpx.Response:
+    """GET a path from a standalone ASGI app, without the shared api fixture."""
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://testserver") as client:
+        return await client.get(path)
 
 
-def test_server_is_running():
+def test_server_is_running(api):
     """Test that the server is running."""
-    response = requests.get(f"{API_BASE}/", timeout=5)
+    response = api.get("/", timeout=5)
     assert response.status_code == 200, "Server is not running"
 
 
 class TestAuthentication:
     """Test authentication endpoints."""
 
-    def setup_method(self):
+    @pytest.fixture(autouse=True)
+    def setup(self, api):
         """Setup test data."""
         self.test_user = {
             "email": "owner@test.com",
             "password": "test123",
         }
 
-    def test_login_with_valid_credentials(self):
+    def test_login_with_valid_credentials(self, api):
         """Test login with valid credentials."""
-        response = requests.post(f"{API_BASE}/auth/login", json=self.test_user, timeout=5)
+        response = api.post("/auth/login", json=self.test_user, timeout=5)
         assert response.status_code == 200, f"Login failed: {response.text}"
 
         data = response.json()
@@ -41,41 +43,200 @@ class TestAuthentication:
         assert "user" in data, "User not in response"
         assert data["user"]["email"] == self.test_user["email"]
 
-    def test_login_with_invalid_credentials(self):
+    def test_login_with_invalid_credentials(self, api):
         """Test login with invalid credentials should fail."""
         invalid_user = {"email": "owner@test.com", "password": "wrongpassword"}
-        response = requests.post(f"{API_BASE}/auth/login", json=invalid_user, timeout=5)
+        response = api.post("/auth/login", json=invalid_user, timeout=5)
         assert response.status_code == 401, "Should return 401 for invalid credentials"
 
-    def test_get_me_without_token(self):
+    def test_get_me_without_token(self, api):
         """Test /auth/me without token should fail."""
-        response = requests.get(f"{API_BASE}/auth/me", timeout=5)
+        response = api.get("/auth/me", timeout=5)
         assert response.status_code == 403, "Should return 403 without token"
 
-    def test_get_me_with_valid_token(self):
+    def test_get_me_with_valid_token(self, api):
         """Test /auth/me with valid token."""
         # Login first
-        login_resp = requests.post(f"{API_BASE}/auth/login", json=self.test_user, timeout=5)
+        login_resp = api.post("/auth/login", json=self.test_user, timeout=5)
         assert login_resp.status_code == 200
         token = login_resp.json()["token"]
 
         # Get current user
         headers = {"Authorization": f"Bearer {token}"}
-        response = requests.get(f"{API_BASE}/auth/me", headers=headers, timeout=5)
+        response = api.get("/auth/me", headers=headers, timeout=5)
         assert response.status_code == 200, f"Failed to get user: {response.text}"
 
         data = response.json()
         assert data["email"] == self.test_user["email"]
 
+    @pytest.mark.in_process
+    def test_server_timing_header(self, api):
+        """Test responses report per-stage timings, including authentication."""
+        token = api.post("/auth/login", json=self.test_user, timeout=5).json()["token"]
+        response = api.get(
+            "/auth/me", headers={"Authorization": f"Bearer {token}"}, timeout=5
+        )
+        assert response.status_code == 200
+
+        timing = response.headers.get("Server-Timing", "")
+        assert "auth;dur=" in timing
+        assert "total;dur=" in timing
+
+    def test_route_recorded_with_default_tracing_settings(self):
+        """Test the matched route is known during a request even when nothing is traced."""
+        from fastapi import FastAPI
+
+        from tracing import TracingMiddleware, TracingSettings, current_route
+
+        app = FastAPI()
+        app.state.tracing_settings = TracingSettings()
+        app.state.span_exporter = None
+        app.add_middleware(TracingMiddleware)
+
+        @app.get("/items/{item_id}")
+        async def probe(item_id: str):
+            return {"route": current_route()}
+
+        response = asyncio.run(_call_app(app, "/items/abc"))
+        assert "Server-Timing" not in response.headers
+        assert response.json() == {"route": "GET /items/{item_id}"}
+        assert current_route() is None
+
+    def test_logout_revokes_token(self, api):
+        """Test a logged-out token is rejected while a fresh login still works."""
+        token = api.post("/auth/login", json=self.test_user, timeout=5).json()["token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        response = api.post("/auth/logout", headers=headers, timeout=5)
+        assert response.status_code == 200, f"Logout failed: {response.text}"
+        assert response.json()["revoked"] is True
+
+        response = api.get("/auth/me", headers=headers, timeout=5)
+        assert response.status_code == 401, "Revoked token should be rejected"
+
+        fresh = api.post("/auth/login", json=self.test_user, timeout=5).json()["token"]
+        response = api.get("/auth/me", headers={"Authorization": f"Bearer {fresh}"}, timeout=5)
+        assert response.status_code == 200
+
+    def test_login_throttled_after_repeated_failures(self, api):
+        """Test repeated failed logins for one email are rejected with 429 and Retry-After."""
+        attempt = {"email": f"throttle-{datetime.now().timestamp()}@test.com", "password": "wrongpassword"}
+        statuses = [
+            api.post("/auth/login", json=attempt, timeout=5).status_code for _ in range(5)
+        ]
+        assert statuses == [401] * 5
+
+        response = api.post("/auth/login", json=attempt, timeout=5)
+        assert response.status_code == 429
+        assert int(response.headers["Retry-After"]) > 0
+        assert response.json()["detail"]["error"]["code"] == "TOO_MANY_LOGIN_ATTEMPTS"
+
+    @pytest.mark.in_process
+    def test_login_throttled_per_forwarded_ip(self, api):
+        """Test clients behind a trusted proxy are throttled by their forwarded IP."""
+        stamp = datetime.now().timestamp()
+        blocked = {"X-Forwarded-For": f"198.51.100.{int(stamp) % 250 + 1}, 127.0.0.1"}
+        other = {"X-Forwarded-For": f"203.0.113.{int(stamp) % 250 + 1}"}
+
+        def attempt(index, headers):
+            body = {"email": f"ip-throttle-{stamp}-{index}@test.com", "password": "wrongpassword"}
+            return api.post("/auth/login", json=body, headers=headers, timeout=5)
+
+        statuses = [attempt(index, blocked).status_code for index in range(20)]
+        assert statuses == [401] * 20
+
+        assert attempt(20, blocked).status_code == 429
+        assert attempt(21, other).status_code == 401, "Another client behind the proxy must not be throttled"
+
+    def test_refresh_token_rotation(self, api):
+        """Test refresh tokens rotate and a retried refresh gets the same successor."""
+        login = api.post("/auth/login", json=self.test_user, timeout=5).json()
+        assert login["expires_in"] > 0
+
+        response = api.post(
+            "/auth/refresh", json={"refresh_token": login["refresh_token"]}, timeout=5
+        )
+        assert response.status_code == 200, f"Refresh failed: {response.text}"
+        rotated = response.json()
+        assert rotated["refresh_token"] != login["refresh_token"]
+
+        me = api.get(
+            "/auth/me", headers={"Authorization": f"Bearer {rotated['token']}"}, timeout=5
+        )
+        assert me.status_code == 200
+
+        # A second tab or a retry right after rotation is not treated as theft
+        retried = api.post(
+            "/auth/refresh", json={"refresh_token": login["refresh_token"]}, timeout=5
+        )
+        assert retried.status_code == 200, f"Retried refresh failed: {retried.text}"
+        assert retried.json()["refresh_token"] == rotated["refresh_token"]
+
+    @pytest.mark.in_process
+    def test_refresh_token_reuse_revokes_session(self, api):
+        """Test a consumed refresh token replayed after the grace window ends the session."""
+        login = api.post("/auth/login", json=self.test_user, timeout=5).json()
+        rotated = api.post(
+            "/auth/refresh", json={"refresh_token": login["refresh_token"]}, timeout=5
+        ).json()
+
+        settings = api.app.state.refresh_token_settings
+        grace, settings.reuse_grace_seconds = settings.reuse_grace_seconds, 0
+        try:
+            reused = api.post(
+                "/auth/refresh", json={"refresh_token": login["refresh_token"]}, timeout=5
+            )
+        finally:
+            settings.reuse_grace_seconds = grace
+        assert reused.status_code == 401
+        assert reused.json()["detail"]["error"]["code"] == "INVALID_REFRESH_TOKEN"
+
+        revoked = api.post(
+            "/auth/refresh", json={"refresh_token": rotated["refresh_token"]}, timeout=5
+        )
+        assert revoked.status_code == 401
+
+    def test_revoke_user_tokens_unknown_user(self, api):
+        """Test revoking tokens for an unknown user returns 404."""
+        token = api.post("/auth/login", json=self.test_user, timeout=5).json()["token"]
+        response = api.post(
+            "/admin/users/no-such-user/revoke-tokens",
+            headers={"Authorization": f"Bearer {token}"},
+            timeout=5,
+        )
+        assert response.status_code == 404
+
+    def test_revoke_user_tokens_same_second(self, api):
+        """Test revoking a user's tokens covers one issued moments before, but not later logins."""
+        staff_login = {"email": "staff@test.com", "password": "test123"}
+        staff_token = api.post("/auth/login", json=staff_login, timeout=5).json()["token"]
+        staff_headers = {"Authorization": f"Bearer {staff_token}"}
+        staff_id = api.get("/auth/me", headers=staff_headers, timeout=5).json()["id"]
+
+        owner_token = api.post("/auth/login", json=self.test_user, timeout=5).json()["token"]
+        response = api.post(
+            f"/admin/users/{staff_id}/revoke-tokens",
+            headers={"Authorization": f"Bearer {owner_token}"},
+            timeout=5,
+        )
+        assert response.status_code == 200, f"Failed to revoke: {response.text}"
+
+        assert api.get("/auth/me", headers=staff_headers, timeout=5).status_code == 401
+
+        fresh = api.post("/auth/login", json=staff_login, timeout=5).json()["token"]
+        response = api.get("/auth/me", headers={"Authorization": f"Bearer {fresh}"}, timeout=5)
+        assert response.status_code == 200
+
 
 class TestInventory:
     """Test inventory management endpoints."""
 
-    def setup_method(self):
+    @pytest.fixture(autouse=True)
+    def setup(self, api):
         """Setup test data."""
         # Login to get token
-        login_resp = requests.post(
-            f"{API_BASE}/auth/login",
+        login_resp = api.post(
+            "/auth/login",
             json={"email": "staff@test.com", "password": "test123"},
             timeout=5,
         )
@@ -83,9 +244,9 @@ class TestInventory:
         self.token = login_resp.json()["token"]
         self.headers = {"Authorization": f"Bearer {self.token}"}
 
-    def test_get_items_public(self):
+    def test_get_items_public(self, api):
         """Test public catalog access without authentication."""
-        response = requests.get(f"{API_BASE}/inventory/items", timeout=5)
+        response = api.get("/inventory/items", timeout=5)
         assert response.status_code == 200, f"Failed to get items: {response.text}"
 
         data = response.json()
@@ -94,17 +255,90 @@ class TestInventory:
         assert "total" in data
         assert "has_more" in data
 
-    def test_get_items_authenticated(self):
+    def test_get_items_card_view(self, api):
+        """Test compact card view only returns grid fields."""
+        response = api.get(
+            "/inventory/items",
+            params={"view": "card"},
+            headers=self.headers,
+            timeout=5,
+        )
+        assert response.status_code == 200, f"Failed to get items: {response.text}"
+
+        for item in response.json()["items"]:
+            assert set(item) == {"id", "item_code", "name", "price", "images"}
+            assert len(item["images"]) <= 1
+
+    def test_get_items_sparse_fields(self, api):
+        """Test sparse fieldsets and rejection of unknown fields."""
+        response = api.get(
+            "/inventory/items",
+            params={"fields": "name,price"},
+            headers=self.headers,
+            timeout=5,
+        )
+        assert response.status_code == 200, f"Failed to get items: {response.text}"
+        for item in response.json()["items"]:
+            assert set(item) == {"id", "name", "price"}
+
+        bad = api.get(
+            "/inventory/items",
+            params={"fields": "name,password_hash"},
+            timeout=5,
+        )
+        assert bad.status_code == 400, "Unknown fields should be rejected"
+
+        combined = api.get(
+            "/inventory/items",
+            params={"fields": "name", "view": "card"},
+            timeout=5,
+        )
+        assert combined.status_code == 400, "fields and view=card should not be combined"
+        assert combined.json()["detail"]["error"]["code"] == "INVALID_FIELDS"
+
+    def test_get_items_compressed(self, api):
+        """Test large listings are gzip-compressed and small responses are not."""
+        new_item = {
+            "item_code": f"GZ-{datetime.now().timestamp()}",
+            "name": "Compression Test Necklace",
+            "description": "Long description for compression testing. " * 40,
+            "category": "necklace",
+            "price": 30000,
+            "weight": 8.0,
+            "material": "gold",
+        }
+        create_resp = api.post(
+            "/inventory/items",
+            json=new_item,
+            headers=self.headers,
+            timeout=5,
+        )
+        assert create_resp.status_code == 201
+
+        response = api.get(
+            "/inventory/items",
+            params={"limit": 100},
+            headers={**self.headers, "Accept-Encoding": "gzip"},
+            timeout=5,
+        )
+        assert response.status_code == 200
+        assert response.headers.get("content-encoding") == "gzip"
+        assert "items" in response.json()
+
+        small = api.get("/", headers={"Accept-Encoding": "gzip"}, timeout=5)
+        assert "content-encoding" not in small.headers
+
+    def test_get_items_authenticated(self, api):
         """Test inventory access with authentication."""
-        response = requests.get(
-            f"{API_BASE}/inventory/items", headers=self.headers, timeout=5
+        response = api.get(
+            "/inventory/items", headers=self.headers, timeout=5
         )
         assert response.status_code == 200, f"Failed to get items: {response.text}"
 
         data = response.json()
         assert isinstance(data["items"], list)
 
-    def test_create_item_success(self):
+    def test_create_item_success(self, api):
         """Test creating a jewellery item."""
         item_code = f"TEST-{datetime.now().timestamp()}"
         new_item = {
@@ -118,8 +352,8 @@ class TestInventory:
             "images": [],
         }
 
-        response = requests.post(
-            f"{API_BASE}/inventory/items",
+        response = api.post(
+            "/inventory/items",
             json=new_item,
             headers=self.headers,
             timeout=5,
@@ -131,7 +365,7 @@ class TestInventory:
         assert data["name"] == new_item["name"]
         assert data["status"] == "available"
 
-    def test_create_item_duplicate_code(self):
+    def test_create_item_duplicate_code(self, api):
         """Test creating item with duplicate code should fail."""
         item_code = f"DUP-{datetime.now().timestamp()}"
         new_item = {
@@ -145,8 +379,8 @@ class TestInventory:
         }
 
         # Create first item
-        response1 = requests.post(
-            f"{API_BASE}/inventory/items",
+        response1 = api.post(
+            "/inventory/items",
             json=new_item,
             headers=self.headers,
             timeout=5,
@@ -154,15 +388,15 @@ class TestInventory:
         assert response1.status_code == 201
 
         # Try to create duplicate
-        response2 = requests.post(
-            f"{API_BASE}/inventory/items",
+        response2 = api.post(
+            "/inventory/items",
             json=new_item,
             headers=self.headers,
             timeout=5,
         )
         assert response2.status_code == 400, "Should fail with duplicate item_code"
 
-    def test_create_item_without_auth(self):
+    def test_create_item_without_auth(self, api):
         """Test creating item without authentication should fail."""
         new_item = {
             "item_code": "NOAUTH",
@@ -174,10 +408,10 @@ class TestInventory:
             "material": "silver",
         }
 
-        response = requests.post(f"{API_BASE}/inventory/items", json=new_item, timeout=5)
+        response = api.post("/inventory/items", json=new_item, timeout=5)
         assert response.status_code in [401, 403], "Should require authentication"
 
-    def test_update_item(self):
+    def test_update_item(self, api):
         """Test updating an item."""
         # First create an item
         item_code = f"UPD-{datetime.now().timestamp()}"
@@ -191,8 +425,8 @@ class TestInventory:
             "material": "silver",
         }
 
-        create_resp = requests.post(
-            f"{API_BASE}/inventory/items",
+        create_resp = api.post(
+            "/inventory/items",
             json=new_item,
             headers=self.headers,
             timeout=5,
@@ -202,8 +436,8 @@ class TestInventory:
 
         # Update the item
         update_data = {"name": "Updated Name", "price": 15000}
-        update_resp = requests.patch(
-            f"{API_BASE}/inventory/items/{item_id}",
+        update_resp = api.patch(
+            f"/inventory/items/{item_id}",
             json=update_data,
             headers=self.headers,
             timeout=5,
@@ -214,15 +448,146 @@ class TestInventory:
         assert data["name"] == "Updated Name"
         assert data["price"] == 15000
 
+    def test_update_item_version_conflict(self, api):
+        """Test updating an item with a stale version should return 409."""
+        item_code = f"VER-{datetime.now().timestamp()}"
+        new_item = {
+            "item_code": item_code,
+            "name": "Versioned Item",
+            "description": "Item for concurrency testing",
+            "category": "ring",
+            "price": 10000,
+            "weight": 2.0,
+            "material": "silver",
+        }
+        create_resp = api.post(
+            "/inventory/items",
+            json=new_item,
+            headers=self.headers,
+            timeout=5,
+        )
+        assert create_resp.status_code == 201
+        item_id = create_resp.json()["id"]
+        assert create_resp.json()["version"] == 1
+
+        first = api.patch(
+            f"/inventory/items/{item_id}",
+            json={"price": 11000, "version": 1},
+            headers=self.headers,
+            timeout=5,
+        )
+        assert first.status_code == 200, f"Failed to update: {first.text}"
+        assert first.json()["version"] == 2
+
+        stale = api.patch(
+            f"/inventory/items/{item_id}",
+            json={"price": 12000, "version": 1},
+            headers=self.headers,
+            timeout=5,
+        )
+        assert stale.status_code == 409, "Stale version should conflict"
+
+    def test_update_item_code_uniqueness(self, api):
+        """Test resending an item's own code succeeds but taking another item's code is rejected."""
+        item_ids = []
+        for suffix in ("A", "B"):
+            create_resp = api.post(
+                "/inventory/items",
+                json={
+                    "item_code": f"UNQ{suffix}{int(datetime.now().timestamp() * 1000000)}",
+                    "name": "Unique Code Item",
+                    "description": "Item for item_code uniqueness testing",
+                    "category": "ring",
+                    "price": 10000,
+                    "weight": 2.0,
+                    "material": "silver",
+                },
+                headers=self.headers,
+                timeout=5,
+            )
+            assert create_resp.status_code == 201
+            item_ids.append((create_resp.json()["id"], create_resp.json()["item_code"]))
+        (first_id, first_code), (_, second_code) = item_ids
+
+        same = api.patch(
+            f"/inventory/items/{first_id}",
+            json={"item_code": first_code, "price": 11000},
+            headers=self.headers,
+            timeout=5,
+        )
+        assert same.status_code == 200, f"Failed to update: {same.text}"
+        assert same.json()["price"] == 11000
+
+        taken = api.patch(
+            f"/inventory/items/{first_id}",
+            json={"item_code": second_code},
+            headers=self.headers,
+            timeout=5,
+        )
+        assert taken.status_code == 400
+        assert taken.json()["detail"]["error"]["code"] == "ITEM_CODE_EXISTS"
+
+    def test_update_missing_item(self, api):
+        """Test updating a non-existent item should return 404."""
+        response = api.patch(
+            "/inventory/items/missing-item-id",
+            json={"price": 12000},
+            headers=self.headers,
+            timeout=5,
+        )
+        assert response.status_code == 404
+
+    def test_export_items_csv(self, api):
+        """Test streaming CSV export of inventory."""
+        item_code = f"EXP-{datetime.now().timestamp()}"
+        new_item = {
+            "item_code": item_code,
+            "name": "Export Test Ring",
+            "description": "Item for export testing",
+            "category": "ring",
+            "price": 12000,
+            "weight": 2.5,
+            "material": "gold",
+        }
+        create_resp = api.post(
+            "/inventory/items",
+            json=new_item,
+            headers=self.headers,
+            timeout=5,
+        )
+        assert create_resp.status_code == 201
+
+        response = api.get(
+            "/inventory/items/export",
+            params={"format": "csv", "search": item_code},
+            headers=self.headers,
+            timeout=5,
+        )
+        assert response.status_code == 200, f"Failed to export: {response.text}"
+        assert response.headers["content-type"].startswith("text/csv")
+
+        lines = response.text.strip().splitlines()
+        assert lines[0].startswith("id,item_code,name")
+        assert len(lines) == 2
+        assert item_code in lines[1]
+
+    def test_export_items_requires_auth(self, api):
+        """Test inventory export without authentication should fail."""
+        response = api.get("/inventory/items/export", timeout=5)
+        assert response.status_code in [401, 403], "Should require authentication"
+
 
 class TestOrders:
     """Test order management endpoints."""
 
-    def setup_method(self):
+    @pytest.fixture(autouse=True)
+    def setup(self, api):
         """Setup test data."""
+        self.api = api
+
         # Login as staff
-        login_resp = requests.post(
-            f"{API_BASE}/auth/login",
+        login_resp = api.post(
+            "/auth/login",
             json={"email": "staff@test.com", "password": "test123"},
             timeout=5,
         )
@@ -241,16 +606,17 @@ class TestOrders:
             "weight": 3.0,
             "material": "gold",
         }
-        create_resp = requests.post(
-            f"{API_BASE}/inventory/items",
+        create_resp = api.post(
+            "/inventory/items",
             json=new_item,
             headers=self.headers,
             timeout=5,
         )
         assert create_resp.status_code == 201
         self.test_item_id = create_resp.json()["id"]
+        self.test_item_code = item_code
 
-    def test_create_order_public(self):
+    def test_create_order_public(self, api):
         """Test creating an order without authentication (public endpoint)."""
         order_data = {
             "customer_name": "John Doe",
@@ -259,7 +625,7 @@ class TestOrders:
             "items": [{"item_id": self.test_item_id, "quantity": 1}],
         }
 
-        response = requests.post(f"{API_BASE}/orders", json=order_data, timeout=5)
+        response = api.post("/orders", json=order_data, timeout=5)
         assert response.status_code == 201, f"Failed to create order: {response.text}"
 
         data = response.json()
@@ -268,7 +634,7 @@ class TestOrders:
         assert data["status"] == "pending"
         assert len(data["items"]) == 1
 
-    def test_create_order_with_invalid_item(self):
+    def test_create_order_with_invalid_item(self, api):
         """Test creating order with non-existent item should fail."""
         order_data = {
             "customer_name": "Jane Doe",
@@ -277,17 +643,17 @@ class TestOrders:
             "items": [{"item_id": "invalid-item-id", "quantity": 1}],
         }
 
-        response = requests.post(f"{API_BASE}/orders", json=order_data, timeout=5)
+        response = api.post("/orders", json=order_data, timeout=5)
         assert response.status_code == 404, "Should fail with invalid item"
 
-    def test_get_orders_requires_auth(self):
+    def test_get_orders_requires_auth(self, api):
         """Test getting orders without authentication should fail."""
-        response = requests.get(f"{API_BASE}/orders", timeout=5)
+        response = api.get("/orders", timeout=5)
         assert response.status_code in [401, 403], "Should require authentication"
 
-    def test_get_orders_with_auth(self):
+    def test_get_orders_with_auth(self, api):
         """Test getting orders with authentication."""
-        response = requests.get(f"{API_BASE}/orders", headers=self.headers, timeout=5)
+        response = api.get("/orders", headers=self.headers, timeout=5)
         assert response.status_code == 200, f"Failed to get orders: {response.text}"
 
         data = response.json()
@@ -295,7 +661,7 @@ class TestOrders:
         assert "page" in data
         assert "total" in data
 
-    def test_update_order_status(self):
+    def test_update_order_status(self, api):
         """Test updating order status."""
         # First create an order
         order_data = {
@@ -305,14 +671,14 @@ class TestOrders:
             "items": [{"item_id": self.test_item_id, "quantity": 1}],
         }
 
-        create_resp = requests.post(f"{API_BASE}/orders", json=order_data, timeout=5)
+        create_resp = api.post("/orders", json=order_data, timeout=5)
         assert create_resp.status_code == 201
         order_id = create_resp.json()["id"]
 
         # Update status
         update_data = {"status": "confirmed"}
-        update_resp = requests.patch(
-            f"{API_BASE}/orders/{order_id}/status",
+        update_resp = api.patch(
+            f"/orders/{order_id}/status",
             json=update_data,
             headers=self.headers,
             timeout=5,
@@ -322,15 +688,364 @@ class TestOrders:
         data = update_resp.json()
         assert data["status"] == "confirmed"
 
+    def _item_status(self):
+        response = self.api.get(
+            "/inventory/items",
+            params={"fields": "status", "limit": 100, "search": self.test_item_code},
+            headers=self.headers,
+            timeout=5,
+        )
+        assert response.status_code == 200
+        return response.json()["items"][0]["status"]
+
+    def _place_order(self):
+        order_data = {
+            "customer_name": "Lifecycle Test",
+            "customer_phone": "+1234567890",
+            "customer_address": "1 Lifecycle Road, Test City, 12345",
+            "items": [{"item_id": self.test_item_id, "quantity": 1}],
+        }
+        response = self.api.post("/orders", json=order_data, timeout=5)
+        assert response.status_code == 201, f"Failed to create order: {response.text}"
+        return response.json()["id"]
+
+    def _set_status(self, order_id, status):
+        return self.api.patch(
+            f"/orders/{order_id}/status",
+            json={"status": status},
+            headers=self.headers,
+            timeout=5,
+        )
+
+    def test_order_reserves_item(self, api):
+        """Test placing an order reserves the item so it cannot be ordered twice."""
+        self._place_order()
+        assert self._item_status() == "reserved"
+
+        order_data = {
+            "customer_name": "Second Buyer",
+            "customer_phone": "+1234567891",
+            "customer_address": "2 Lifecycle Road, Test City, 12345",
+            "items": [{"item_id": self.test_item_id, "quantity": 1}],
+        }
+        response = api.post("/orders", json=order_data, timeout=5)
+        assert response.status_code == 400, "Reserved item should be unavailable"
+
+    def test_create_order_rejects_duplicate_items(self, api):
+        """Test an order listing the same piece twice is rejected without reserving it."""
+        order_data = {
+            "customer_name": "Duplicate Test",
+            "customer_phone": "+1234567890",
+            "customer_address": "3 Lifecycle Road, Test City, 12345",
+            "items": [{"item_id": self.test_item_id, "quantity": 1}] * 2,
+        }
+        response = api.post("/orders", json=order_data, timeout=5)
+        assert response.status_code == 400
+        assert response.json()["detail"]["error"]["code"] == "DUPLICATE_ITEM"
+        assert self._item_status() == "available"
+
+    @pytest.mark.in_process
+    def test_sweeper_releases_orphaned_reservations(self, api):
+        """Test a piece reserved for an order that was never written is released."""
+        stale = datetime.now(timezone.utc) - timedelta(hours=1)
+        api.run(
+            api.app.state.db.jewellery_items.update_one(
+                {"_id": self.test_item_id},
+                {"$set": {"status": "reserved", "reserved_order_id": "never-written", "updated_at": stale}},
+            )
+        )
+        owner_token = api.post(
+            "/auth/login", json={"email": "owner@test.com", "password": "test123"}, timeout=5
+        ).json()["token"]
+
+        run = api.post(
+            "/admin/reservation-sweeper/run",
+            headers={"Authorization": f"Bearer {owner_token}"},
+            timeout=5,
+        )
+        assert run.status_code == 200, f"Failed to run sweep: {run.text}"
+        assert self._item_status() == "available"
+
+    def test_order_delivery_marks_item_sold(self, api):
+        """Test pending -> confirmed -> delivered marks the item sold, idempotently."""
+        order_id = self._place_order()
+
+        assert self._set_status(order_id, "confirmed").status_code == 200
+        delivered = self._set_status(order_id, "delivered")
+        assert delivered.status_code == 200, f"Failed to deliver: {delivered.text}"
+        assert delivered.json()["delivery_date"] is not None
+        assert self._item_status() == "sold"
+
+        retry = self._set_status(order_id, "delivered")
+        assert retry.status_code == 200, "Retrying a transition should be idempotent"
+        assert self._item_status() == "sold"
+
+    def test_delivered_order_counts_in_top_sellers(self, api):
+        """Test delivering an order adds its items to the top-sellers leaderboard once."""
+        order_id = self._place_order()
+        assert self._set_status(order_id, "confirmed").status_code == 200
+        assert self._set_status(order_id, "delivered").status_code == 200
+        assert self._set_status(order_id, "delivered").status_code == 200
+
+        manager_login = api.post(
+            "/auth/login",
+            json={"email": "manager@test.com", "password": "test123"},
+            timeout=5,
+        )
+        manager_headers = {"Authorization": f"Bearer {manager_login.json()['token']}"}
+
+        response = api.get(
+            "/reports/top-sellers",
+            params={"category": "ring", "limit": 100},
+            headers=manager_headers,
+            timeout=5,
+        )
+        assert response.status_code == 200, f"Failed to get top sellers: {response.text}"
+
+        data = response.json()
+        assert data["category"] == "ring"
+        sold = {item["item_code"]: item["quantity"] for item in data["items"]}
+        assert sold.get(self.test_item_code) == 1
+
+    @pytest.mark.in_process
+    def test_interrupted_leaderboard_recording_repaired_once(self, api):
+        """Test an order whose recording was interrupted is counted by the repair, but only once."""
+        from leaderboard import LEADERBOARD_COLLECTION, record_unrecorded_orders
+
+        db = api.app.state.db
+        order_id = self._place_order()
+        assert self._set_status(order_id, "confirmed").status_code == 200
+        assert self._set_status(order_id, "delivered").status_code == 200
+
+        # As if the worker died after writing the rows but before flagging the order
+        api.run(db.orders.update_one({"_id": order_id}, {"$unset": {"leaderboard_recorded": ""}}))
+        assert api.run(record_unrecorded_orders(db)) >= 1
+
+        rows = api.run(db[LEADERBOARD_COLLECTION].find({"item_code": self.test_item_code}).to_list(length=10))
+        assert sum(row["quantity"] for row in rows) == 1
+        assert api.run(db.orders.find_one({"_id": order_id}))["leaderboard_recorded"] is True
+
+    @pytest.mark.in_process
+    def test_leaderboard_repair_runs_on_one_worker(self, api):
+        """Test workers starting together run the startup leaderboard repair once between them."""
+        from leaderboard import LEADERBOARD_COLLECTION, REPAIRS_COLLECTION, repair_leaderboard
+
+        db = api.app.state.db
+        order_id = self._place_order()
+        assert self._set_status(order_id, "confirmed").status_code == 200
+        assert self._set_status(order_id, "delivered").status_code == 200
+        api.run(db.orders.update_one({"_id": order_id}, {"$unset": {"leaderboard_recorded": ""}}))
+        api.run(db[REPAIRS_COLLECTION].delete_many({}))
+
+        async def start_workers():
+            return await asyncio.gather(repair_leaderboard(db), repair_leaderboard(db))
+
+        recorded = sorted(api.run(start_workers()))
+        assert recorded[0] == 0 and recorded[1] >= 1
+
+        # A worker restarting soon after finds the repair already done
+        api.run(db.orders.update_one({"_id": order_id}, {"$unset": {"leaderboard_recorded": ""}}))
+        assert api.run(repair_leaderboard(db)) == 0
+
+        rows = api.run(db[LEADERBOARD_COLLECTION].find({"item_code": self.test_item_code}).to_list(length=10))
+        assert sum(row["quantity"] for row in rows) == 1
+
+    def test_order_cancellation_releases_item(self, api):
+        """Test cancelling a pending order releases the item."""
+        order_id = self._place_order()
+
+        cancelled = self._set_status(order_id, "cancelled")
+        assert cancelled.status_code == 200, f"Failed to cancel: {cancelled.text}"
+        assert self._item_status() == "available"
+
+    def test_invalid_status_transition(self, api):
+        """Test skipping or reversing states is rejected."""
+        order_id = self._place_order()
+
+        response = self._set_status(order_id, "delivered")
+        assert response.status_code == 400, "pending -> delivered should be rejected"
+
+        assert self._set_status(order_id, "cancelled").status_code == 200
+        response = self._set_status(order_id, "confirmed")
+        assert response.status_code == 400, "cancelled is terminal"
+
+    def test_create_order_idempotency_key(self, api):
+        """Test retried order creation with an Idempotency-Key replays the first order."""
+        key = f"order-{datetime.now().timestamp()}"
+        order_data = {
+            "customer_name": "Retry Test",
+            "customer_phone": "+1234567890",
+            "customer_address": "5 Retry Street, Test City, 12345",
+            "items": [{"item_id": self.test_item_id, "quantity": 1}],
+        }
+        headers = {"Idempotency-Key": key}
+
+        first = api.post("/orders", json=order_data, headers=headers, timeout=5)
+        assert first.status_code == 201, f"Failed to create order: {first.text}"
+
+        retry = api.post("/orders", json=order_data, headers=headers, timeout=5)
+        assert retry.status_code == 201, "Replay should return the stored response"
+        assert retry.json()["id"] == first.json()["id"]
+        assert retry.headers.get("idempotent-replayed") == "true"
+
+        changed = {**order_data, "customer_name": "Someone Else"}
+        reused = api.post("/orders", json=changed, headers=headers, timeout=5)
+        assert reused.status_code == 422, "Reusing a key with a different body should fail"
+
+    @pytest.mark.in_process
+    def test_idempotency_key_stale_claim_taken_over(self, api):
+        """Test a retry takes over a key whose first attempt died mid-request."""
+        key = f"stale-{datetime.now().timestamp()}"
+        caller = hashlib.sha256(b"").hexdigest()
+        record_id = hashlib.sha256(f"POST|/api/orders|{caller}|{key}".encode()).hexdigest()
+        api.run(
+            api.app.state.db.idempotency_keys.insert_one(
+                {
+                    "_id": record_id,
+                    "state": "in_progress",
+                    "claim_id": "dead-worker",
+                    "claimed_until": datetime.now(timezone.utc) - timedelta(seconds=1),
+                    "request_hash": "unknown",
+                    "created_at": datetime.now(timezone.utc) - timedelta(minutes=5),
+                }
+            )
+        )
+        order_data = {
+            "customer_name": "Stale Claim Test",
+            "customer_phone": "+1234567890",
+            "customer_address": "6 Retry Street, Test City, 12345",
+            "items": [{"item_id": self.test_item_id, "quantity": 1}],
+        }
+
+        first = api.post("/orders", json=order_data, headers={"Idempotency-Key": key}, timeout=5)
+        assert first.status_code == 201, f"Stale claim should be taken over: {first.text}"
+
+        retry = api.post("/orders", json=order_data, headers={"Idempotency-Key": key}, timeout=5)
+        assert retry.json()["id"] == first.json()["id"]
+        assert retry.headers["content-type"] == first.headers["content-type"]
+
+    def test_customer_history_by_phone(self, api):
+        """Test customer history matches differently formatted phone numbers."""
+        phone_digits = str(int(datetime.now().timestamp() * 1000))[-9:]
+        order_data = {
+            "customer_name": "History Test",
+            "customer_phone": f"+91 {phone_digits[:4]}-{phone_digits[4:]}",
+            "customer_address": "7 History Lane, Test City, 12345",
+            "items": [{"item_id": self.test_item_id, "quantity": 1}],
+        }
+        create_resp = api.post("/orders", json=order_data, timeout=5)
+        assert create_resp.status_code == 201
+
+        response = api.get(
+            "/orders/customer-history",
+            params={"phone": f"91{phone_digits}"},
+            headers=self.headers,
+            timeout=5,
+        )
+        assert response.status_code == 200, f"Failed to get history: {response.text}"
+
+        data = response.json()
+        assert [order["id"] for order in data["orders"]] == [create_resp.json()["id"]]
+        assert data["customers"][0]["order_count"] == 1
+        assert data["customers"][0]["lifetime_spend"] == 0  # not delivered yet
+
+        prefix = api.get(
+            "/orders/customer-history",
+            params={"phone": f"+91 {phone_digits[:6]}", "prefix": "true"},
+            headers=self.headers,
+            timeout=5,
+        )
+        assert prefix.status_code == 200
+        assert create_resp.json()["id"] in [order["id"] for order in prefix.json()["orders"]]
+
+    @pytest.mark.in_process
+    def test_legacy_orders_backfilled_for_phone_lookup(self, api):
+        """Test orders stored before phones were normalised are found once backfilled."""
+        from phone import backfill_normalised_phones
+
+        phone_digits = str(int(datetime.now().timestamp() * 1000))[-9:]
+        order_id = f"legacy-{phone_digits}"
+        api.run(
+            api.app.state.db.orders.insert_one(
+                {
+                    "_id": order_id,
+                    "customer_name": "Legacy Customer",
+                    "customer_phone": f"+44 {phone_digits}",
+                    "customer_address": "8 Legacy Lane, Test City, 12345",
+                    "items": [],
+                    "total_amount": 0,
+                    "status": "pending",
+                    "payment_method": "COD",
+                    "order_date": datetime.now(timezone.utc),
+                    "version": 1,
+                }
+            )
+        )
+        assert api.run(backfill_normalised_phones(api.app.state.db)) >= 1
+
+        response = api.get(
+            "/orders", params={"customer_phone": f"44{phone_digits}"}, headers=self.headers, timeout=5
+        )
+        assert response.status_code == 200
+        assert [order["id"] for order in response.json()["orders"]] == [order_id]
+
+    def test_export_orders_jsonl(self, api):
+        """Test streaming JSONL export of orders filtered by date range."""
+        order_data = {
+            "customer_name": "Export Test",
+            "customer_phone": "+1999000111",
+            "customer_address": "12 Export Lane, Test City, 12345",
+            "items": [{"item_id": self.test_item_id, "quantity": 1}],
+        }
+        create_resp = api.post("/orders", json=order_data, timeout=5)
+        assert create_resp.status_code == 201
+        order_id = create_resp.json()["id"]
+
+        response = api.get(
+            "/orders/export",
+            params={
+                "format": "jsonl",
+                "customer_phone": "+1999000111",
+                "start_date": "2020-01-01T00:00:00Z",
+            },
+            headers=self.headers,
+            timeout=5,
+        )
+        assert response.status_code == 200, f"Failed to export: {response.text}"
+
+        rows = [json.loads(line) for line in response.text.splitlines() if line]
+        assert order_id in [row["id"] for row in rows]
+        assert all(row["customer_phone"] == "+1999000111" for row in rows)
+
+    def test_export_orders_date_range_validation(self, api):
+        """Test export bounds with and without an offset compare, and a reversed range is rejected."""
+        mixed = api.get(
+            "/orders/export",
+            params={"start_date": "2020-01-01", "end_date": "2099-01-01T00:00:00Z"},
+            headers=self.headers,
+            timeout=5,
+        )
+        assert mixed.status_code == 200, f"Mixed offsets should be accepted: {mixed.text}"
+
+        reversed_range = api.get(
+            "/orders/export",
+            params={"start_date": "2021-01-01T00:00:00Z", "end_date": "2020-01-01"},
+            headers=self.headers,
+            timeout=5,
+        )
+        assert reversed_range.status_code == 400
+        assert reversed_range.json()["detail"]["error"]["code"] == "INVALID_DATE_RANGE"
+
 
 class TestReports:
     """Test reporting endpoints."""
 
-    def setup_method(self):
+    @pytest.fixture(autouse=True)
+    def setup(self, api):
         """Setup test data."""
         # Login as manager
-        login_resp = requests.post(
-            f"{API_BASE}/auth/login",
+        login_resp = api.post(
+            "/auth/login",
             json={"email": "manager@test.com", "password": "test123"},
             timeout=5,
         )
@@ -338,26 +1053,26 @@ class TestReports:
         self.token = login_resp.json()["token"]
         self.headers = {"Authorization": f"Bearer {self.token}"}
 
-    def test_inventory_report_requires_manager(self):
+    def test_inventory_report_requires_manager(self, api):
         """Test inventory report requires manager+ role."""
         # Try with staff credentials
-        staff_login = requests.post(
-            f"{API_BASE}/auth/login",
+        staff_login = api.post(
+            "/auth/login",
             json={"email": "staff@test.com", "password": "test123"},
             timeout=5,
         )
         staff_token = staff_login.json()["token"]
         staff_headers = {"Authorization": f"Bearer {staff_token}"}
 
-        response = requests.get(
-            f"{API_BASE}/reports/inventory", headers=staff_headers, timeout=5
+        response = api.get(
+            "/reports/inventory", headers=staff_headers, timeout=5
         )
         assert response.status_code == 403, "Staff should not access reports"
 
-    def test_inventory_report_with_manager(self):
+    def test_inventory_report_with_manager(self, api):
         """Test inventory report with manager credentials."""
-        response = requests.get(
-            f"{API_BASE}/reports/inventory", headers=self.headers, timeout=5
+        response = api.get(
+            "/reports/inventory", headers=self.headers, timeout=5
         )
         assert response.status_code == 200, f"Failed to get report: {response.text}"
 
@@ -370,10 +1085,10 @@ class TestReports:
         assert "by_category" in data
         assert "by_material" in data
 
-    def test_sales_report_with_manager(self):
+    def test_sales_report_with_manager(self, api):
         """Test sales report with manager credentials."""
-        response = requests.get(
-            f"{API_BASE}/reports/sales", headers=self.headers, timeout=5
+        response = api.get(
+            "/reports/sales", headers=self.headers, timeout=5
         )
         assert response.status_code == 200, f"Failed to get report: {response.text}"
 
@@ -385,6 +1100,311 @@ class TestReports:
         assert "date_range" in data
         assert "top_selling_items" in data
 
+    @pytest.mark.mongod
+    def test_sales_timeseries_weekly(self, api):
+        """Test weekly sales buckets are dense, ordered and Monday-aligned in the given time zone."""
+        response = api.get(
+            "/reports/sales/timeseries",
+            params={"interval": "week", "tz": "Asia/Kolkata"},
+            headers=self.headers,
+            timeout=5,
+        )
+        assert response.status_code == 200, f"Failed to get time series: {response.text}"
+
+        data = response.json()
+        assert data["interval"] == "week"
+        assert data["timezone"] == "Asia/Kolkata"
+        assert data["truncated"] is False
+        starts = [bucket["bucket_start"] for bucket in data["buckets"]]
+        assert len(starts) >= 12
+        assert starts == sorted(starts)
+        # Monday 00:00 in India is Sunday 18:30 UTC
+        assert all("T18:30:00" in start for start in starts)
+
+    @pytest.mark.mongod
+    def test_sales_timeseries_row_cap(self, api):
+        """Test the time series is cut at the bucket limit and flagged as truncated."""
+        response = api.get(
+            "/reports/sales/timeseries",
+            params={"interval": "day", "limit": 5},
+            headers=self.headers,
+            timeout=5,
+        )
+        assert response.status_code == 200, f"Failed to get time series: {response.text}"
+
+        data = response.json()
+        assert len(data["buckets"]) == 5
+        assert data["truncated"] is True
+
+    def test_report_job_cached_snapshot(self, api):
+        """Test report jobs coalesce on parameters and serve the finished snapshot from cache."""
+        job_request = {"report": "inventory", "category": f"job-{datetime.now().timestamp()}"}
+        first = api.post("/reports/jobs", json=job_request, headers=self.headers, timeout=5)
+        assert first.status_code in (200, 202), f"Failed to submit job: {first.text}"
+        job_id = first.json()["id"]
+
+        second = api.post("/reports/jobs", json=job_request, headers=self.headers, timeout=5)
+        assert second.json()["id"] == job_id, "Same parameters should share one job"
+
+        for _ in range(50):
+            job = api.get(f"/reports/jobs/{job_id}", headers=self.headers, timeout=5).json()
+            if job["status"] != "running":
+                break
+            time.sleep(0.1)
+        assert job["status"] == "completed", f"Job did not complete: {job}"
+        assert job["result"]["total_items"] == 0
+
+        cached = api.post("/reports/jobs", json=job_request, headers=self.headers, timeout=5)
+        assert cached.status_code == 200
+        assert cached.json()["completed_at"] == job["completed_at"]
+
+        missing = api.get("/reports/jobs/unknown", headers=self.headers, timeout=5)
+        assert missing.status_code == 404
+
+    def test_report_date_parameters_validated(self, api):
+        """Test malformed report dates are rejected with 400 and dates without an offset are accepted."""
+        for path in ("/reports/top-sellers", "/reports/sales/timeseries", "/reports/sales"):
+            response = api.get(path, params={"start_date": "bad"}, headers=self.headers, timeout=5)
+            assert response.status_code == 400, f"{path}: {response.text}"
+            assert response.json()["detail"]["error"]["code"] == "INVALID_DATE"
+
+        job = api.post(
+            "/reports/jobs", json={"report": "sales", "end_date": "not-a-date"}, headers=self.headers, timeout=5
+        )
+        assert job.status_code == 400
+        assert job.json()["detail"]["error"]["code"] == "INVALID_DATE"
+
+        # No offset, against the aware default end
+        start = (datetime.now(timezone.utc) - timedelta(days=7)).replace(tzinfo=None).isoformat()
+        response = api.get("/reports/top-sellers", params={"start_date": start}, headers=self.headers, timeout=5)
+        assert response.status_code == 200, f"Failed to get top sellers: {response.text}"
+        assert response.json()["date_range"]["start"].endswith("+00:00")
+
+        job = api.post("/reports/jobs", json={"report": "sales", "start_date": start}, headers=self.headers, timeout=5)
+        assert job.status_code in (200, 202), f"Failed to submit job: {job.text}"
+
+    def test_sales_timeseries_invalid_timezone(self, api):
+        """Test an unknown time zone is rejected."""
+        response = api.get(
+            "/reports/sales/timeseries",
+            params={"tz": "Mars/Olympus"},
+            headers=self.headers,
+            timeout=5,
+        )
+        assert response.status_code == 400
+        assert response.json()["detail"]["error"]["code"] == "INVALID_TIMEZONE"
+
+
+class TestAdmin:
+    """Test operational endpoints."""
+
+    def test_db_pool_stats_requires_owner(self, api):
+        """Test pool metrics are owner-only and report checkout waits."""
+        staff_login = api.post(
+            "/auth/login",
+            json={"email": "staff@test.com", "password": "test123"},
+            timeout=5,
+        )
+        staff_headers = {"Authorization": f"Bearer {staff_login.json()['token']}"}
+        response = api.get("/admin/db-pool", headers=staff_headers, timeout=5)
+        assert response.status_code == 403, "Staff should not access pool metrics"
+
+        owner_login = api.post(
+            "/auth/login",
+            json={"email": "owner@test.com", "password": "test123"},
+            timeout=5,
+        )
+        owner_headers = {"Authorization": f"Bearer {owner_login.json()['token']}"}
+        response = api.get("/admin/db-pool", headers=owner_headers, timeout=5)
+        assert response.status_code == 200, f"Failed to get pool stats: {response.text}"
+
+        data = response.json()
+        assert "wait_avg_ms" in data["pool"]
+        assert data["settings"]["analytics_read_preference"] == "secondaryPreferred"
+
+    def test_slow_queries_requires_owner(self, api):
+        """Test the slow query log is owner-only and reports its thresholds."""
+        staff_login = api.post(
+            "/auth/login",
+            json={"email": "staff@test.com", "password": "test123"},
+            timeout=5,
+        )
+        staff_headers = {"Authorization": f"Bearer {staff_login.json()['token']}"}
+        response = api.get("/admin/slow-queries", headers=staff_headers, timeout=5)
+        assert response.status_code == 403, "Staff should not access the slow query log"
+
+        owner_login = api.post(
+            "/auth/login",
+            json={"email": "owner@test.com", "password": "test123"},
+            timeout=5,
+        )
+        owner_headers = {"Authorization": f"Bearer {owner_login.json()['token']}"}
+        response = api.get("/admin/slow-queries", headers=owner_headers, timeout=5)
+        assert response.status_code == 200, f"Failed to get slow queries: {response.text}"
+
+        data = response.json()
+        assert isinstance(data["queries"], list)
+        assert data["settings"]["threshold_ms"] > 0
+
+    def test_slow_query_attributed_to_route_with_default_tracing_settings(self):
+        """Test a slow query carries its route when nothing is traced or timed."""
+        from types import SimpleNamespace
+
+        from fastapi import FastAPI
+
+        from slow_queries import SlowQueryRecorder, SlowQuerySettings
+        from tracing import TracingMiddleware, TracingSettings
+
+        recorder = SlowQueryRecorder(SlowQuerySettings(threshold_ms=10, explain=False))
+        command = {"find": "jewellery_items", "filter": {"category": "ring"}}
+
+        def run_command():
+            # Listener callbacks run on the driver's thread, as under Motor
+            event = SimpleNamespace(command_name="find", command=command, request_id=1, connection_id=("db", 27017))
+            recorder.started(event)
+            recorder.succeeded(SimpleNamespace(**vars(event), duration_micros=50_000, database_name="test"))
+
+        app = FastAPI()
+        app.state.tracing_settings = TracingSettings()
+        app.state.span_exporter = None
+        app.add_middleware(TracingMiddleware)
+
+        @app.get("/items/{item_id}")
+        async def probe(item_id: str):
+            await asyncio.to_thread(run_command)
+            return {}
+
+        assert asyncio.run(_call_app(app, "/items/abc")).status_code == 200
+
+        (shape,) = recorder.snapshot()
+        assert shape["collection"] == "jewellery_items"
+        assert shape["routes"] == ["GET /items/{item_id}"]
+
+    @pytest.mark.in_process
+    def test_metrics_endpoint(self, api):
+        """Test Prometheus metrics need the scrape token and are labelled by route template."""
+        api.get("/inventory/items/does-not-exist", timeout=5)
+        scrape_token = api.app.state.metrics_settings.token
+
+        assert api.get(f"{api.server_url}/metrics", timeout=5).status_code == 401
+        response = api.get(
+            f"{api.server_url}/metrics", headers={"Authorization": f"Bearer {scrape_token}"}, timeout=5
+        )
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+
+        body = response.text
+        assert "# TYPE http_request_duration_seconds histogram" in body
+        assert 'route="/api/inventory/items/{item_id}"' in body
+        assert "does-not-exist" not in body
+        assert "mongo_pool_checkouts_total" in body
+        assert 'cache_hit_ratio{cache="tokens"}' in body
+        assert "# TYPE reservation_items_released_total counter" in body
+        assert "reservation_orphans_released_total " in body
+
+    def test_reservation_sweeper(self, api):
+        """Test reservation sweeper metrics and manual run."""
+        owner_login = api.post(
+            "/auth/login",
+            json={"email": "owner@test.com", "password": "test123"},
+            timeout=5,
+        )
+        owner_headers = {"Authorization": f"Bearer {owner_login.json()['token']}"}
+
+        run = api.post(
+            "/admin/reservation-sweeper/run", headers=owner_headers, timeout=5
+        )
+        assert run.status_code == 200, f"Failed to run sweep: {run.text}"
+        assert run.json()["orders_cancelled"] >= 0
+
+        stats = api.get("/admin/reservation-sweeper", headers=owner_headers, timeout=5)
+        assert stats.status_code == 200
+        assert stats.json()["stats"]["runs"] >= 1
+        assert stats.json()["settings"]["ttl_hours"] > 0
+
+    def test_cache_invalidation(self, api):
+        """Test cache invalidation is owner-only and rejects unknown caches."""
+        owner_login = api.post(
+            "/auth/login",
+            json={"email": "owner@test.com", "password": "test123"},
+            timeout=5,
+        )
+        owner_headers = {"Authorization": f"Bearer {owner_login.json()['token']}"}
+
+        response = api.post(
+            "/admin/cache/invalidate",
+            json={"cache": "agents", "key": "chat"},
+            headers=owner_headers,
+            timeout=5,
+        )
+        assert response.status_code == 200, f"Failed to invalidate: {response.text}"
+
+        response = api.post(
+            "/admin/cache/invalidate",
+            json={"cache": "does-not-exist"},
+            headers=owner_headers,
+            timeout=5,
+        )
+        assert response.status_code == 404
+
+    @pytest.mark.mongod
+    def test_mongo_cache_bus_resumes_in_insertion_order(self, api):
+        """Test a reconnecting bus applies messages inserted after the last one seen, whatever their ids."""
+        from bson import ObjectId
+
+        from cache_bus import MongoCacheBus
+
+        cache = {"stale": 1, "kept": 2}
+
+        async def reconnect_after_out_of_order_publish():
+            bus = MongoCacheBus(api.app.state.db, poll_interval=0.05)
+            await bus.start()
+            await bus.stop()
+            bus.register("probe", cache)
+
+            last_seen = ObjectId()
+            await bus.collection.insert_one({"_id": last_seen, "cache": "probe", "key": "other"})
+            # Published afterwards by a process whose ObjectIds sort lower
+            lower_id = ObjectId.from_datetime(datetime(2000, 1, 1, tzinfo=timezone.utc))
+            await bus.collection.insert_one({"_id": lower_id, "cache": "probe", "key": "stale"})
+
+            tail = asyncio.create_task(bus._tail(last_seen))
+            for _ in range(50):
+                if "stale" not in cache:
+                    break
+                await asyncio.sleep(0.05)
+            tail.cancel()
+
+        api.run(reconnect_after_out_of_order_publish())
+        assert cache == {"kept": 2}
+
+    @pytest.mark.in_process
+    def test_token_cache_invalidated_by_key(self, api):
+        """Test one verified token can be dropped from the token cache by its digest."""
+        from auth import token_cache
+        from token_cache import token_digest
+
+        token = api.post(
+            "/auth/login", json={"email": "owner@test.com", "password": "test123"}, timeout=5
+        ).json()["token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        assert api.get("/auth/me", headers=headers, timeout=5).status_code == 200
+
+        digest = token_digest(token)
+        cached = token_cache.get(digest)
+        assert cached is not None
+        cached["role"] = "tampered"
+        assert token_cache.get(digest)["role"] == "owner", "Callers must not modify cached claims"
+
+        response = api.post(
+            "/admin/cache/invalidate",
+            json={"cache": "tokens", "key": digest},
+            headers=headers,
+            timeout=5,
+        )
+        assert response.status_code == 200, f"Failed to invalidate: {response.text}"
+        assert token_cache.get(digest) is None
+
 
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
\ No newline at end of file
@@ -0,0 +1,76 @@
+"""Bounded LRU cache of verified JWT payloads.
+
+The same access token is presented on every request of a session, so once
+its signature has been verified the decoded payload is remembered, keyed by
+the token's hex SHA-256 digest, until the token's ``exp``. Expired entries are
+dropped when they are next looked up; the least recently used entry is
+evicted once the cache is full. Revocation is still checked per request by
+``get_current_user``, after decoding. Payloads are copied in and out, so
+callers may modify the claims they get. The cache bus can drop one token by
+its ``token_digest`` or clear every entry.
+"""
+
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+
+def token_digest(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class VerifiedTokenCache:
+    """digest -> (payload, exp). Safe for a single event loop; not thread-safe."""
+
+    def __init__(self, max_size: int = 4096):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Tuple[dict, float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, digest: str) -> Optional[dict]:
+        entry = self._entries.get(digest)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        payload, expires = entry
+        if expires <= time.time():
+            # Lazy eviction; the caller re-verifies and gets the expiry error
+            del self._entries[digest]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(digest)
+        self.hits += 1
+        return dict(payload)
+
+    def put(self, digest: str, payload: dict) -> None:
+        expires = payload.get("exp")
+        if self.max_size <= 0 or not isinstance(expires, (int, float)):
+            return
+        self._entries[digest] = (dict(payload), float(expires))
+        self._entries.move_to_end(digest)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    # pop/clear let the cache bus invalidate it like the other per-worker caches
+    def pop(self, digest, default=None):
+        return self._entries.pop(digest, default)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
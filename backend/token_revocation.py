@@ -0,0 +1,150 @@
+"""In-memory token revocation list, synced from Mongo.
+
+Two kinds of revocation are supported:
+
+* single tokens, by ``jti``, stored in ``revoked_tokens`` until the token
+  would have expired anyway (TTL index on ``expires_at``)
+* every token of a user issued before a point in time, stored as
+  ``tokens_valid_after`` on the user document
+
+Each worker keeps both in memory and re-reads them every
+``AUTH_REVOCATION_SYNC_SECONDS``, so checking a token costs two dict lookups.
+Revocations made on this worker apply immediately; other workers pick them
+up on their next sync. With ``AUTH_STATELESS`` enabled, authorisation trusts
+the signed role claims and this list is the only revocation check.
+"""
+
+import asyncio
+import logging
+import os
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+from database import env_int
+
+logger = logging.getLogger(__name__)
+
+REVOKED_TOKENS_COLLECTION = "revoked_tokens"
+
+
+def _timestamp(value: datetime) -> float:
+    # Motor returns naive UTC datetimes
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+@dataclass
+class AuthSettings:
+    # Trust signed role claims instead of reading the user on every request
+    stateless: bool = False
+    revocation_sync_seconds: int = 30
+
+    @classmethod
+    def from_env(cls) -> "AuthSettings":
+        return cls(
+            stateless=os.getenv("AUTH_STATELESS", "false").lower() in ("1", "true", "yes"),
+            revocation_sync_seconds=env_int("AUTH_REVOCATION_SYNC_SECONDS", cls.revocation_sync_seconds),
+        )
+
+
+class TokenRevocationList:
+    """Revoked jtis and per-user not-before times, mirrored from Mongo."""
+
+    def __init__(self, db, settings: AuthSettings):
+        self.db = db
+        self.settings = settings
+        # jti -> token expiry (epoch seconds); entries are dropped once expired
+        self._jtis: Dict[str, float] = {}
+        # user id -> tokens issued before this (epoch seconds) are revoked
+        self._not_before: Dict[str, float] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.last_synced_at: Optional[datetime] = None
+
+    def is_revoked(self, payload: dict) -> bool:
+        jti = payload.get("jti")
+        if jti is not None and jti in self._jtis:
+            return True
+        not_before = self._not_before.get(payload.get("sub"))
+        return not_before is not None and payload.get("iat", 0) < not_before
+
+    async def revoke_token(self, payload: dict) -> bool:
+        """Revoke one token until it expires. Returns False for tokens without a jti."""
+        jti = payload.get("jti")
+        if jti is None:
+            return False
+        expires_at = datetime.fromtimestamp(payload["exp"], timezone.utc)
+        await self.db[REVOKED_TOKENS_COLLECTION].update_one(
+            {"_id": jti},
+            {"$set": {"user_id": payload.get("sub"), "expires_at": expires_at}},
+            upsert=True,
+        )
+        self._jtis[jti] = float(payload["exp"])
+        return True
+
+    async def revoke_user(self, user_id: str) -> datetime:
+        """Revoke every token issued to a user up to now."""
+        # Token iat is sub-second but Mongo keeps milliseconds: round up so
+        # tokens issued earlier in the same millisecond are covered too
+        now = datetime.now(timezone.utc)
+        now += timedelta(microseconds=-now.microsecond % 1000)
+        await self.db.users.update_one({"_id": user_id}, {"$set": {"tokens_valid_after": now}})
+        self._not_before[user_id] = max(self._not_before.get(user_id, 0.0), now.timestamp())
+        return now
+
+    async def sync(self) -> None:
+        """Merge revocations from Mongo; revocations are never lifted early."""
+        now = datetime.now(timezone.utc)
+
+        jtis = {
+            doc["_id"]: _timestamp(doc["expires_at"])
+            async for doc in self.db[REVOKED_TOKENS_COLLECTION].find(
+                {"expires_at": {"$gt": now}}, {"expires_at": 1}
+            )
+        }
+        not_before = {
+            doc["_id"]: _timestamp(doc["tokens_valid_after"])
+            async for doc in self.db.users.find(
+                {"tokens_valid_after": {"$exists": True}}, {"tokens_valid_after": 1}
+            )
+        }
+
+        # Keep local revocations the queries may have raced with
+        cutoff = now.timestamp()
+        for jti, expires in self._jtis.items():
+            if expires > cutoff:
+                jtis.setdefault(jti, expires)
+        for user_id, value in self._not_before.items():
+            not_before[user_id] = max(not_before.get(user_id, 0.0), value)
+
+        self._jtis = jtis
+        self._not_before = not_before
+        self.last_synced_at = now
+
+    async def ensure_indexes(self) -> None:
+        await self.db[REVOKED_TOKENS_COLLECTION].create_index("expires_at", expireAfterSeconds=0)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.settings.revocation_sync_seconds)
+            try:
+                await self.sync()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Token revocation sync failed")
+
+    async def start(self) -> None:
+        await self.ensure_indexes()
+        await self.sync()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,448 @@
+"""Request tracing with per-stage timing.
+
+Every HTTP request records its matched route for ``current_route()``, and
+gets a trace when spans are exported or Server-Timing is on. Spans are recorded for authentication,
+each MongoDB command (through pymongo command monitoring) and agent, LLM and
+tool calls, and are nested under the request's server span through context
+variables. With ``SERVER_TIMING_ENABLED``, each response carries a
+``Server-Timing`` header with the time spent per stage and the trace id;
+it is off by default so public responses do not reveal them. Sampled traces are written as OTLP/JSON
+(``ExportTraceServiceRequest``), one document per line, to the console or to
+a file that an OpenTelemetry Collector ``otlpjsonfile`` receiver can ingest.
+
+Configuration (environment):
+    TRACE_EXPORTER          none | console | file (default none)
+    TRACE_FILE              output path for the file exporter (default traces.jsonl)
+    TRACE_SAMPLE_RATIO      fraction of requests exported (default 1.0)
+    SERVER_TIMING_ENABLED   add Server-Timing headers (default false)
+"""
+
+import functools
+import json
+import logging
+import os
+import queue
+import random
+import re
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, TextIO, Tuple
+
+from pymongo import monitoring
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+# OTLP span kinds and status codes
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+STATUS_UNSET = 0
+STATUS_ERROR = 2
+
+# Server-Timing stages, in header order
+TIMING_CATEGORIES = ("auth", "db", "agent", "llm", "tool")
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+def _new_id(nbytes: int) -> str:
+    return random.getrandbits(nbytes * 8).to_bytes(nbytes, "big").hex()
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_span_id: Optional[str]
+    kind: int = SPAN_KIND_INTERNAL
+    category: Optional[str] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    start_ns: int = field(default_factory=time.time_ns)
+    end_ns: int = 0
+    status_code: int = STATUS_UNSET
+    status_message: str = ""
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def record_error(self, error: BaseException) -> None:
+        self.status_code = STATUS_ERROR
+        self.status_message = f"{type(error).__name__}: {error}"
+
+
+class Trace:
+    """Spans finished during one request. Mongo events arrive on executor threads."""
+
+    def __init__(self, trace_id: str, sampled: bool):
+        self.trace_id = trace_id
+        self.sampled = sampled
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def add(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def stage_timings(self) -> Dict[str, Tuple[float, int]]:
+        """category -> (total ms, span count)."""
+        totals: Dict[str, Tuple[float, int]] = {}
+        with self._lock:
+            for span in self.spans:
+                if span.category:
+                    total, count = totals.get(span.category, (0.0, 0))
+                    totals[span.category] = (total + span.duration_ms, count + 1)
+        return totals
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+# ASGI scope of the current request, for the matched route; set whether or not it is traced
+_current_scope: ContextVar[Optional[Scope]] = ContextVar("current_scope", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+def current_route() -> Optional[str]:
+    """Route template of the current request as "METHOD /path", once routing has matched."""
+    scope = _current_scope.get()
+    if scope is None:
+        return None
+    route = scope.get("route")
+    if route is None:
+        return None
+    return f"{scope['method']} {route.path}"
+
+
+def start_span(
+    name: str,
+    category: Optional[str] = None,
+    kind: int = SPAN_KIND_INTERNAL,
+    parent: Optional[Span] = None,
+    **attributes,
+) -> Optional[Span]:
+    """Start a span in the current trace; None outside a traced request."""
+    trace = _current_trace.get()
+    if trace is None:
+        return None
+    parent = parent or _current_span.get()
+    return Span(
+        name=name,
+        trace_id=trace.trace_id,
+        span_id=_new_id(8),
+        parent_span_id=parent.span_id if parent else None,
+        kind=kind,
+        category=category,
+        attributes=attributes,
+    )
+
+
+def end_span(span: Optional[Span], trace: Optional[Trace] = None, error: Optional[BaseException] = None) -> None:
+    if span is None:
+        return
+    span.end_ns = time.time_ns()
+    if error is not None:
+        span.record_error(error)
+    trace = trace or _current_trace.get()
+    if trace is not None:
+        trace.add(span)
+
+
+@contextmanager
+def span(name: str, category: Optional[str] = None, **attributes):
+    """Record a child span of the current span around a block (sync or async code)."""
+    current = start_span(name, category, **attributes)
+    if current is None:
+        yield None
+        return
+
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as exc:
+        end_span(current, error=exc)
+        raise
+    else:
+        end_span(current)
+    finally:
+        _current_span.reset(token)
+
+
+def traced(name: str, category: Optional[str] = None):
+    """Decorator recording a span around an async function."""
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            with span(name, category):
+                return await fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class MongoCommandTracer(monitoring.CommandListener):
+    """Record a client span for every MongoDB command run inside a traced request."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending: Dict[Tuple[int, Any], Tuple[Trace, Span]] = {}
+
+    def started(self, event):
+        # Motor copies the caller's context onto its executor thread
+        current = start_span(
+            f"mongodb.{event.command_name}",
+            category="db",
+            kind=SPAN_KIND_CLIENT,
+            **{
+                "db.system": "mongodb",
+                "db.name": event.database_name,
+                "db.operation": event.command_name,
+            },
+        )
+        if current is None:
+            return
+        collection = event.command.get(event.command_name)
+        if isinstance(collection, str):
+            current.attributes["db.mongodb.collection"] = collection
+        with self._lock:
+            self._pending[(event.request_id, event.connection_id)] = (_current_trace.get(), current)
+
+    def _finish(self, event, error: Optional[str] = None):
+        with self._lock:
+            pending = self._pending.pop((event.request_id, event.connection_id), None)
+        if pending is None:
+            return
+        trace, current = pending
+        current.end_ns = current.start_ns + event.duration_micros * 1000
+        if error is not None:
+            current.status_code = STATUS_ERROR
+            current.status_message = error
+        trace.add(current)
+
+    def succeeded(self, event):
+        self._finish(event)
+
+    def failed(self, event):
+        self._finish(event, str(event.failure.get("errmsg", "command failed")))
+
+
+def _otlp_value(value: Any) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[dict]:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items() if value is not None]
+
+
+def to_otlp_json(spans: List[Span], service_name: str) -> dict:
+    """Spans as an OTLP ExportTraceServiceRequest in its JSON encoding."""
+    otlp_spans = []
+    for item in spans:
+        otlp_span = {
+            "traceId": item.trace_id,
+            "spanId": item.span_id,
+            "name": item.name,
+            "kind": item.kind,
+            "startTimeUnixNano": str(item.start_ns),
+            "endTimeUnixNano": str(item.end_ns),
+            "attributes": _otlp_attributes(item.attributes),
+            "status": {"code": item.status_code},
+        }
+        if item.parent_span_id:
+            otlp_span["parentSpanId"] = item.parent_span_id
+        if item.status_message:
+            otlp_span["status"]["message"] = item.status_message
+        otlp_spans.append(otlp_span)
+
+    return {
+        "resourceSpans": [
+            {
+                "resource": {"attributes": _otlp_attributes({"service.name": service_name})},
+                "scopeSpans": [{"scope": {"name": "jewellery-api.tracing"}, "spans": otlp_spans}],
+            }
+        ]
+    }
+
+
+class SpanExporter(ABC):
+    @abstractmethod
+    def export(self, spans: List[Span]) -> None:
+        """Hand off a finished trace's spans; must not block the request."""
+
+    def shutdown(self) -> None:
+        pass
+
+
+class JsonLinesSpanExporter(SpanExporter):
+    """Write one OTLP/JSON document per trace from a background thread."""
+
+    def __init__(self, stream: TextIO, service_name: str, close_stream: bool = False):
+        self.stream = stream
+        self.service_name = service_name
+        self.close_stream = close_stream
+        self._queue: "queue.Queue[Optional[List[Span]]]" = queue.Queue(maxsize=10000)
+        self._thread = threading.Thread(target=self._drain, name="span-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, spans: List[Span]) -> None:
+        try:
+            self._queue.put_nowait(spans)
+        except queue.Full:
+            logger.warning("Span export queue full; dropping trace")
+
+    def _drain(self) -> None:
+        while True:
+            spans = self._queue.get()
+            if spans is None:
+                break
+            try:
+                self.stream.write(json.dumps(to_otlp_json(spans, self.service_name), separators=(",", ":")) + "\n")
+                self.stream.flush()
+            except Exception:
+                logger.exception("Span export failed")
+
+    def shutdown(self) -> None:
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+        if self.close_stream:
+            self.stream.close()
+
+
+@dataclass
+class TracingSettings:
+    exporter: str = "none"
+    file_path: str = "traces.jsonl"
+    sample_ratio: float = 1.0
+    server_timing: bool = False
+    service_name: str = "jewellery-api"
+
+    @classmethod
+    def from_env(cls) -> "TracingSettings":
+        return cls(
+            exporter=os.getenv("TRACE_EXPORTER", cls.exporter).lower(),
+            file_path=os.getenv("TRACE_FILE", cls.file_path),
+            sample_ratio=float(os.getenv("TRACE_SAMPLE_RATIO", cls.sample_ratio)),
+            server_timing=os.getenv("SERVER_TIMING_ENABLED", "false").lower() in ("1", "true", "yes"),
+            service_name=os.getenv("OTEL_SERVICE_NAME", cls.service_name),
+        )
+
+
+def create_exporter(settings: TracingSettings) -> Optional[SpanExporter]:
+    if settings.exporter == "none":
+        return None
+    if settings.exporter == "console":
+        return JsonLinesSpanExporter(sys.stderr, settings.service_name)
+    if settings.exporter == "file":
+        return JsonLinesSpanExporter(
+            open(settings.file_path, "a", encoding="utf-8"), settings.service_name, close_stream=True
+        )
+    raise RuntimeError(f"Unknown TRACE_EXPORTER {settings.exporter!r}; expected 'none', 'console' or 'file'")
+
+
+def server_timing_header(trace: Trace, total_ms: float) -> str:
+    timings = trace.stage_timings()
+    entries = []
+    for category in TIMING_CATEGORIES:
+        if category in timings:
+            duration, count = timings[category]
+            entries.append(f'{category};dur={duration:.1f};desc="{count} span{"s" if count != 1 else ""}"')
+    entries.append(f"total;dur={total_ms:.1f}")
+    entries.append(f'trace;desc="{trace.trace_id}"')
+    return ", ".join(entries)
+
+
+class TracingMiddleware:
+    """ASGI middleware opening a server span and trace per HTTP request.
+
+    Settings and spans come from ``app.state.tracing_settings`` and
+    ``app.state.span_exporter``, which the lifespan creates, so ``.env`` is
+    read first and no exporter (or its output file) exists until the app starts.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    def _start_trace(self, headers: Headers, settings: TracingSettings) -> Tuple[Trace, Optional[str]]:
+        match = _TRACEPARENT.match(headers.get("traceparent", ""))
+        if match:
+            trace_id, parent_id, flags = match.groups()
+            return Trace(trace_id, sampled=bool(int(flags, 16) & 1)), parent_id
+        return Trace(_new_id(16), sampled=random.random() < settings.sample_ratio), None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        scope_token = _current_scope.set(scope)
+        try:
+            await self._traced(scope, receive, send)
+        finally:
+            _current_scope.reset(scope_token)
+
+    async def _traced(self, scope: Scope, receive: Receive, send: Send) -> None:
+        state = scope["app"].state
+        settings: Optional[TracingSettings] = getattr(state, "tracing_settings", None)
+        exporter: Optional[SpanExporter] = getattr(state, "span_exporter", None)
+        if settings is None or (exporter is None and not settings.server_timing):
+            await self.app(scope, receive, send)
+            return
+
+        trace, remote_parent = self._start_trace(Headers(scope=scope), settings)
+        root = Span(
+            name=f"{scope['method']} {scope['path']}",
+            trace_id=trace.trace_id,
+            span_id=_new_id(8),
+            parent_span_id=remote_parent,
+            kind=SPAN_KIND_SERVER,
+            attributes={"http.request.method": scope["method"], "url.path": scope["path"]},
+        )
+        started = time.perf_counter()
+
+        async def send_with_timing(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                root.attributes["http.response.status_code"] = message["status"]
+                if settings.server_timing:
+                    headers = MutableHeaders(scope=message)
+                    headers.append(
+                        "Server-Timing", server_timing_header(trace, (time.perf_counter() - started) * 1000)
+                    )
+            await send(message)
+
+        trace_token = _current_trace.set(trace)
+        span_token = _current_span.set(root)
+        try:
+            await self.app(scope, receive, send_with_timing)
+        except BaseException as exc:
+            root.record_error(exc)
+            raise
+        finally:
+            _current_span.reset(span_token)
+            _current_trace.reset(trace_token)
+            route = scope.get("route")
+            if route is not None:
+                # Name by route template so spans group across ids
+                root.name = f"{scope['method']} {route.path}"
+                root.attributes["http.route"] = route.path
+            root.end_ns = time.time_ns()
+            trace.add(root)
+            if exporter is not None and trace.sampled:
+                exporter.export(trace.spans)